@@ -5,8 +5,19 @@
 # along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
 
 from . import (
+    instrumentation,
+    indexes,
+    counters,
+    performance,
     properties,
+    memory,
+    undo,
     operators,
+    states,
+    isolate,
+    culling,
+    rules,
+    meshes,
     preferences,
     keymap,
 )
@@ -14,8 +25,19 @@ from . import (
 classes = ()
 
 modules = (
+    instrumentation,
+    indexes,
+    counters,
+    performance,
     properties,
+    memory,
+    undo,
     operators,
+    states,
+    isolate,
+    culling,
+    rules,
+    meshes,
     preferences,
     keymap,
 )
@@ -31,10 +53,12 @@ def register():
         except:
             print(f'Failed to register module : {mod.__name__}')
 
-    preferences.load_preferences_from_file()
+    # Loaded on the first event loop iteration, or when first needed
+    preferences.schedule_preferences_loading()
 
 def unregister():
-    preferences.export_preferences_to_file()
+    # Written while the other modules unregister, preferences.unregister waits for it
+    preferences.export_preferences_to_file(background=True)
 
     from bpy.utils import unregister_class
     for cls in reversed(classes):
@@ -0,0 +1,61 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Compares writing visibility flags one ID at a time with the bulk apply engine.
+
+`scattered` selects every other object of the file, `collection` selects the whole content of one collection.
+
+    blender --background --factory-startup --python benchmarks/bench_apply.py -- --sizes 1000 10000 100000
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy
+
+import common
+
+def main():
+    args = common.parse_args()
+    addon = common.load_addon()
+    visibility = addon.visibility
+
+    results = []
+    for size in args.sizes:
+        collections = common.make_flat_scene(size, collection_count=2)
+        selections = {
+            'scattered' : list(bpy.data.objects)[::2],
+            'collection' : list(collections[0].objects),
+        }
+
+        for selection_name, objects in selections.items():
+            for attr in ('hide_render', 'hide_viewport'):
+                state = {'value' : True}
+
+                def per_id():
+                    visibility.set_flag_per_id(objects, attr, state['value'])
+                    state['value'] = not state['value']
+
+                def bulk():
+                    visibility.set_flag(objects, attr, state['value'])
+                    state['value'] = not state['value']
+
+                for case, func in (('per_id', per_id), ('bulk', bulk)):
+                    results.append({
+                        'size' : size,
+                        'selection' : selection_name,
+                        'attr' : attr,
+                        'case' : case,
+                        **common.timeit(func, args.repeat),
+                    })
+
+    common.write_results('apply', results, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Times culling instances of a mesh scattered around a camera, across scene sizes:
+building the bounds index, culling again after the camera moved, after a few objects moved, and after
+a frame change moving a few animated objects.
+
+    blender --background --factory-startup --python benchmarks/bench_culling.py -- --sizes 1000 10000 100000
+"""
+
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy
+
+import common
+
+HIDE_METHODS = ('HIDEINVIEWPORT', 'DISABLEINVIEWPORTS')
+MOVED_OBJECT_COUNT = 10
+
+def make_scattered_scene(object_count: int) -> list[bpy.types.Object]:
+    collections = common.make_flat_scene(0)
+
+    bpy.ops.mesh.primitive_cube_add()
+    cube = bpy.context.active_object
+    mesh = cube.data
+    bpy.data.objects.remove(cube)
+
+    rng = random.Random(0)
+    extent = math.sqrt(object_count) * 4
+    objects = []
+    for index in range(object_count):
+        obj = bpy.data.objects.new(f'Object_{index:06d}', mesh)
+        obj.location = (rng.uniform(-extent, extent), rng.uniform(-extent, extent), 0.0)
+        collections[index % len(collections)].objects.link(obj)
+        objects.append(obj)
+
+    camera = bpy.data.objects.new('Camera', bpy.data.cameras.new('Camera'))
+    camera.location = (0.0, 0.0, 10.0)
+    camera.rotation_euler = (math.radians(60), 0.0, 0.0)
+    camera.data.clip_end = extent
+    bpy.context.scene.collection.objects.link(camera)
+    bpy.context.scene.camera = camera
+
+    return objects
+
+def animate(objects: list[bpy.types.Object], scene: bpy.types.Scene) -> None:
+    # Moves the objects on every frame, with one keyframe per frame over a long range
+    for obj in objects:
+        for frame in range(scene.frame_start, scene.frame_start + 1000):
+            obj.location.z = frame * 0.01
+            obj.keyframe_insert('location', index=2, frame=frame)
+
+def main():
+    args = common.parse_args()
+    addon = common.load_addon()
+    culling = addon.culling
+
+    prefs = bpy.context.preferences.addons[common.ADDON_MODULE].preferences
+    scene = bpy.context.scene
+
+    results = []
+    for size in args.sizes:
+        objects = make_scattered_scene(size)
+        camera = scene.camera
+        rng = random.Random(1)
+        animate(rng.sample(objects, MOVED_OBJECT_COUNT), scene)
+
+        for hide_method in HIDE_METHODS:
+            prefs.hide_method = hide_method
+
+            def cull_cold():
+                culling.clear()
+                bpy.ops.hide.cull()
+
+            def cull_camera_moved():
+                camera.rotation_euler.z += math.radians(5)
+                bpy.context.evaluated_depsgraph_get().update()
+                bpy.ops.hide.cull()
+
+            def cull_objects_moved():
+                for obj in rng.sample(objects, MOVED_OBJECT_COUNT):
+                    obj.location.z += 1.0
+                bpy.context.evaluated_depsgraph_get().update()
+                bpy.ops.hide.cull()
+
+            def cull_frame_changed():
+                # The animated objects are reported by the frame change handler
+                scene.frame_set(scene.frame_current + 1)
+                bpy.ops.hide.cull()
+
+            for case, func in (('cold', cull_cold), ('camera_moved', cull_camera_moved), ('objects_moved', cull_objects_moved), ('frame_changed', cull_frame_changed)):
+                cull_cold()
+                results.append({
+                    'size' : size,
+                    'hide_method' : hide_method,
+                    'case' : case,
+                    **common.timeit(func, args.repeat),
+                })
+
+            bpy.ops.hide.cull(use_frustum=False)
+
+    common.write_results('culling', results, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Times gathering the children of 500 root objects with the parent index, against `Object.children_recursive`,
+and toggling the roots with their children, across scene sizes.
+
+Every root carries a chain of children, so hierarchies get deeper as the scene grows.
+
+    blender --background --factory-startup --python benchmarks/bench_hierarchy.py -- --sizes 1000 10000 100000
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy
+
+import common
+
+ROOT_COUNT = 500
+
+def parent_in_chains(objects: list[bpy.types.Object], root_count: int) -> list[bpy.types.Object]:
+    # Parents every object to the previous one of its chain, the first object of each chain being a root
+    roots = objects[:root_count]
+    for index in range(root_count, len(objects)):
+        objects[index].parent = objects[index - root_count]
+    return roots
+
+def main():
+    args = common.parse_args()
+    addon = common.load_addon()
+    operators = addon.operators
+    indexes = addon.indexes
+
+    results = []
+    for size in args.sizes:
+        common.make_flat_scene(size)
+        objects = sorted(bpy.context.view_layer.objects, key=lambda obj: obj.name)
+        roots = parent_in_chains(objects, min(ROOT_COUNT, size))
+        sel = operators.get_snapshot(roots)
+
+        def run_children_recursive():
+            descendants = []
+            for root in roots:
+                descendants.extend(root.children_recursive)
+
+        def run_parent_index():
+            indexes.parent_index.get_descendants(roots)
+
+        def run_build():
+            indexes.parent_index.build()
+
+        def run_toggle():
+            children_sel = operators.with_children(sel)
+            operators.HIDE_METHODS['HIDEINVIEWPORT'](children_sel)
+            operators.HIDE_METHODS['HIDEINVIEWPORT'](children_sel)
+
+        for case, func in (('children_recursive', run_children_recursive),
+                           ('parent_index', run_parent_index),
+                           ('build', run_build),
+                           ('toggle', run_toggle),
+                          ):
+            results.append({
+                'size' : size,
+                'roots' : len(roots),
+                'case' : case,
+                **common.timeit(func, args.repeat),
+            })
+
+    common.write_results('hierarchy', results, args.output)
+
+if __name__ == '__main__':
+    main()
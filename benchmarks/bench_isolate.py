@@ -0,0 +1,65 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Times isolating a selection and restoring the scene with each hide method, across scene sizes.
+
+The selection is one of the collections, holding a tenth of the objects.
+
+    blender --background --factory-startup --python benchmarks/bench_isolate.py -- --sizes 1000 10000 100000
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy
+
+import common
+
+HIDE_METHODS = ('HIDEINVIEWPORT', 'DISABLEINVIEWPORTS', 'DISABLEINRENDERS')
+
+def main():
+    args = common.parse_args()
+    addon = common.load_addon()
+    isolate = addon.isolate
+    operators = addon.operators
+    undo = addon.undo
+
+    results = []
+    for size in args.sizes:
+        collections = common.make_flat_scene(size)
+        view_layer = bpy.context.view_layer
+        scene = bpy.context.scene
+        sel = operators.get_snapshot(collections[0].objects)
+
+        for hide_method in HIDE_METHODS:
+            isolations = []
+
+            def run_isolate():
+                changes = isolate.isolate(sel, hide_method, view_layer)
+                isolations.append(undo.VisibilityDelta('Benchmark', scene.session_uid, view_layer.name, changes))
+
+            def run_restore():
+                undo.apply_delta(isolations.pop())
+
+            def cycle():
+                run_isolate()
+                run_restore()
+
+            for case, func in (('cycle', cycle), ('complement', lambda: isolate.get_complement_mask(sel, addon.indexes.get_object_index(view_layer)[1]))):
+                results.append({
+                    'size' : size,
+                    'hide_method' : hide_method,
+                    'case' : case,
+                    **common.timeit(func, args.repeat),
+                })
+
+    common.write_results('isolate', results, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Times keymap lookups, the hotkeys panel model of the preferences and the add-on registration with large keyconfigs.
+
+The industry compatible keyconfig is activated when available, and `--sizes` extra
+KeyMapItems of other operators are added to emulate many add-ons.
+
+    blender --background --factory-startup --python benchmarks/bench_keymap.py -- --sizes 0 1000 10000
+"""
+
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy
+
+import common
+
+def add_foreign_kmis(count: int) -> list:
+    addon_kc = bpy.context.window_manager.keyconfigs.addon
+    km_names = [km.name for km in bpy.context.window_manager.keyconfigs.default.keymaps if not km.is_modal][:50]
+
+    kmi_tuples = []
+    for index in range(count):
+        km = addon_kc.keymaps.new(name=km_names[index % len(km_names)])
+        kmi = km.keymap_items.new('wm.context_toggle', 'F13', 'PRESS', ctrl=index % 2, shift=index % 3 == 0)
+        kmi_tuples.append((km, kmi))
+    return kmi_tuples
+
+def time_registration(addon, repeat: int) -> dict[str, list[float]]:
+    # Unregistering and registering again are timed separately, each run needing the other
+    times = {'unregister' : [], 'register' : []}
+    for _ in range(repeat):
+        start = perf_counter()
+        addon.unregister()
+        times['unregister'].append(perf_counter() - start)
+
+        start = perf_counter()
+        addon.register()
+        addon.preferences.ensure_preferences_loaded()
+        times['register'].append(perf_counter() - start)
+    return times
+
+def main():
+    args = common.parse_args(default_sizes=(0, 1000, 10000))
+
+    keyconfig = bpy.utils.preset_find('Industry_Compatible', 'keyconfig')
+    if keyconfig:
+        bpy.ops.preferences.keyconfig_activate(filepath=keyconfig)
+
+    addon = common.load_addon()
+    keymap = addon.keymap
+    preferences = addon.preferences
+
+    results = []
+    for size in args.sizes:
+        kmi_tuples = add_foreign_kmis(size)
+        bpy.context.window_manager.keyconfigs.update()
+
+        def full_scan():
+            keymap.keymap_registry.invalidate()
+            keymap.get_user_kmis()
+
+        def indexed():
+            keymap.get_user_kmis()
+            keymap.get_user_kmis(internal_id=1)
+
+        def panel_model_uncached():
+            keymap.keymap_registry.invalidate()
+            keymap.get_user_kmis()
+            for kmi_ids in keymap.get_default_kmis().values():
+                for kmi_id in kmi_ids:
+                    keymap.keymap_registry.invalidate()
+                    keymap.get_user_kmis(internal_id=kmi_id)
+
+        def panel_model_cached():
+            preferences.get_hotkeys_panel_model()
+
+        cases = (
+            ('full_scan', full_scan),
+            ('indexed', indexed),
+            ('panel_model_uncached', panel_model_uncached),
+            ('panel_model_cached', panel_model_cached),
+        )
+        for case, func in cases:
+            results.append({
+                'size' : size,
+                'keyconfig' : 'industry_compatible' if keyconfig else 'blender',
+                'case' : case,
+                **common.timeit(func, args.repeat),
+            })
+
+        for case, times in time_registration(addon, args.repeat).items():
+            results.append({
+                'size' : size,
+                'keyconfig' : 'industry_compatible' if keyconfig else 'blender',
+                'case' : case,
+                'best' : min(times),
+                'mean' : sum(times) / len(times),
+            })
+
+        for km, kmi in kmi_tuples:
+            km.keymap_items.remove(kmi)
+
+    common.write_results('keymap', results, args.output)
+
+if __name__ == '__main__':
+    main()
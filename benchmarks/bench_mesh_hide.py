@@ -0,0 +1,111 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Times hiding then revealing half of a grid mesh in Edit Mode, with the add-on and with `bpy.ops.mesh.hide`,
+across vertex counts and select modes.
+
+The add-on toggles the Edit Mode data in place with the built-in operators, and reads the hide state in
+bulk after writing the Edit Mode data to the mesh. The 'edit_mesh_sync' case times that write and read
+alone, the share of the add-on over 'builtin'. The 'mode_switch' case times the Edit Mode round trip
+alone, which toggling the mesh data out of Edit Mode would cost on top of its own work.
+
+    blender --background --factory-startup --python benchmarks/bench_mesh_hide.py -- --sizes 10000 100000 1000000
+"""
+
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+import bpy
+
+import common
+
+SELECT_MODES = {
+    'VERT' : (True, False, False),
+    'EDGE' : (False, True, False),
+    'FACE' : (False, False, True),
+}
+
+def make_grid(vertex_count: int) -> bpy.types.Object:
+    common.clear_scene()
+    subdivisions = max(2, int(math.sqrt(vertex_count)))
+    bpy.ops.mesh.primitive_grid_add(x_subdivisions=subdivisions, y_subdivisions=subdivisions)
+    return bpy.context.active_object
+
+def select_half(mesh: bpy.types.Mesh) -> None:
+    # Selects the vertices of the first half of the grid, and the edges and faces between them
+    half = len(mesh.vertices) // 2
+    for domain in ('vertices', 'edges', 'polygons'):
+        elements = getattr(mesh, domain)
+        elements.foreach_set('hide', np.zeros(len(elements), dtype=bool))
+        elements.foreach_set('select', np.zeros(len(elements), dtype=bool))
+
+    select = np.zeros(len(mesh.vertices), dtype=bool)
+    select[:half] = True
+    mesh.vertices.foreach_set('select', select)
+
+    edge_verts = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get('vertices', edge_verts)
+    mesh.edges.foreach_set('select', select[edge_verts.reshape(-1, 2)].all(axis=1))
+
+    corner_verts = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get('vertex_index', corner_verts)
+    loop_starts = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get('loop_start', loop_starts)
+    mesh.polygons.foreach_set('select', np.logical_and.reduceat(select[corner_verts], loop_starts))
+
+def main():
+    args = common.parse_args(default_sizes=(10000, 100000, 1000000))
+    addon = common.load_addon()
+
+    results = []
+    for size in args.sizes:
+        obj = make_grid(size)
+        mesh = obj.data
+        tool_settings = bpy.context.scene.tool_settings
+
+        for select_mode_name, select_mode in SELECT_MODES.items():
+            tool_settings.mesh_select_mode = select_mode
+
+            def run_addon():
+                bpy.ops.hide.hidemeshelements()
+                bpy.ops.hide.hidemeshelements()
+
+            def run_builtin():
+                bpy.ops.mesh.hide(unselected=False)
+                bpy.ops.mesh.reveal(select=True)
+
+            def run_edit_mesh_sync():
+                addon.meshes.read_hidden(obj)
+
+            def run_mode_switch():
+                for _ in range(2):
+                    bpy.ops.object.mode_set(mode='OBJECT')
+                    bpy.ops.object.mode_set(mode='EDIT')
+
+            for case, func in (('addon', run_addon), ('builtin', run_builtin), ('edit_mesh_sync', run_edit_mesh_sync), ('mode_switch', run_mode_switch)):
+                bpy.ops.object.mode_set(mode='OBJECT')
+                select_half(mesh)
+                bpy.ops.object.mode_set(mode='EDIT')
+
+                results.append({
+                    'size' : len(mesh.vertices),
+                    'select_mode' : select_mode_name,
+                    'case' : case,
+                    **common.timeit(func, args.repeat),
+                })
+
+            bpy.ops.object.mode_set(mode='OBJECT')
+
+    common.write_results('mesh_hide', results, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Times every hide operator, and the add-on registration, across scene sizes and layouts.
+
+Each scene size is generated flat and deeply nested, and timed with one and three Outliners.
+Objects are selected in the 3D Viewport, collections through the previous selection.
+Every run toggles the state, so consecutive runs alternate between hiding and unhiding.
+The `nested_hide` operator dispatches to the preferred hide method through `bpy.ops`, like the
+Hide operator used to, and is timed next to `hide` for comparison.
+
+    blender --background --factory-startup --python benchmarks/bench_operators.py -- --output before.json
+    python benchmarks/compare.py before.json after.json
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy
+
+import common
+
+OPERATORS = (
+    'hide',
+    'nested_hide',
+    'hideinviewport',
+    'disableinviewports',
+    'disableinrenders',
+)
+
+LAYOUTS = {
+    'flat' : common.make_flat_scene,
+    'nested' : common.make_nested_scene,
+}
+
+OUTLINER_COUNTS = (1, 3)
+
+# Operators called by the Hide operator before it dispatched in-process, per hide method
+NESTED_OPERATORS = {
+    'HIDEINVIEWPORT' : 'hideinviewport',
+    'DISABLEINVIEWPORTS' : 'disableinviewports',
+    'DISABLEINRENDERS' : 'disableinrenders',
+    'PERFORMANCE' : 'performancehide',
+}
+
+class NestedHide(bpy.types.Operator):
+    """
+    The Hide operator calling the preferred hide method as a nested operator.
+    """
+
+    bl_idname = "hidebench.nested_hide"
+    bl_label = "Hide - Nested hide"
+    bl_options = {"INTERNAL"}
+
+    operators = None
+
+    def execute(self, context):
+        getattr(bpy.ops.hide, NESTED_OPERATORS[self.operators.get_hide_method()])()
+        return {"FINISHED"}
+
+def get_operator(op_name: str):
+    if op_name == 'nested_hide':
+        return bpy.ops.hidebench.nested_hide
+    return getattr(bpy.ops.hide, op_name)
+
+def select_objects() -> None:
+    for obj in bpy.data.objects:
+        obj.hide_viewport = False
+        obj.hide_render = False
+        obj.hide_set(False)
+        obj.select_set(True)
+
+def select_collections(operators, collections) -> None:
+    for obj in bpy.context.view_layer.objects.selected:
+        obj.select_set(False)
+
+    operators.set_previous_sel(operators.get_snapshot(collections))
+
+def main():
+    args = common.parse_args()
+    addon = common.load_addon()
+    NestedHide.operators = addon.operators
+    bpy.utils.register_class(NestedHide)
+
+    results = []
+    for size in args.sizes:
+        for layout_name, make_scene in LAYOUTS.items():
+            collections = make_scene(size)
+
+            for outliner_count in OUTLINER_COUNTS:
+                override = common.get_window_override(outliner_count)
+
+                with bpy.context.temp_override(**override):
+                    for op_name in OPERATORS:
+                        op = get_operator(op_name)
+
+                        for selection_name in ('objects', 'collections'):
+                            if selection_name == 'objects':
+                                select_objects()
+                            else:
+                                select_collections(addon.operators, collections)
+
+                            results.append({
+                                'size' : size,
+                                'layout' : layout_name,
+                                'outliners' : outliner_count,
+                                'operator' : op_name,
+                                'selection' : selection_name,
+                                **common.timeit(op, args.repeat),
+                            })
+
+        def reregister():
+            addon.unregister()
+            addon.register()
+
+        results.append({
+            'size' : size,
+            'operator' : 'register',
+            **common.timeit(reregister, args.repeat),
+        })
+
+    common.write_results('operators', results, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Times ranking every object of the view layer for the Performance hide method, across scene sizes:
+with cold statistics, with cached statistics, and after a small edit. The 'cached_disabled' case ranks
+again with the objects carrying a modifier disabled in viewports, which are not evaluated.
+
+Objects share a few meshes of different densities, a tenth of them carry a subdivision modifier.
+
+    blender --background --factory-startup --python benchmarks/bench_performance.py -- --sizes 1000 10000 20000
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy
+
+import common
+
+MESH_SUBDIVISIONS = (4, 16, 64, 128)
+
+def make_mesh_scene(object_count: int) -> list[bpy.types.Object]:
+    collections = common.make_flat_scene(0)
+
+    meshes = []
+    for subdivisions in MESH_SUBDIVISIONS:
+        bpy.ops.mesh.primitive_grid_add(x_subdivisions=subdivisions, y_subdivisions=subdivisions)
+        grid = bpy.context.active_object
+        meshes.append(grid.data)
+        bpy.data.objects.remove(grid)
+
+    objects = []
+    for index in range(object_count):
+        obj = bpy.data.objects.new(f'Object_{index:06d}', meshes[index % len(meshes)])
+        collections[index % len(collections)].objects.link(obj)
+        if index % 10 == 0:
+            obj.modifiers.new('Subdivision', 'SUBSURF')
+        objects.append(obj)
+
+    return objects
+
+def main():
+    args = common.parse_args(default_sizes=(1000, 10000, 20000))
+    addon = common.load_addon()
+    performance = addon.performance
+    operators = addon.operators
+
+    results = []
+    for size in args.sizes:
+        objects = make_mesh_scene(size)
+        empty_sel = operators.get_snapshot(())
+        budget = sum(len(obj.data.polygons) for obj in objects) // 2
+
+        def rank():
+            performance.get_heaviest_objects(empty_sel, budget)
+
+        def rank_cold():
+            performance.clear()
+            rank()
+
+        def rank_after_edit():
+            # Moves one object to another mesh, reported as a geometry update
+            objects[1].data = objects[2].data
+            bpy.context.evaluated_depsgraph_get().update()
+            rank()
+
+        modified = [obj for obj in objects if len(obj.modifiers) > 0]
+
+        for case, func in (('cold', rank_cold), ('cached', rank), ('after_edit', rank_after_edit), ('cached_disabled', rank)):
+            addon.visibility.set_flag(modified, 'hide_viewport', case == 'cached_disabled')
+            rank_cold()
+            results.append({
+                'size' : size,
+                'case' : case,
+                **common.timeit(func, args.repeat),
+            })
+
+    common.write_results('performance', results, args.output)
+
+if __name__ == '__main__':
+    main()
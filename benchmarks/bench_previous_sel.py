@@ -0,0 +1,94 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Compares the cost of remembering the previous selection as one PropertyGroup per ID (`legacy`)
+with the in-memory store saved as a single string (`compact`): write time, Python memory and .blend size.
+
+    blender --background --factory-startup --python benchmarks/bench_previous_sel.py -- --sizes 10000 100000
+"""
+
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy
+
+import common
+
+def save_size(directory: str, name: str) -> int:
+    filepath = os.path.join(directory, f'{name}.blend')
+    bpy.ops.wm.save_as_mainfile(filepath=filepath, copy=True, compress=False)
+    return os.path.getsize(filepath)
+
+def main():
+    args = common.parse_args(default_sizes=(10000, 100000))
+    addon = common.load_addon()
+    operators = addon.operators
+    memory = addon.memory
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            common.make_flat_scene(size)
+            scene = bpy.context.scene
+            sel = operators.get_snapshot(bpy.data.objects)
+
+            memory.clear()
+            scene.hide.previous_sel.clear()
+            scene.hide.previous_sel_names = ''
+            empty_size = save_size(directory, f'empty_{size}')
+
+            def legacy():
+                scene.hide.previous_sel.clear()
+                for id in sel.ids:
+                    scene.hide.previous_sel.add().id = id
+
+            tracemalloc.start()
+            timing = common.timeit(legacy, args.repeat)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results.append({
+                'size' : size,
+                'case' : 'legacy',
+                'python_peak_bytes' : peak,
+                'blend_extra_bytes' : save_size(directory, f'legacy_{size}') - empty_size,
+                **timing,
+            })
+
+            scene.hide.previous_sel.clear()
+
+            def compact():
+                memory.clear()
+                operators.set_previous_sel(sel)
+
+            def compact_unchanged():
+                operators.set_previous_sel(sel)
+
+            tracemalloc.start()
+            timing = common.timeit(compact, args.repeat)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results.append({
+                'size' : size,
+                'case' : 'compact',
+                'python_peak_bytes' : peak,
+                'blend_extra_bytes' : save_size(directory, f'compact_{size}') - empty_size,
+                **timing,
+            })
+            results.append({
+                'size' : size,
+                'case' : 'compact_unchanged',
+                **common.timeit(compact_unchanged, args.repeat),
+            })
+
+    common.write_results('previous_sel', results, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Times matching rules against every object of the view layer, across scene sizes:
+with a cold attribute index, with cached masks, and after a few objects were updated.
+Also times toggling the matches through the hide operator semantics.
+
+    blender --background --factory-startup --python benchmarks/bench_rules.py -- --sizes 1000 10000 100000
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy
+
+import common
+
+RULES = {
+    'name' : 'name matches *_proxy',
+    'prop' : 'prop lod > 1',
+    'combined' : 'name matches *_proxy or (type is EMPTY and prop lod > 1 and not collection is Collection_0000)',
+}
+UPDATED_OBJECT_COUNT = 10
+
+def make_rules_scene(object_count: int) -> list[bpy.types.Object]:
+    common.make_flat_scene(object_count)
+    objects = list(bpy.data.objects)
+    for index, obj in enumerate(objects):
+        if index % 7 == 0:
+            obj.name = obj.name + '_proxy'
+        obj['lod'] = index % 4
+    return objects
+
+def main():
+    args = common.parse_args()
+    addon = common.load_addon()
+    rules = addon.rules
+
+    results = []
+    for size in args.sizes:
+        objects = make_rules_scene(size)
+
+        for rule_name, expression in RULES.items():
+            def match():
+                rules.get_matching_objects(expression)
+
+            def match_cold():
+                rules.clear()
+                match()
+
+            def match_after_update():
+                for obj in objects[:UPDATED_OBJECT_COUNT]:
+                    obj['lod'] = (obj['lod'] + 1) % 4
+                    obj.location.x += 1.0
+                bpy.context.evaluated_depsgraph_get().update()
+                match()
+
+            def toggle():
+                bpy.ops.hide.applyhiderule(expression=expression)
+                bpy.ops.hide.applyhiderule(expression=expression)
+
+            for case, func in (('cold', match_cold), ('cached', match), ('after_update', match_after_update), ('toggle', toggle)):
+                match_cold()
+                results.append({
+                    'size' : size,
+                    'rule' : rule_name,
+                    'case' : case,
+                    **common.timeit(func, args.repeat),
+                })
+
+    common.write_results('rules', results, args.output)
+
+if __name__ == '__main__':
+    main()
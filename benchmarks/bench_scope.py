@@ -0,0 +1,88 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Times toggling Hide in Viewport with each scope, across scene sizes and view layer counts,
+to show how the time grows with the number of view layers.
+
+Every view layer holds every object. The selection is one of the collections and a tenth of the objects.
+The 'SCENE_PER_LAYER' case toggles every view layer of the scene with one call per view layer, each
+with the current view layer scope, and is timed next to the batched 'SCENE' scope for comparison.
+
+    blender --background --factory-startup --python benchmarks/bench_scope.py -- --sizes 1000 10000 100000
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy
+
+import common
+
+SCOPES = ('VIEW_LAYER', 'SCENE', 'ALL_SCENES')
+VIEW_LAYER_COUNTS = (1, 2, 5, 10, 20)
+
+def set_view_layer_count(scene: bpy.types.Scene, count: int) -> None:
+    while len(scene.view_layers) > count:
+        scene.view_layers.remove(scene.view_layers[-1])
+    while len(scene.view_layers) < count:
+        scene.view_layers.new(f'ViewLayer_{len(scene.view_layers):03d}')
+
+def main():
+    args = common.parse_args()
+    addon = common.load_addon()
+    operators = addon.operators
+
+    prefs = bpy.context.preferences.addons[common.ADDON_MODULE].preferences
+    scene = bpy.context.scene
+
+    results = []
+    for size in args.sizes:
+        collections = common.make_flat_scene(size)
+        sel_ids = (collections[0],) + tuple(bpy.data.objects[::10])
+
+        for view_layer_count in VIEW_LAYER_COUNTS:
+            set_view_layer_count(scene, view_layer_count)
+            sel = operators.get_snapshot(sel_ids)
+
+            for scope in SCOPES:
+                prefs.scope = scope
+
+                def toggle():
+                    operators.hide_in_viewport(sel)
+                    operators.hide_in_viewport(sel)
+
+                results.append({
+                    'size' : size,
+                    'view_layers' : view_layer_count,
+                    'scope' : scope,
+                    **common.timeit(toggle, args.repeat),
+                })
+
+            prefs.scope = 'VIEW_LAYER'
+
+            def toggle_per_layer():
+                for view_layer in scene.view_layers:
+                    with bpy.context.temp_override(view_layer=view_layer):
+                        layer_sel = operators.get_snapshot(sel_ids)
+                        operators.hide_in_viewport(layer_sel)
+                        operators.hide_in_viewport(layer_sel)
+
+            results.append({
+                'size' : size,
+                'view_layers' : view_layer_count,
+                'scope' : 'SCENE_PER_LAYER',
+                **common.timeit(toggle_per_layer, args.repeat),
+            })
+
+        set_view_layer_count(scene, 1)
+
+    common.write_results('scope', results, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Times the selection gathering of `get_sel_ids` against the number of Outliners and 3D Viewports
+of the screen, from a 3D Viewport and from an Outliner.
+
+`uncached` indexes the areas of the screen again on every call, `cached` reuses them.
+Areas are split as needed, so this one needs a window:
+
+    blender --factory-startup --python benchmarks/bench_sel_context.py -- --sizes 1000 10000
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy
+
+import common
+
+AREA_COUNTS = (1, 2, 3, 4)
+
+def main():
+    args = common.parse_args(default_sizes=(1000, 10000))
+    addon = common.load_addon()
+    operators = addon.operators
+    indexes = addon.indexes
+
+    results = []
+    for size in args.sizes:
+        common.make_flat_scene(size)
+        for obj in bpy.data.objects:
+            obj.select_set(True)
+
+        for outliner_count in AREA_COUNTS:
+            for viewport_count in AREA_COUNTS:
+                override = common.get_layout_override(outliner_count, viewport_count)
+                outliner_area = next(area for area in override['screen'].areas if area.type == 'OUTLINER')
+
+                for context_area in (override['area'], outliner_area):
+                    area_override = {**override, 'area' : context_area, 'region' : context_area.regions[-1]}
+
+                    with bpy.context.temp_override(**area_override):
+                        def uncached():
+                            indexes.invalidate_screen_areas()
+                            operators.get_sel_ids()
+
+                        for case, func in (('uncached', uncached), ('cached', operators.get_sel_ids)):
+                            results.append({
+                                'size' : size,
+                                'outliners' : outliner_count,
+                                'viewports' : viewport_count,
+                                'context_area' : context_area.type,
+                                'case' : case,
+                                **common.timeit(func, args.repeat),
+                            })
+
+    common.write_results('sel_context', results, args.output)
+
+    if not bpy.app.background:
+        bpy.ops.wm.quit_blender()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Measures how selection resolution grows with the selection size.
+
+`per_helper` passes the raw IDs to every helper, which sorts them again on each call.
+`snapshot` resolves a SelectionSnapshot once and passes it to every helper.
+
+    blender --background --factory-startup --python benchmarks/bench_selection.py -- --sizes 1000 10000 50000
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy
+
+import common
+
+def main():
+    args = common.parse_args(default_sizes=(1000, 10000, 50000))
+    addon = common.load_addon()
+    operators = addon.operators
+
+    results = []
+    for size in args.sizes:
+        collections = common.make_flat_scene(size)
+        ids = list(collections) + list(bpy.data.objects)
+
+        def per_helper():
+            operators.get_sel_global_state_hide_viewport(ids)
+            operators.get_sel_layer_collections(ids)
+            operators.get_sel_objects(ids)
+            operators.get_sel_collections(ids)
+
+        def snapshot():
+            sel = operators.get_snapshot(ids)
+            operators.get_sel_global_state_hide_viewport(sel)
+            operators.get_sel_layer_collections(sel)
+            operators.get_sel_objects(sel)
+            operators.get_sel_collections(sel)
+
+        results.append({'size' : len(ids), 'case' : 'per_helper', **common.timeit(per_helper, args.repeat)})
+        results.append({'size' : len(ids), 'case' : 'snapshot', **common.timeit(snapshot, args.repeat)})
+
+    common.write_results('selection', results, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Times the add-on startup : the import of its modules, `register()`, and the deferred loading
+of the preferences and keymaps, which Blender runs on its first event loop iteration.
+
+    blender --background --factory-startup --python benchmarks/bench_startup.py -- --repeat 10
+
+Use `launch_time.py` for the share of the whole Blender launch.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import common
+
+def purge_addon_modules() -> None:
+    for name in [name for name in sys.modules if name == common.ADDON_MODULE or name.startswith(common.ADDON_MODULE + '.')]:
+        del sys.modules[name]
+
+def main():
+    args = common.parse_args(default_sizes=(0,))
+
+    addon = common.load_addon()
+
+    timings: dict[str, list[float]] = {'import' : [], 'register' : [], 'load_preferences' : [], 'eager_total' : []}
+    for _ in range(args.repeat):
+        addon.unregister()
+        purge_addon_modules()
+
+        start = time.perf_counter()
+        addon = common.import_addon_module()
+        imported = time.perf_counter()
+        addon.register()
+        registered = time.perf_counter()
+        addon.preferences.ensure_preferences_loaded()
+        loaded = time.perf_counter()
+
+        timings['import'].append(imported - start)
+        timings['register'].append(registered - imported)
+        timings['load_preferences'].append(loaded - registered)
+        # What registering cost before the loading was deferred
+        timings['eager_total'].append(loaded - start)
+
+    results = [
+        {
+            'case' : case,
+            'best' : min(times),
+            'mean' : sum(times) / len(times),
+        }
+        for case, times in timings.items()
+    ]
+
+    common.write_results('startup', results, args.output)
+
+if __name__ == '__main__':
+    main()
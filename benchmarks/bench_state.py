@@ -0,0 +1,84 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Compares computing the global state of a selection one ID at a time with the NumPy reduction
+and with the visibility counters, for a selection of every other object and for a whole collection.
+
+    blender --background --factory-startup --python benchmarks/bench_state.py -- --sizes 1000 10000 100000
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy
+
+import common
+
+def main():
+    args = common.parse_args()
+    addon = common.load_addon()
+    operators = addon.operators
+    visibility = addon.visibility
+    counters = addon.counters
+
+    results = []
+    for size in args.sizes:
+        collections = common.make_flat_scene(size)
+        objects = list(bpy.data.objects)[::2]
+        sel = operators.get_snapshot(objects)
+        collection_sel = operators.get_snapshot([collections[0], *collections[0].objects])
+        counters.visibility_counters.invalidate()
+
+        for attr in ('hide_viewport', 'hide_render'):
+            def per_id():
+                global_state = getattr(objects[0], attr)
+                for id in objects[1:]:
+                    if global_state != getattr(id, attr):
+                        global_state = None
+
+            def vectorized():
+                visibility.get_global_flag(sel.ids_per_type, attr, sel.uids_per_type)
+
+            def counted():
+                counters.visibility_counters.get_global_flag(sel.ids_per_type, attr, sel.uids_per_type, sel.collections)
+
+            def collection_vectorized():
+                visibility.get_global_flag(collection_sel.ids_per_type, attr, collection_sel.uids_per_type)
+
+            def collection_counted():
+                counters.visibility_counters.get_global_flag(collection_sel.ids_per_type, attr, collection_sel.uids_per_type, collection_sel.collections)
+
+            cases = (
+                ('per_id', per_id),
+                ('vectorized', vectorized),
+                ('counters', counted),
+                ('collection_vectorized', collection_vectorized),
+                ('collection_counters', collection_counted),
+            )
+            for case, func in cases:
+                results.append({
+                    'size' : size,
+                    'attr' : attr,
+                    'case' : case,
+                    **common.timeit(func, args.repeat),
+                })
+
+        def hide_get():
+            operators.get_sel_global_state_hide_viewport(sel)
+
+        results.append({'size' : size, 'attr' : 'hide_get', 'case' : 'early_exit', **common.timeit(hide_get, args.repeat)})
+
+        errors = counters.visibility_counters.check()
+        if errors:
+            print(f'Visibility counters inconsistent : {errors[:10]}')
+
+    common.write_results('state', results, args.output)
+
+if __name__ == '__main__':
+    main()
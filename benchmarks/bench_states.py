@@ -0,0 +1,68 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Times saving and switching between named visibility states across scene sizes.
+
+Two states are saved, "layout" with every object visible and "lighting" with every
+other object hidden in viewport, disabled in viewports and disabled in renders.
+
+    blender --background --factory-startup --python benchmarks/bench_states.py -- --sizes 1000 10000 100000
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy
+
+import common
+
+def main():
+    args = common.parse_args()
+    addon = common.load_addon()
+    states = addon.states
+
+    results = []
+    for size in args.sizes:
+        common.make_flat_scene(size)
+        view_layer = bpy.context.view_layer
+
+        states.save_state('layout')
+        for index, obj in enumerate(bpy.data.objects):
+            if index % 2:
+                obj.hide_set(True)
+                obj.hide_viewport = True
+                obj.hide_render = True
+        states.save_state('lighting')
+
+        layout = states.get_states()['layout']
+        lighting = states.get_states()['lighting']
+        switch_to = [layout]
+
+        def switch():
+            states.restore_state(switch_to[0], view_layer)
+            switch_to[0] = lighting if switch_to[0] == layout else layout
+
+        def unchanged():
+            states.restore_state(lighting, view_layer)
+            states.restore_state(lighting, view_layer)
+
+        def encode():
+            states.decode_state(states.encode_state(lighting))
+
+        for case, func in (('save', states.capture_state), ('switch', switch), ('restore_unchanged', unchanged), ('encode_decode', encode)):
+            results.append({
+                'size' : size,
+                'case' : case,
+                **common.timeit(func, args.repeat),
+            })
+
+    common.write_results('states', results, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Measures how the undo cost of each undo strategy grows with the scene size.
+
+- push: time spent pushing the regular undo step, from the add-on timings
+- record: time spent recording the visibility flags, from the add-on timings
+- undo: time to revert the call, with `ed.undo` when a regular step was pushed and with
+  `hide.undovisibility` otherwise
+
+Regular undo steps are not recorded in background mode, run this one with a window:
+
+    blender --factory-startup --python benchmarks/bench_undo.py -- --sizes 1000 10000 100000 --output undo.json
+"""
+
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bpy
+
+import common
+
+UNDO_STRATEGIES = ('FULL', 'VISIBILITY', 'NO_VIEWPORT_HIDE')
+
+HIDE_METHODS = ('HIDEINVIEWPORT', 'DISABLEINVIEWPORTS', 'DISABLEINRENDERS')
+
+def get_span_durations(trace: dict, name: str) -> float:
+    duration = trace['duration_ms'] if trace['name'] == name else 0.0
+    return duration + sum(get_span_durations(child, name) for child in trace['children'])
+
+def mean(values: list[float]) -> float:
+    return sum(values) / len(values) / 1000.0
+
+def main():
+    args = common.parse_args()
+    addon = common.load_addon()
+    instrumentation = addon.instrumentation
+    operators = addon.operators
+
+    prefs = bpy.context.preferences.addons[common.ADDON_MODULE].preferences
+    instrumentation.set_enabled(True)
+
+    results = []
+    for size in args.sizes:
+        common.make_flat_scene(size)
+        sel = operators.get_snapshot(bpy.data.objects)
+
+        with bpy.context.temp_override(**common.get_window_override()):
+            for undo_strategy in UNDO_STRATEGIES:
+                prefs.undo_strategy = undo_strategy
+                for hide_method in HIDE_METHODS:
+                    prefs.hide_method = hide_method
+                    bpy.ops.ed.undo_push(message='Benchmark')
+                    instrumentation.clear()
+
+                    full_undo = operators.uses_full_undo(hide_method, undo_strategy)
+                    undo_ms = []
+                    for _ in range(args.repeat):
+                        # The previous selection is set again, undo loading may have dropped it
+                        operators.set_previous_sel(sel)
+                        bpy.ops.hide.hide('EXEC_DEFAULT')
+                        start = perf_counter()
+                        if full_undo:
+                            bpy.ops.ed.undo()
+                        elif undo_strategy == 'VISIBILITY':
+                            bpy.ops.hide.undovisibility()
+                        undo_ms.append((perf_counter() - start) * 1000.0)
+
+                    report = instrumentation.get_report()
+                    traces = [trace for trace in report['traces'] if trace['name'] == 'hide.hide']
+                    operator_ms = [trace['duration_ms'] for trace in traces]
+                    record_ms = [get_span_durations(trace, 'undo_capture') + get_span_durations(trace, 'undo_record') for trace in traces]
+                    push_ms = [get_span_durations(trace, 'undo_push') for trace in traces]
+                    results.append({
+                        'size' : size,
+                        'undo_strategy' : undo_strategy,
+                        'hide_method' : hide_method,
+                        'best' : min(push_ms) / 1000.0,
+                        'mean' : mean(push_ms),
+                        'record_mean' : mean(record_ms),
+                        'undo_mean' : mean(undo_ms),
+                        'operator_mean' : mean(operator_ms),
+                    })
+
+    common.write_results('undo', results, args.output)
+
+    if not bpy.app.background:
+        bpy.ops.wm.quit_blender()
+
+if __name__ == '__main__':
+    main()
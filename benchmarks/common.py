@@ -0,0 +1,344 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Shared helpers for the benchmarks.
+
+The benchmarks are meant to be run in a headless Blender, e.g.
+
+    blender --background --factory-startup --python benchmarks/bench_selection.py -- --output results.json
+"""
+
+import argparse
+import importlib
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Iterable
+
+import bpy
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADDON_MODULE = os.environ.get('HIDE_ADDON_MODULE', 'bl_ext.user_default.hide')
+
+def parse_args(default_sizes: Iterable[int] = (1000, 10000, 100000)) -> argparse.Namespace:
+    """
+    Parses the arguments given after `--` on the Blender command line.
+
+    Parameters
+    ----------
+    default_sizes : Iterable[int], optional
+        Scene sizes used when none are given.
+
+    Returns
+    -------
+    argparse.Namespace
+        The parsed arguments.
+    """
+
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(default_sizes))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', type=str, default=None)
+    return parser.parse_args(argv)
+
+def import_addon_module():
+    """
+    Imports the add-on package, from its source directory when it is not installed.
+
+    Returns
+    -------
+    module
+        The add-on package, not registered.
+    """
+
+    try:
+        return importlib.import_module(ADDON_MODULE)
+    except ImportError:
+        spec = importlib.util.spec_from_file_location(
+            ADDON_MODULE,
+            os.path.join(ADDON_DIR, '__init__.py'),
+            submodule_search_locations=[ADDON_DIR],
+        )
+        addon = importlib.util.module_from_spec(spec)
+        sys.modules[ADDON_MODULE] = addon
+        spec.loader.exec_module(addon)
+        return addon
+
+def load_addon():
+    """
+    Enables the add-on, importing it from its source directory when it is not installed.
+
+    Returns
+    -------
+    module
+        The add-on package.
+    """
+
+    import addon_utils
+
+    if ADDON_MODULE in sys.modules:
+        return sys.modules[ADDON_MODULE]
+
+    addon = addon_utils.enable(ADDON_MODULE, default_set=True)
+    if addon is None:
+        addon = import_addon_module()
+
+        bpy.context.preferences.addons.new().module = ADDON_MODULE
+        addon.register()
+
+    # Benchmarks run without an event loop, the deferred loading is done here
+    addon.preferences.ensure_preferences_loaded()
+
+    return addon
+
+def clear_scene() -> None:
+    """
+    Removes every object and collection from the file.
+
+    Returns
+    -------
+    None
+    """
+
+    for obj in list(bpy.data.objects):
+        bpy.data.objects.remove(obj)
+    for collection in list(bpy.data.collections):
+        bpy.data.collections.remove(collection)
+    for mesh in list(bpy.data.meshes):
+        bpy.data.meshes.remove(mesh)
+
+def make_flat_scene(object_count: int, collection_count: int = 10) -> list[bpy.types.Collection]:
+    """
+    Creates `object_count` empties spread over `collection_count` top level collections.
+
+    Parameters
+    ----------
+    object_count : int
+        Number of objects to create.
+    collection_count : int, optional
+        Number of collections to create. Default is 10.
+
+    Returns
+    -------
+    list[Collection]
+        The created collections.
+    """
+
+    clear_scene()
+
+    scene = bpy.context.scene
+    collections = []
+    for index in range(collection_count):
+        collection = bpy.data.collections.new(f'Collection_{index:04d}')
+        scene.collection.children.link(collection)
+        collections.append(collection)
+
+    for index in range(object_count):
+        obj = bpy.data.objects.new(f'Object_{index:06d}', None)
+        collections[index % collection_count].objects.link(obj)
+
+    return collections
+
+def make_nested_scene(object_count: int, depth: int = 8, branching: int = 2) -> list[bpy.types.Collection]:
+    """
+    Creates `object_count` empties spread over a tree of collections.
+
+    Parameters
+    ----------
+    object_count : int
+        Number of objects to create.
+    depth : int, optional
+        Number of nested collection levels. Default is 8.
+    branching : int, optional
+        Number of child collections per collection. Default is 2.
+
+    Returns
+    -------
+    list[Collection]
+        The top level collections.
+    """
+
+    clear_scene()
+
+    scene = bpy.context.scene
+    top_level = []
+    collections = []
+    level = [(scene.collection, '')]
+    for level_index in range(depth):
+        next_level = []
+        for parent, parent_name in level:
+            for index in range(branching):
+                name = f'{parent_name}{index}'
+                collection = bpy.data.collections.new(f'Collection_{name}')
+                parent.children.link(collection)
+                collections.append(collection)
+                next_level.append((collection, name))
+                if level_index == 0:
+                    top_level.append(collection)
+        level = next_level
+
+    for index in range(object_count):
+        obj = bpy.data.objects.new(f'Object_{index:06d}', None)
+        collections[index % len(collections)].objects.link(obj)
+
+    return top_level
+
+def get_window_override(outliner_count: int = 1) -> dict[str, Any]:
+    """
+    Builds a context override on the 3D Viewport of the first window, converting areas to Outliners as needed.
+
+    Parameters
+    ----------
+    outliner_count : int, optional
+        Number of Outliners the screen should have. Default is 1.
+
+    Returns
+    -------
+    dict[str, Any]
+        Keyword arguments for `bpy.context.temp_override`.
+    """
+
+    window = bpy.context.window_manager.windows[0]
+    screen = window.screen
+
+    viewport_area = next(area for area in screen.areas if area.type == 'VIEW_3D')
+    other_areas = [area for area in screen.areas if area != viewport_area]
+
+    for index, area in enumerate(other_areas):
+        if index < outliner_count:
+            area.type = 'OUTLINER'
+        elif area.type == 'OUTLINER':
+            area.type = 'PROPERTIES'
+
+    return {
+        'window' : window,
+        'screen' : screen,
+        'area' : viewport_area,
+        'region' : viewport_area.regions[-1],
+    }
+
+def get_layout_override(outliner_count: int, viewport_count: int) -> dict[str, Any]:
+    """
+    Builds a context override on the first 3D Viewport of the first window, splitting areas
+    until the screen has the requested number of Outliners and 3D Viewports.
+
+    Parameters
+    ----------
+    outliner_count : int
+        Number of Outliners the screen should have.
+    viewport_count : int
+        Number of 3D Viewports the screen should have, at least 1.
+
+    Returns
+    -------
+    dict[str, Any]
+        Keyword arguments for `bpy.context.temp_override`.
+    """
+
+    window = bpy.context.window_manager.windows[0]
+    screen = window.screen
+
+    # One extra area keeps the other editors out of the count
+    while len(screen.areas) < outliner_count + viewport_count + 1:
+        area = max(screen.areas, key=lambda area: area.width * area.height)
+        with bpy.context.temp_override(window=window, screen=screen, area=area, region=area.regions[-1]):
+            bpy.ops.screen.area_split(direction='VERTICAL' if area.width > area.height else 'HORIZONTAL', factor=0.5)
+
+    for index, area in enumerate(screen.areas):
+        if index < viewport_count:
+            area.type = 'VIEW_3D'
+        elif index < viewport_count + outliner_count:
+            area.type = 'OUTLINER'
+        else:
+            area.type = 'PROPERTIES'
+
+    viewport_area = screen.areas[0]
+    return {
+        'window' : window,
+        'screen' : screen,
+        'area' : viewport_area,
+        'region' : viewport_area.regions[-1],
+    }
+
+def timeit(func: Callable[[], Any], repeat: int = 5) -> dict[str, float]:
+    """
+    Times a callable several times.
+
+    Parameters
+    ----------
+    func : Callable
+        The callable to time.
+    repeat : int, optional
+        Number of runs. Default is 5.
+
+    Returns
+    -------
+    dict[str, float]
+        The best and mean times in seconds.
+    """
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    return {
+        'best' : min(times),
+        'mean' : sum(times) / len(times),
+    }
+
+def get_commit() -> str | None:
+    """
+    Retrieves the commit of the add-on sources being benchmarked.
+
+    Returns
+    -------
+    str | None
+        The commit hash, or None if it cannot be found.
+    """
+
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ADDON_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def write_results(name: str, results: list[dict[str, Any]], output: str | None = None) -> None:
+    """
+    Prints the results and writes them as JSON when an output path is given.
+
+    Parameters
+    ----------
+    name : str
+        Name of the benchmark.
+    results : list[dict[str, Any]]
+        One dictionary per measurement.
+    output : str, optional
+        Path of the JSON file to write.
+
+    Returns
+    -------
+    None
+    """
+
+    for result in results:
+        print(f'{name} : {result}')
+
+    if output:
+        data = {
+            'benchmark' : name,
+            'blender_version' : bpy.app.version_string,
+            'commit' : get_commit(),
+            'results' : results,
+        }
+        with open(output, 'w') as file:
+            json.dump(data, file, indent=4)
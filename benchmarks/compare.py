@@ -0,0 +1,50 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Compares two benchmark result files. Runs with any Python, Blender is not needed.
+
+    python benchmarks/compare.py before.json after.json --threshold 1.1
+"""
+
+import argparse
+import json
+import sys
+
+TIMING_KEYS = ('best', 'mean')
+
+def get_key(result: dict) -> tuple:
+    return tuple(sorted((key, value) for key, value in result.items() if key not in TIMING_KEYS))
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=1.1, help='Ratio above which a result is reported as a regression')
+    args = parser.parse_args()
+
+    with open(args.before) as file:
+        before = {get_key(result): result for result in json.load(file)['results']}
+    with open(args.after) as file:
+        after = {get_key(result): result for result in json.load(file)['results']}
+
+    regressions = 0
+    for key, result in after.items():
+        if key not in before or before[key]['best'] == 0:
+            continue
+
+        ratio = result['best'] / before[key]['best']
+        status = 'REGRESSION' if ratio > args.threshold else ''
+        if status:
+            regressions += 1
+
+        description = ', '.join(f'{name}={value}' for name, value in key)
+        print(f'{description} : {before[key]["best"]:.6f}s -> {result["best"]:.6f}s (x{ratio:.2f}) {status}')
+
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Measures the share of the add-on in the launch time of a headless Blender, by launching it
+with and without the add-on enabled. Runs with any Python.
+
+    python benchmarks/launch_time.py --blender /path/to/blender --repeat 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import time
+
+ADDON_MODULE = os.environ.get('HIDE_ADDON_MODULE', 'bl_ext.user_default.hide')
+
+def launch(blender: str, addons: str | None) -> float:
+    command = [blender, '--background', '--factory-startup']
+    if addons:
+        command += ['--addons', addons]
+    command += ['--python-expr', 'import bpy; bpy.ops.wm.quit_blender()']
+
+    start = time.perf_counter()
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--blender', type=str, default='blender')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    # Warm up the file system caches
+    launch(args.blender, None)
+
+    without_addon = []
+    with_addon = []
+    for _ in range(args.repeat):
+        without_addon.append(launch(args.blender, None))
+        with_addon.append(launch(args.blender, ADDON_MODULE))
+
+    base = statistics.median(without_addon)
+    total = statistics.median(with_addon)
+    print(f'Without the add-on : {base:.3f}s (median of {args.repeat})')
+    print(f'With the add-on : {total:.3f}s (median of {args.repeat})')
+    print(f'Add-on share : {total - base:.3f}s ({(total - base) / total * 100.0:.1f}%)')
+
+if __name__ == '__main__':
+    main()
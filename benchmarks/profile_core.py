@@ -0,0 +1,65 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Profiles the selection and state logic in plain CPython, using the `fake_bpy` stand-in.
+
+    python benchmarks/profile_core.py --sizes 10000 100000
+    python benchmarks/profile_core.py --profile
+    py-spy record -o profile.svg -- python benchmarks/profile_core.py
+"""
+
+import argparse
+import cProfile
+import os
+import pstats
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+import fake_bpy
+
+def run() -> None:
+    view_layer = fake_bpy.context.view_layer
+
+    layer_collection_index = core.build_layer_collection_index(view_layer)
+    ids = fake_bpy.data.collections[::3] + fake_bpy.data.objects
+
+    sel = core.resolve_selection(
+        core.SelectionSnapshot.from_ids(ids, layer_collection_index),
+        lambda: core.SelectionSnapshot.from_ids((), layer_collection_index),
+    )
+
+    hide = core.get_target_state(core.get_global_hide_state(sel.layer_collections, sel.objects, view_layer))
+    for obj in sel.objects:
+        obj.hide_set(hide)
+
+    core.get_target_state(core.get_global_flag(sel.ids_per_type, 'hide_viewport'))
+    core.get_target_state(core.get_global_flag(sel.ids_per_type, 'hide_render'))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--profile', action='store_true', help='Print cProfile statistics')
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        fake_bpy.make_scene(size, collection_count=20, depth=4)
+
+        if args.profile:
+            profiler = cProfile.Profile()
+            profiler.runcall(run)
+            print(f'--- {size} objects ---')
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+        else:
+            start = time.perf_counter()
+            run()
+            print(f'{size} objects : {time.perf_counter() - start:.4f}s')
+
+if __name__ == '__main__':
+    main()
@@ -56,6 +56,18 @@ KEYMAPITEM_HIDE_OUTLINER = {
     },
 }
 
+KEYMAPITEM_HIDE_MESH = {
+    'id' : 3,
+    'parms' : {
+        'km_name' : 'Mesh',
+        'kmi_op_idname' : 'hide.hidemeshelements',
+        'kmi_type' : 'H',
+        'kmi_value' : 'PRESS',
+        'km_space_type' : 'EMPTY',
+    },
+}
+
 DEFAULT_KMI_LIST = (KEYMAPITEM_HIDE_OBJECTMODE,
                     KEYMAPITEM_HIDE_OUTLINER,
+                    KEYMAPITEM_HIDE_MESH,
 )
\ No newline at end of file
@@ -0,0 +1,359 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Selection and visibility logic of the add-on, independent from `bpy`.
+
+This module must not import `bpy` nor use relative imports, so it can be loaded on its own
+in plain CPython and driven with the stand-ins of `fake_bpy`.
+"""
+
+from dataclasses import dataclass
+from functools import cached_property
+from time import perf_counter
+from types import MappingProxyType
+from typing import Any, Callable, Iterable, Mapping, Protocol, Sequence
+
+class RNALike(Protocol):
+    identifier: str
+
+class IDLike(Protocol):
+    """Any ID, e.g. an Object or a Collection."""
+    bl_rna: RNALike
+    session_uid: int
+    hide_viewport: bool
+    hide_render: bool
+
+class ObjectLike(IDLike, Protocol):
+    def hide_get(self, view_layer: 'ViewLayerLike | None' = None) -> bool: ...
+    def hide_set(self, state: bool, view_layer: 'ViewLayerLike | None' = None) -> None: ...
+    def select_set(self, state: bool, view_layer: 'ViewLayerLike | None' = None) -> None: ...
+
+class LayerCollectionLike(Protocol):
+    collection: IDLike
+    children: Sequence['LayerCollectionLike']
+    hide_viewport: bool
+
+class ViewLayerLike(Protocol):
+    name: str
+    layer_collection: LayerCollectionLike
+
+def sort_ids_per_type(ids : Iterable[IDLike]) -> dict[str, list[IDLike]]:
+    """
+    Sorts a list of Blender IDs by their type.
+
+    Parameters
+    ----------
+    ids : Iterable[IDLike]
+        A list of Blender IDs to sort.
+
+    Returns
+    -------
+    dict[str, list[IDLike]]
+        A dictionary where keys are ID types and values are lists of IDs of that type.
+    """
+
+    # Sort ids per types
+    sorted_ids = {}
+    for id in ids:
+        sorted_ids.setdefault(id.bl_rna.identifier, []).append(id)
+    return sorted_ids
+
+def build_layer_collection_index(view_layer: ViewLayerLike) -> dict[IDLike, LayerCollectionLike]:
+    """
+    Maps every collection of a view layer to its layer collection, at any nesting depth.
+
+    Parameters
+    ----------
+    view_layer : ViewLayerLike
+        The view layer to index.
+
+    Returns
+    -------
+    dict[IDLike, LayerCollectionLike]
+        A dictionary where keys are collections and values are their layer collections.
+    """
+
+    index: dict[IDLike, LayerCollectionLike] = {}
+
+    stack: list[LayerCollectionLike] = list(view_layer.layer_collection.children)
+    while stack:
+        layer_collection = stack.pop()
+        index[layer_collection.collection] = layer_collection
+        stack.extend(layer_collection.children)
+
+    return index
+
+@dataclass(frozen=True)
+class SelectionSnapshot:
+    """
+    Immutable snapshot of a selection, resolved once per operator call.
+
+    The IDs are bucketed per type a single time, and the derived objects and
+    layer collections are computed once, so every helper receiving the
+    snapshot can reuse them instead of sorting the selection again.
+
+    Attributes
+    ----------
+    ids_per_type : Mapping[str, tuple[IDLike]]
+        Read-only mapping of ID types to the selected IDs of that type.
+    layer_collections : tuple[LayerCollectionLike]
+        Layer collections of the view layer matching the selected collections.
+    """
+
+    ids_per_type: Mapping[str, tuple[IDLike]]
+    layer_collections: tuple[LayerCollectionLike]
+
+    @classmethod
+    def from_ids(cls, ids : Iterable[IDLike], layer_collection_index: Mapping[IDLike, LayerCollectionLike] | None = None) -> 'SelectionSnapshot':
+        """
+        Builds a snapshot from a list of IDs.
+
+        Parameters
+        ----------
+        ids : Iterable[IDLike]
+            The IDs to snapshot. Duplicates and None values are ignored.
+        layer_collection_index : Mapping[IDLike, LayerCollectionLike], optional
+            Mapping of collections to their layer collections. If None, no layer collection is resolved.
+
+        Returns
+        -------
+        SelectionSnapshot
+            The snapshot of the given IDs.
+        """
+
+        unique_ids = dict.fromkeys(id for id in ids if id is not None)
+        sorted_ids = {id_type: tuple(type_ids) for id_type, type_ids in sort_ids_per_type(unique_ids).items()}
+
+        layer_collections = []
+        if layer_collection_index != None:
+            for collection in sorted_ids.get('Collection', ()):
+                layer_collection = layer_collection_index.get(collection)
+                if layer_collection != None:
+                    layer_collections.append(layer_collection)
+
+        return cls(MappingProxyType(sorted_ids), tuple(layer_collections))
+
+    @property
+    def collections(self) -> tuple[IDLike]:
+        """Selected collections."""
+        return self.ids_per_type.get('Collection', ())
+
+    @property
+    def objects(self) -> tuple[ObjectLike]:
+        """Selected objects."""
+        return self.ids_per_type.get('Object', ())
+
+    @property
+    def ids(self) -> tuple[IDLike]:
+        """Selected collections followed by selected objects."""
+        return self.collections + self.objects
+
+    @cached_property
+    def uids_per_type(self) -> Mapping[str, tuple[int]]:
+        """Session UIDs of the selected collections and objects, computed once on first use."""
+        return MappingProxyType({
+            'Collection' : tuple(id.session_uid for id in self.collections),
+            'Object' : tuple(id.session_uid for id in self.objects),
+        })
+
+    def __len__(self) -> int:
+        return len(self.collections) + len(self.objects)
+
+def resolve_selection(current: SelectionSnapshot, get_previous: Callable[[], SelectionSnapshot]) -> SelectionSnapshot:
+    """
+    Returns the selection an operator should act on.
+
+    Parameters
+    ----------
+    current : SelectionSnapshot
+        The current selection.
+    get_previous : Callable[[], SelectionSnapshot]
+        Returns the previous selection. Only called when the current selection is empty.
+
+    Returns
+    -------
+    SelectionSnapshot
+        The current selection, or the previous one when nothing is selected.
+    """
+
+    if len(current) > 0:
+        return current
+    return get_previous()
+
+def reduce_values(values: Iterable[bool]) -> bool | None:
+    """
+    Reduces boolean values to a single state, stopping as soon as they are mixed.
+
+    Parameters
+    ----------
+    values : Iterable[bool]
+        The values to reduce.
+
+    Returns
+    -------
+    bool | None
+        The common value, or None if they are mixed or if there are no values.
+    """
+
+    values = iter(values)
+    state = next(values, None)
+    for value in values:
+        if value != state:
+            return None
+    return state
+
+def combine_states(states: Iterable[bool | None]) -> bool | None:
+    """
+    Combines the states of several groups of IDs.
+
+    Parameters
+    ----------
+    states : Iterable[bool | None]
+        The state of each non empty group.
+
+    Returns
+    -------
+    bool | None
+        The common state, or None if any group is mixed or if the groups differ.
+    """
+
+    return reduce_values(states)
+
+def get_global_flag(ids_per_type: Mapping[str, Sequence[IDLike]], attr: str) -> bool | None:
+    """
+    Determines the global state of a boolean property over collections and objects, one ID at a time.
+
+    Parameters
+    ----------
+    ids_per_type : Mapping[str, Sequence[IDLike]]
+        The IDs sorted per type. Only 'Collection' and 'Object' are considered.
+    attr : str
+        Name of the property, e.g. 'hide_viewport' or 'hide_render'.
+
+    Returns
+    -------
+    bool | None
+        The global state, or None if the states are mixed or if there are no IDs.
+    """
+
+    ids = tuple(ids_per_type.get('Collection', ())) + tuple(ids_per_type.get('Object', ()))
+    return reduce_values(getattr(id, attr) for id in ids)
+
+def get_global_hide_state(layer_collections: Sequence[LayerCollectionLike], objects: Sequence[ObjectLike], view_layer: ViewLayerLike | None = None) -> bool | None:
+    """
+    Determines the global "hide in viewport" state of layer collections and objects.
+
+    `Object.hide_get` is stored per view layer and cannot be read in bulk,
+    so the objects are read one by one, stopping at the first differing value.
+
+    Parameters
+    ----------
+    layer_collections : Sequence[LayerCollectionLike]
+        The layer collections to check.
+    objects : Sequence[ObjectLike]
+        The objects to check.
+    view_layer : ViewLayerLike, optional
+        The view layer to read the object state from.
+
+    Returns
+    -------
+    bool | None
+        The global state, or None if the states are mixed or if there is nothing to check.
+    """
+
+    states = []
+    if len(layer_collections) > 0:
+        state = reduce_values(layer_collection.hide_viewport for layer_collection in layer_collections)
+        if state == None:
+            return None
+        states.append(state)
+    if len(objects) > 0:
+        state = reduce_values(obj.hide_get(view_layer=view_layer) for obj in objects)
+        if state == None:
+            return None
+        states.append(state)
+
+    return combine_states(states)
+
+def get_target_state(global_state: bool | None) -> bool:
+    """
+    Decides which way a toggle goes.
+
+    Parameters
+    ----------
+    global_state : bool | None
+        The global hidden state of the selection, None if mixed.
+
+    Returns
+    -------
+    bool
+        True to hide, when the selection is visible or mixed. False to unhide, when everything is hidden.
+    """
+
+    return global_state != True
+
+class ChunkedJob:
+    """
+    Work made of steps, each one calling a function on a sequence of items, that can be run
+    in time-limited chunks, e.g. one per modal event.
+
+    Attributes
+    ----------
+    steps : list[tuple[Sequence[Any], Callable[[Any], None], int | None]]
+        The (items, function, batch size) tuples to run, in order. Steps can be given without a batch size,
+        which is then the one passed to `run`. Heavy items, e.g. slices of a bulk write, use a batch size of 1.
+    total : int
+        Number of items of every step.
+    done : int
+        Number of items processed so far.
+    """
+
+    def __init__(self, steps: Iterable[tuple[Sequence[Any], Callable[[Any], None]] | tuple[Sequence[Any], Callable[[Any], None], int]]):
+        self.steps = [(step[0], step[1], step[2] if len(step) > 2 else None) for step in steps if len(step[0]) > 0]
+        self.total = sum(len(items) for items, _, _ in self.steps)
+        self.done = 0
+        self._step = 0
+        self._index = 0
+
+    @property
+    def finished(self) -> bool:
+        return self._step >= len(self.steps)
+
+    def run(self, budget: float | None = None, batch_size: int = 64) -> bool:
+        """
+        Processes items until the work is done, or until the time budget is spent.
+
+        Parameters
+        ----------
+        budget : float, optional
+            Time budget in seconds, checked after each batch of items. If None, runs until done.
+        batch_size : int, optional
+            Number of items processed between two time checks, for steps without their own. Default is 64.
+
+        Returns
+        -------
+        bool
+            True if the work is done.
+        """
+
+        start = perf_counter()
+        while self._step < len(self.steps):
+            items, func, step_batch_size = self.steps[self._step]
+            end = min(self._index + (batch_size if step_batch_size == None else step_batch_size), len(items))
+            for index in range(self._index, end):
+                func(items[index])
+            self.done += end - self._index
+            self._index = end
+
+            if self._index >= len(items):
+                self._step += 1
+                self._index = 0
+
+            if budget != None and perf_counter() - start >= budget:
+                break
+
+        return self.finished
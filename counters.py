@@ -0,0 +1,550 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+from typing import Mapping, Sequence
+
+import numpy as np
+
+import bpy
+from bpy.app.handlers import persistent
+from bpy.types import Collection, Depsgraph, ID, Object, Scene
+
+from .constants import OP_IDNAME_PREFIX
+from .core import combine_states
+from .visibility import (BULK_MIN_IDS,
+                         get_data_uids,
+                         get_flags,
+                         reduce_flags,
+                         write_handlers,
+                        )
+
+# Flags kept by the counters. The per view layer state of objects has no update notification, it is not kept.
+COUNTED_FLAGS = ('hide_viewport', 'hide_render')
+
+class VisibilityCounters:
+    """
+    Cached `hide_viewport` and `hide_render` flags of every object and collection of the file,
+    with the number of objects having each flag set per collection.
+
+    The cache is built from a full scan on first use, then kept up to date from the add-on
+    writes, from depsgraph updates, and from message bus notifications for the flags of IDs
+    that are not evaluated, e.g. disabled objects or objects of other scenes.
+
+    Attributes
+    ----------
+    valid : bool
+        False when the cache has to be built again from a full scan.
+    members_stale : bool
+        True when collection contents may have changed since the counts were computed.
+    flags_stale : bool
+        True when flags may have been changed outside of the add-on since they were read.
+    object_uids : np.ndarray
+        Sorted session UIDs of every object.
+    object_order : np.ndarray
+        Order of `bpy.data.objects` sorting it by session UID.
+    object_flags : dict[str, np.ndarray]
+        Flags of every object, in the order of `object_uids`.
+    collection_flags : dict[str, dict[int, bool]]
+        Flags of every collection, keyed by session UID.
+    collection_indexes : dict[int, int]
+        Index of every collection in the count arrays, keyed by session UID.
+    member_collections : np.ndarray
+        Collection index of each (collection, object) membership.
+    member_objects : np.ndarray
+        Object position in `object_uids` of each (collection, object) membership, grouped by collection
+        and sorted within each collection.
+    member_offsets : np.ndarray
+        Start of the memberships of each collection in `member_objects`, followed by their total count.
+    sizes : np.ndarray
+        Number of objects of each collection.
+    counts : dict[str, np.ndarray]
+        Number of objects with the flag set, per collection.
+    """
+
+    def __init__(self):
+        self.valid = False
+        self.members_stale = False
+        self.flags_stale = False
+
+    def build(self) -> None:
+        """
+        Builds the cache from a full scan of `bpy.data`.
+
+        Returns
+        -------
+        None
+        """
+
+        objects = bpy.data.objects
+        uids = get_data_uids(objects)
+        self.object_order = np.argsort(uids, kind='stable')
+        self.object_uids = uids[self.object_order]
+        self.object_flags = {attr: get_flags(objects, attr)[self.object_order] for attr in COUNTED_FLAGS}
+
+        collections = bpy.data.collections
+        self.collection_flags = {attr: {collection.session_uid: getattr(collection, attr) for collection in collections} for attr in COUNTED_FLAGS}
+
+        self.build_members()
+        self.flags_stale = False
+        self.valid = True
+
+    def sync_flags(self) -> None:
+        """
+        Reads the flags of every object and collection again in bulk, and updates the counts of the changed ones.
+
+        Returns
+        -------
+        None
+        """
+
+        objects = bpy.data.objects
+        uids = get_data_uids(objects)
+        if len(uids) != len(self.object_uids) or not np.array_equal(uids[self.object_order], self.object_uids):
+            # Objects were added, removed or reordered, the positions are not valid anymore
+            self.build()
+            return
+
+        for attr in COUNTED_FLAGS:
+            self.update_objects(attr, self.object_uids, get_flags(objects, attr)[self.object_order])
+
+        collections = bpy.data.collections
+        self.collection_flags = {attr: {collection.session_uid: getattr(collection, attr) for collection in collections} for attr in COUNTED_FLAGS}
+        self.flags_stale = False
+
+    def build_members(self) -> None:
+        """
+        Computes the contents of every collection, and the counts.
+
+        Returns
+        -------
+        None
+        """
+
+        collections = bpy.data.collections
+        self.collection_indexes = {}
+        member_collections = []
+        member_objects = []
+        for index, collection in enumerate(collections):
+            self.collection_indexes[collection.session_uid] = index
+            positions = self.find_objects(get_data_uids(collection.objects))
+            if positions is None:
+                # Objects were added or replaced since they were scanned
+                self.build()
+                return
+            # Sorted positions let `covers` look objects up with a binary search
+            positions.sort()
+            member_objects.append(positions)
+            member_collections.append(np.full(len(positions), index, dtype=np.intp))
+
+        self.member_objects = np.concatenate(member_objects) if member_objects else np.empty(0, dtype=np.intp)
+        self.member_collections = np.concatenate(member_collections) if member_collections else np.empty(0, dtype=np.intp)
+        self.sizes = np.bincount(self.member_collections, minlength=len(collections))
+        self.member_offsets = np.concatenate(([0], np.cumsum(self.sizes)))
+        self.counts = {attr: np.bincount(self.member_collections, weights=self.object_flags[attr][self.member_objects], minlength=len(collections)).astype(np.int64) for attr in COUNTED_FLAGS}
+        self.members_stale = False
+
+    def find_objects(self, uids: np.ndarray) -> np.ndarray | None:
+        """
+        Retrieves the positions of objects in `object_uids`.
+
+        Parameters
+        ----------
+        uids : np.ndarray
+            Session UIDs of the objects.
+
+        Returns
+        -------
+        np.ndarray | None
+            The positions, or None if one of the objects is not in the cache.
+        """
+
+        uids = np.asarray(uids, dtype=np.int32)
+        if len(uids) == 0:
+            return np.empty(0, dtype=np.intp)
+        if len(self.object_uids) == 0:
+            return None
+
+        positions = np.searchsorted(self.object_uids, uids)
+        # Positions past the end are unknown objects, the others are compared to the cached UIDs
+        found = positions < len(self.object_uids)
+        found[found] = self.object_uids[positions[found]] == uids[found]
+        if not found.all():
+            return None
+        return positions
+
+    def ensure(self) -> None:
+        """
+        Builds the cache again if IDs were added or removed, reads the flags again if they were changed
+        outside of the add-on, and computes the counts again if collection contents changed.
+
+        Returns
+        -------
+        None
+        """
+
+        if self.valid and (len(bpy.data.objects) != len(self.object_uids) or len(bpy.data.collections) != len(self.collection_indexes)):
+            self.valid = False
+
+        if not self.valid:
+            self.build()
+            return
+
+        if self.flags_stale:
+            self.sync_flags()
+        if self.members_stale:
+            sizes = np.fromiter((len(collection.objects) for collection in bpy.data.collections), dtype=np.int64, count=len(bpy.data.collections))
+            if np.array_equal(sizes, self.sizes):
+                self.members_stale = False
+            else:
+                self.build_members()
+
+    def invalidate(self) -> None:
+        self.valid = False
+
+    def update_objects(self, attr: str, uids: np.ndarray, values: np.ndarray | bool) -> None:
+        """
+        Updates the flags of objects and the counts of their collections.
+
+        Parameters
+        ----------
+        attr : str
+            Name of the flag, e.g. 'hide_render'.
+        uids : np.ndarray
+            Session UIDs of the objects.
+        values : np.ndarray | bool
+            New values of the flag, one per object or one for all.
+
+        Returns
+        -------
+        None
+        """
+
+        if not self.valid or attr not in COUNTED_FLAGS or len(uids) == 0:
+            return
+
+        positions = self.find_objects(uids)
+        if positions is None:
+            # Unknown objects were added since the cache was built
+            self.valid = False
+            return
+
+        flags = self.object_flags[attr]
+        values = np.broadcast_to(np.asarray(values, dtype=bool), positions.shape)
+        changed = flags[positions] != values
+        if not changed.any():
+            return
+
+        positions = positions[changed]
+        values = values[changed]
+        flags[positions] = values
+
+        # Each changed object adds or removes one to the counts of its collections
+        deltas = np.zeros(len(flags), dtype=np.int64)
+        deltas[positions] = np.where(values, 1, -1)
+        member_deltas = deltas[self.member_objects]
+        touched = member_deltas != 0
+        np.add.at(self.counts[attr], self.member_collections[touched], member_deltas[touched])
+
+    def update_collections(self, attr: str, uids: np.ndarray, values: np.ndarray | bool) -> None:
+        if not self.valid or attr not in COUNTED_FLAGS:
+            return
+
+        values = np.broadcast_to(np.asarray(values, dtype=bool), np.shape(uids))
+        self.collection_flags[attr].update(zip(np.asarray(uids).tolist(), values.tolist()))
+
+    def get_collections_state(self, attr: str, collections: Sequence[Collection]) -> bool | None:
+        """
+        Reduces the flag of the objects of whole collections from the counts, without reading them.
+        """
+
+        indexes = [self.collection_indexes[collection.session_uid] for collection in collections]
+        counts = self.counts[attr][indexes]
+        if (counts == self.sizes[indexes]).all():
+            return True
+        if not counts.any():
+            return False
+        return None
+
+    def covers(self, collections: Sequence[Collection], uids: Sequence[int]) -> bool:
+        """
+        Tells whether objects are exactly the contents of collections, compared as sets of session UIDs.
+
+        Parameters
+        ----------
+        collections : Sequence[Collection]
+            The collections.
+        uids : Sequence[int]
+            Session UIDs of the objects, without duplicates.
+
+        Returns
+        -------
+        bool
+            True if every object is in one of the collections, and every object of the collections is one of them.
+        """
+
+        if len(collections) == 0 or any(collection.session_uid not in self.collection_indexes for collection in collections):
+            return False
+
+        indexes = [self.collection_indexes[collection.session_uid] for collection in collections]
+        # Objects linked to several collections are counted once in the selection
+        if int(self.sizes[indexes].sum()) < len(uids):
+            return False
+
+        positions = self.find_objects(uids)
+        if positions is None:
+            return False
+
+        if len(indexes) == 1:
+            # The members are sorted and unique, the sizes match when each object is one of them
+            index = indexes[0]
+            if self.sizes[index] != len(positions):
+                return False
+            members = self.member_objects[self.member_offsets[index]:self.member_offsets[index + 1]]
+            found = np.searchsorted(members, positions)
+            found[found == len(members)] = 0
+            return bool((members[found] == positions).all())
+
+        # Objects shared by several collections are marked once, so both sides are compared as sets
+        selected = np.zeros(len(self.object_uids), dtype=bool)
+        selected[positions] = True
+        members = np.zeros(len(self.object_uids), dtype=bool)
+        for index in indexes:
+            members[self.member_objects[self.member_offsets[index]:self.member_offsets[index + 1]]] = True
+        return bool(np.array_equal(selected, members))
+
+    def get_global_flag(self, ids_per_type: Mapping[str, Sequence[ID]], attr: str, uids_per_type: Mapping[str, Sequence[int]], collections: Sequence[Collection] = ()) -> bool | None:
+        """
+        Determines the global state of a flag over collections and objects from the cache.
+
+        Parameters
+        ----------
+        ids_per_type : Mapping[str, Sequence[ID]]
+            The IDs sorted per type. Only 'Collection' and 'Object' are considered.
+        attr : str
+            Name of the flag, either 'hide_viewport' or 'hide_render'.
+        uids_per_type : Mapping[str, Sequence[int]]
+            The session UIDs of the IDs sorted per type.
+        collections : Sequence[Collection], optional
+            Collections whose contents may be the selected objects, e.g. the selected collections.
+            When they are, the objects state is read from the counts.
+
+        Returns
+        -------
+        bool | None
+            The global state, or None if the states are mixed or if there are no IDs.
+        """
+
+        self.ensure()
+
+        states = []
+        for id_type in ('Collection', 'Object'):
+            uids = uids_per_type.get(id_type, ())
+            if len(uids) == 0:
+                continue
+
+            if id_type == 'Collection':
+                collection_flags = self.collection_flags[attr]
+                values = [collection_flags.get(uid) for uid in uids]
+                if None in values:
+                    # Unknown collections, read directly
+                    self.valid = False
+                    values = [getattr(id, attr) for id in ids_per_type[id_type]]
+                state = reduce_flags(np.array(values, dtype=bool))
+            elif self.covers(collections, uids):
+                state = self.get_collections_state(attr, collections)
+            else:
+                positions = self.find_objects(uids)
+                if positions is None:
+                    # Unknown objects, read directly
+                    self.valid = False
+                    state = reduce_flags(np.fromiter((getattr(id, attr) for id in ids_per_type[id_type]), dtype=bool, count=len(ids_per_type[id_type])))
+                else:
+                    state = reduce_flags(self.object_flags[attr][positions])
+
+            if state == None:
+                return None
+            states.append(state)
+
+        return combine_states(states)
+
+    def check(self) -> list[str]:
+        """
+        Compares the cache, built first if needed, to a full scan of the live flags.
+
+        Returns
+        -------
+        list[str]
+            A description of every difference, empty if the cache is consistent.
+        """
+
+        # An invalid cache is built again, so the check covers a fresh build too
+        self.ensure()
+
+        expected = VisibilityCounters()
+        expected.build()
+
+        errors = []
+        if not np.array_equal(expected.object_uids, self.object_uids):
+            errors.append('Objects differ')
+            return errors
+
+        for attr in COUNTED_FLAGS:
+            for uid in self.object_uids[expected.object_flags[attr] != self.object_flags[attr]].tolist():
+                errors.append(f'Object {uid} : wrong {attr}')
+            for uid, value in expected.collection_flags[attr].items():
+                if self.collection_flags[attr].get(uid) != value:
+                    errors.append(f'Collection {uid} : wrong {attr}')
+
+        if expected.collection_indexes != self.collection_indexes or not np.array_equal(expected.sizes, self.sizes):
+            errors.append('Collection contents differ')
+        else:
+            for attr in COUNTED_FLAGS:
+                for index in np.flatnonzero(expected.counts[attr] != self.counts[attr]).tolist():
+                    errors.append(f'Collection {bpy.data.collections[index].name} : wrong {attr} count')
+
+        return errors
+
+visibility_counters = VisibilityCounters()
+
+def is_counted(attr: str, uids_per_type: Mapping[str, Sequence[int]]) -> bool:
+    """
+    Tells whether the global state of a flag is worth reading from the counters rather than from the IDs.
+
+    Parameters
+    ----------
+    attr : str
+        Name of the flag, e.g. 'hide_render'.
+    uids_per_type : Mapping[str, Sequence[int]]
+        The session UIDs of the selected IDs sorted per type.
+
+    Returns
+    -------
+    bool
+        True for flags kept by the counters and selections large enough.
+    """
+
+    return attr in COUNTED_FLAGS and sum(len(uids) for uids in uids_per_type.values()) >= BULK_MIN_IDS
+
+def on_flags_written(id_type: str, attr: str, uids: np.ndarray, values: np.ndarray | bool) -> None:
+    if id_type == 'Object':
+        visibility_counters.update_objects(attr, uids, values)
+    elif id_type == 'Collection':
+        visibility_counters.update_collections(attr, uids, values)
+
+@persistent
+def on_depsgraph_update_post(scene: Scene, depsgraph: Depsgraph) -> None:
+    if not visibility_counters.valid:
+        return
+    # Most updates are edits of other data, e.g. meshes or materials
+    if not (depsgraph.id_type_updated('OBJECT') or depsgraph.id_type_updated('COLLECTION')):
+        return
+
+    for update in depsgraph.updates:
+        id = update.id.original
+        if isinstance(id, Object):
+            for attr in COUNTED_FLAGS:
+                visibility_counters.update_objects(attr, np.array([id.session_uid], dtype=np.int32), getattr(id, attr))
+        elif isinstance(id, Collection):
+            for attr in COUNTED_FLAGS:
+                visibility_counters.update_collections(attr, np.array([id.session_uid], dtype=np.int32), getattr(id, attr))
+            # Objects may have been linked or unlinked
+            visibility_counters.members_stale = True
+
+def on_flags_edited(*args) -> None:
+    # The message bus does not tell which IDs changed, their flags are read again in bulk when next needed
+    visibility_counters.flags_stale = True
+
+def subscribe_flags() -> None:
+    """
+    Subscribes to changes of the counted flags of every object and collection, including those the depsgraph does not evaluate.
+
+    Returns
+    -------
+    None
+    """
+
+    bpy.msgbus.clear_by_owner(visibility_counters)
+    for id_type in (Object, Collection):
+        for attr in COUNTED_FLAGS:
+            bpy.msgbus.subscribe_rna(key=(id_type, attr), owner=visibility_counters, args=(), notify=on_flags_edited)
+
+@persistent
+def on_file_changed(*args) -> None:
+    visibility_counters.invalidate()
+
+@persistent
+def on_load_post(*args) -> None:
+    visibility_counters.invalidate()
+    # Subscriptions are cleared when a file is loaded
+    subscribe_flags()
+
+class CheckVisibilityCounters(bpy.types.Operator):
+    """
+    Operator for comparing the visibility counters to a full scan.
+    """
+
+    bl_idname = OP_IDNAME_PREFIX + "." + "checkvisibilitycounters"
+    bl_label = "Hide - Check visibility counters"
+    bl_description = "Compare the cached visibility counters to a full scan of the file, and rebuild them"
+    bl_options = {"INTERNAL"}
+
+    @classmethod
+    def poll(cls, context):
+        return True
+
+    def execute(self, context):
+        errors = visibility_counters.check()
+        for error in errors:
+            print(error)
+        visibility_counters.invalidate()
+
+        if errors:
+            self.report({"WARNING"}, f'{len(errors)} differences found, see the console')
+        else:
+            self.report({"INFO"}, 'Visibility counters are consistent')
+
+        return {"FINISHED"}
+
+handlers = (
+    (bpy.app.handlers.depsgraph_update_post, on_depsgraph_update_post),
+    (bpy.app.handlers.load_post, on_load_post),
+    (bpy.app.handlers.undo_post, on_file_changed),
+    (bpy.app.handlers.redo_post, on_file_changed),
+)
+
+classes = (
+    CheckVisibilityCounters,
+)
+
+def register():
+    from bpy.utils import register_class
+    for cls in classes:
+        register_class(cls)
+
+    for handler_list, handler in handlers:
+        if handler not in handler_list:
+            handler_list.append(handler)
+
+    if on_flags_written not in write_handlers:
+        write_handlers.append(on_flags_written)
+
+    subscribe_flags()
+
+def unregister():
+    bpy.msgbus.clear_by_owner(visibility_counters)
+
+    if on_flags_written in write_handlers:
+        write_handlers.remove(on_flags_written)
+
+    for handler_list, handler in handlers:
+        if handler in handler_list:
+            handler_list.remove(handler)
+
+    visibility_counters.invalidate()
+
+    from bpy.utils import unregister_class
+    for cls in reversed(classes):
+        unregister_class(cls)
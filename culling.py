@@ -0,0 +1,499 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+import numpy as np
+
+import bpy
+from bpy.app.handlers import persistent
+from bpy.types import Depsgraph, Object, Scene, ViewLayer
+from bpy.props import BoolProperty, FloatProperty
+
+from .constants import OP_IDNAME_PREFIX
+from . import undo
+from .indexes import get_object_index
+from .instrumentation import (span,
+                              operator_span,
+                             )
+from .isolate import ISOLATE_FLAGS
+from .operators import (get_hide_method,
+                        get_undo_strategy,
+                        uses_full_undo,
+                        push_undo,
+                       )
+from .visibility import (BULK_MIN_IDS,
+                         get_flags,
+                         write_flags,
+                        )
+
+# Object types that are culled, others like lights or empties affect what is around them
+CULLED_TYPES = {'MESH', 'CURVE', 'CURVES', 'SURFACE', 'META', 'FONT', 'POINTCLOUD', 'VOLUME', 'GPENCIL', 'GREASEPENCIL'}
+
+class BoundsIndex:
+    """
+    World space bounding spheres of every object of a view layer, aligned with its object index.
+
+    Attributes
+    ----------
+    objects : tuple[Object]
+        The objects of the view layer, as returned by `get_object_index`.
+    uids : np.ndarray
+        Session UIDs of the objects.
+    positions : dict[int, int]
+        Position of each object, keyed by session UID.
+    culled : np.ndarray
+        True for the objects whose type is culled.
+    local_centers : np.ndarray
+        Center of the bounding box of each object, in object space, of shape (object count, 3).
+    local_radii : np.ndarray
+        Radius of the bounding sphere of each object, in object space.
+    centers : np.ndarray
+        Center of the bounding sphere of each object, in world space, of shape (object count, 3).
+    radii : np.ndarray
+        Radius of the bounding sphere of each object, in world space.
+    moved : set[int]
+        Session UIDs of the objects moved since their sphere was computed.
+    reshaped : set[int]
+        Session UIDs of the objects whose geometry changed since their bounding box was read.
+    """
+
+    __slots__ = ('objects', 'uids', 'positions', 'culled', 'local_centers', 'local_radii', 'centers', 'radii', 'moved', 'reshaped')
+
+    def __init__(self, objects: tuple[Object], uids: np.ndarray, view_layer: ViewLayer):
+        count = len(objects)
+        self.objects = objects
+        self.uids = uids
+        self.positions = dict(zip(uids.tolist(), range(count)))
+        self.culled = np.fromiter((obj.type in CULLED_TYPES for obj in objects), dtype=bool, count=count)
+        self.local_centers = np.zeros((count, 3), dtype=np.float32)
+        self.local_radii = np.zeros(count, dtype=np.float32)
+        for position in np.flatnonzero(self.culled).tolist():
+            self.read_bounds(position)
+
+        matrices = np.empty(count * 16, dtype=np.float32)
+        view_layer.objects.foreach_get('matrix_world', matrices)
+        # Matrices are read column by column
+        self.centers, self.radii = get_spheres(matrices.reshape(-1, 4, 4).transpose(0, 2, 1), self.local_centers, self.local_radii)
+
+        self.moved: set[int] = set()
+        self.reshaped: set[int] = set()
+
+    def read_bounds(self, position: int) -> None:
+        corners = np.array(self.objects[position].bound_box, dtype=np.float32)
+        low = corners.min(axis=0)
+        high = corners.max(axis=0)
+        self.local_centers[position] = (low + high) / 2
+        self.local_radii[position] = np.linalg.norm(high - low) / 2
+
+    def update(self, view_layer: ViewLayer) -> None:
+        """
+        Computes the spheres of the moved and reshaped objects again.
+
+        Parameters
+        ----------
+        view_layer : ViewLayer
+            The view layer of the index.
+
+        Returns
+        -------
+        None
+        """
+
+        for uid in self.reshaped:
+            position = self.positions.get(uid)
+            if position != None and self.culled[position]:
+                self.read_bounds(position)
+
+        uids = self.moved | self.reshaped
+        if len(uids) >= BULK_MIN_IDS:
+            matrices = np.empty(len(self.objects) * 16, dtype=np.float32)
+            view_layer.objects.foreach_get('matrix_world', matrices)
+            self.centers, self.radii = get_spheres(matrices.reshape(-1, 4, 4).transpose(0, 2, 1), self.local_centers, self.local_radii)
+        elif len(uids) > 0:
+            positions = np.fromiter((self.positions[uid] for uid in uids if uid in self.positions), dtype=np.int64)
+            if len(positions) > 0:
+                matrices = np.array([self.objects[position].matrix_world for position in positions.tolist()], dtype=np.float32)
+                self.centers[positions], self.radii[positions] = get_spheres(matrices, self.local_centers[positions], self.local_radii[positions])
+
+        self.moved.clear()
+        self.reshaped.clear()
+
+# Bounds indexes per view layer, keyed by the view layer pointer
+_bounds_indexes: dict[int, BoundsIndex] = {}
+# Session UIDs of the objects hidden by the last culling of each view layer, with the flag used, keyed by the view layer pointer
+_culled: dict[int, tuple[str, np.ndarray]] = {}
+
+def get_spheres(matrices: np.ndarray, local_centers: np.ndarray, local_radii: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Transforms bounding spheres to world space.
+
+    Parameters
+    ----------
+    matrices : np.ndarray
+        World matrices, of shape (count, 4, 4), row major.
+    local_centers : np.ndarray
+        Centers in object space, of shape (count, 3).
+    local_radii : np.ndarray
+        Radii in object space.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        The centers and radii in world space. Radii are scaled by the largest axis scale.
+    """
+
+    rotations = matrices[:, :3, :3]
+    centers = np.einsum('nij,nj->ni', rotations, local_centers) + matrices[:, :3, 3]
+    radii = local_radii * np.linalg.norm(rotations, axis=1).max(axis=1)
+    return centers, radii
+
+def get_bounds_index(view_layer: ViewLayer | None = None) -> BoundsIndex:
+    """
+    Retrieves the cached bounds index of a view layer, building or updating it if needed.
+
+    The index is built again if the objects of the view layer are not in the cached order anymore,
+    so its positions can be used with `view_layer.objects` until the data changes.
+
+    Parameters
+    ----------
+    view_layer : ViewLayer, optional
+        The view layer to get the index of. If None, the context view layer is used.
+
+    Returns
+    -------
+    BoundsIndex
+        The bounding spheres of every object of the view layer.
+    """
+
+    if view_layer == None:
+        view_layer = bpy.context.view_layer
+
+    # Matrices and flags are read and written by position, the cached order is checked first
+    objects, uids = get_object_index(view_layer, validate=True)
+
+    key = view_layer.as_pointer()
+    index = _bounds_indexes.get(key)
+    # A new object index means objects were added, removed or reordered
+    if index == None or index.objects is not objects:
+        index = BoundsIndex(objects, uids, view_layer)
+        _bounds_indexes[key] = index
+    else:
+        index.update(view_layer)
+
+    return index
+
+def get_frustum_planes(camera: Object, scene: Scene) -> np.ndarray:
+    """
+    Computes the planes bounding the view of a camera, between its clipping distances.
+
+    Parameters
+    ----------
+    camera : Object
+        The camera.
+    scene : Scene
+        The scene, whose render resolution gives the aspect ratio of the view.
+
+    Returns
+    -------
+    np.ndarray
+        Six (normal x, normal y, normal z, offset) planes in world space, of shape (6, 4).
+        Normals point inwards, a point p is inside a plane when normal . p + offset >= 0.
+    """
+
+    data = camera.data
+    # Top right, bottom right, bottom left and top left corners, in camera space
+    frame = np.array([tuple(corner) for corner in data.view_frame(scene=scene)], dtype=np.float64)
+    if data.type == 'ORTHO':
+        near = frame.copy()
+        near[:, 2] = -data.clip_start
+        far = frame.copy()
+        far[:, 2] = -data.clip_end
+    else:
+        near = frame * (data.clip_start / -frame[:, 2:3])
+        far = frame * (data.clip_end / -frame[:, 2:3])
+
+    matrix = np.array(camera.matrix_world, dtype=np.float64)
+    corners = np.vstack((near, far)) @ matrix[:3, :3].T + matrix[:3, 3]
+    inside = corners.mean(axis=0)
+
+    planes = np.empty((6, 4), dtype=np.float64)
+    faces = [(0, 1, 2), (4, 5, 6)] + [(side, (side + 1) % 4, side + 4) for side in range(4)]
+    for plane, (a, b, c) in enumerate(faces):
+        normal = np.cross(corners[b] - corners[a], corners[c] - corners[a])
+        normal /= np.linalg.norm(normal)
+        offset = -normal @ corners[a]
+        if normal @ inside + offset < 0:
+            normal, offset = -normal, -offset
+        planes[plane, :3] = normal
+        planes[plane, 3] = offset
+
+    return planes
+
+def get_outside_mask(index: BoundsIndex, camera: Object, scene: Scene, use_frustum: bool = True, max_distance: float = 0.0) -> np.ndarray:
+    """
+    Finds the objects outside of the view of a camera, or too far from it.
+
+    Parameters
+    ----------
+    index : BoundsIndex
+        The bounding spheres of the objects.
+    camera : Object
+        The camera.
+    scene : Scene
+        The scene of the camera.
+    use_frustum : bool, optional
+        Whether objects outside of the view of the camera are culled. Default is True.
+    max_distance : float, optional
+        Distance from the camera beyond which objects are culled. 0 culls none. Default is 0.
+
+    Returns
+    -------
+    np.ndarray
+        A boolean array aligned with the index, True for the culled objects.
+    """
+
+    outside = np.zeros(len(index.uids), dtype=bool)
+
+    if use_frustum:
+        planes = get_frustum_planes(camera, scene)
+        distances = index.centers @ planes[:, :3].T + planes[:, 3]
+        outside |= (distances < -index.radii[:, np.newaxis]).any(axis=1)
+
+    if max_distance > 0:
+        location = np.array(camera.matrix_world.translation, dtype=np.float64)
+        outside |= np.linalg.norm(index.centers - location, axis=1) - index.radii > max_distance
+
+    return outside & index.culled
+
+def set_object_flags(view_layer: ViewLayer, index: BoundsIndex, flag: str, hidden: np.ndarray, shown: np.ndarray) -> None:
+    """
+    Hides and shows objects of a bounds index with a flag.
+
+    Parameters
+    ----------
+    view_layer : ViewLayer
+        The view layer of the index.
+    index : BoundsIndex
+        The objects, as returned by `get_bounds_index` in the same call.
+    flag : str
+        One of the values of ISOLATE_FLAGS.
+    hidden : np.ndarray
+        Positions of the objects to hide.
+    shown : np.ndarray
+        Positions of the objects to show.
+
+    Returns
+    -------
+    None
+    """
+
+    if flag == 'hide_get':
+        # The per view layer state has no bulk access
+        for positions, value in ((hidden, True), (shown, False)):
+            for position in positions.tolist():
+                index.objects[position].hide_set(value, view_layer=view_layer)
+    elif len(hidden) + len(shown) > 0:
+        flags = get_flags(view_layer.objects, flag)
+        flags[hidden] = True
+        flags[shown] = False
+        write_flags(view_layer.objects, flag, flags, index.objects[(hidden if len(hidden) > 0 else shown)[0]])
+
+def cull(view_layer: ViewLayer, index: BoundsIndex, outside: np.ndarray, flag: str) -> list[tuple[str, str, np.ndarray, np.ndarray]]:
+    """
+    Hides the visible objects outside of the view, and shows the ones hidden by the last culling that are back in it.
+
+    Parameters
+    ----------
+    view_layer : ViewLayer
+        The view layer to cull in.
+    index : BoundsIndex
+        The bounding spheres of the objects of the view layer, as returned by `get_bounds_index` in the same call.
+    outside : np.ndarray
+        A boolean array aligned with the index, True for the culled objects.
+    flag : str
+        One of the values of ISOLATE_FLAGS.
+
+    Returns
+    -------
+    list[tuple[str, str, np.ndarray, np.ndarray]]
+        The flags that were changed with their previous values, as recorded by `undo.capture`.
+    """
+
+    changes = []
+    key = view_layer.as_pointer()
+    previous = _culled.pop(key, None)
+
+    if previous != None and previous[0] != flag:
+        # Culled with another hide method, shown again before culling with this one
+        shown = np.flatnonzero(np.isin(index.uids, previous[1]))
+        set_object_flags(view_layer, index, previous[0], np.empty(0, dtype=np.int64), shown)
+        changes.append((previous[0], 'Object', index.uids[shown], np.ones(len(shown), dtype=bool)))
+        previous = None
+
+    culled = np.zeros(len(index.uids), dtype=bool) if previous == None else np.isin(index.uids, previous[1])
+    shown = np.flatnonzero(culled & ~outside)
+    candidates = np.flatnonzero(outside & ~culled)
+
+    if flag == 'hide_get':
+        visible = np.fromiter((not index.objects[position].hide_get(view_layer=view_layer) for position in candidates.tolist()), dtype=bool, count=len(candidates))
+    else:
+        visible = ~get_flags(view_layer.objects, flag)[candidates]
+    hidden = candidates[visible]
+
+    set_object_flags(view_layer, index, flag, hidden, shown)
+
+    culled_uids = np.sort(np.concatenate((index.uids[culled & outside], index.uids[hidden])))
+    if len(culled_uids) > 0:
+        _culled[key] = (flag, culled_uids)
+
+    changes.append((flag, 'Object', index.uids[hidden], np.zeros(len(hidden), dtype=bool)))
+    changes.append((flag, 'Object', index.uids[shown], np.ones(len(shown), dtype=bool)))
+
+    return [change for change in changes if len(change[2]) > 0]
+
+def clear() -> None:
+    """
+    Drops every bounds index and forgets every culling.
+
+    Returns
+    -------
+    None
+    """
+
+    _bounds_indexes.clear()
+    _culled.clear()
+
+def mark_updates(depsgraph: Depsgraph) -> None:
+    """
+    Marks the objects updated by a depsgraph evaluation as moved or reshaped in every bounds index.
+
+    Parameters
+    ----------
+    depsgraph : Depsgraph
+        The evaluated dependency graph.
+
+    Returns
+    -------
+    None
+    """
+
+    if len(_bounds_indexes) == 0:
+        return
+
+    for update in depsgraph.updates:
+        id = update.id.original
+        if not isinstance(id, Object):
+            continue
+        if update.is_updated_geometry:
+            for index in _bounds_indexes.values():
+                index.reshaped.add(id.session_uid)
+        elif update.is_updated_transform:
+            for index in _bounds_indexes.values():
+                index.moved.add(id.session_uid)
+
+@persistent
+def on_depsgraph_update_post(scene: Scene, depsgraph: Depsgraph) -> None:
+    mark_updates(depsgraph)
+
+@persistent
+def on_frame_change_post(scene: Scene, depsgraph: Depsgraph) -> None:
+    # Animated objects are evaluated on frame changes, which do not call the depsgraph update handlers
+    mark_updates(depsgraph)
+
+@persistent
+def on_file_changed(*args) -> None:
+    # Loading a file or stepping through undo reallocates the data, cached pointers are not valid anymore
+    clear()
+
+class Cull(bpy.types.Operator):
+    """
+    Operator for hiding the objects outside of the view of the active camera, or too far from it.
+    """
+
+    bl_idname = OP_IDNAME_PREFIX + "." + "cull"
+    bl_label = "Hide - Cull"
+    bl_description = "Hide the objects outside of the view of the active camera or beyond a distance with the preferred hide method, and show again the culled objects back in view"
+    bl_options = set()
+
+    use_frustum : BoolProperty(
+        name = 'Camera view',
+        description = 'Hide the objects outside of the view of the camera',
+        default = True,
+    ) # type: ignore
+
+    max_distance : FloatProperty(
+        name = 'Distance',
+        description = 'Hide the objects farther from the camera. 0 to disable',
+        default = 0.0,
+        min = 0.0,
+        subtype = 'DISTANCE',
+        unit = 'LENGTH',
+    ) # type: ignore
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene != None and context.scene.camera != None and context.view_layer != None
+
+    def execute(self, context):
+        scene = context.scene
+        view_layer = context.view_layer
+        hide_method = get_hide_method()
+        undo_strategy = get_undo_strategy()
+
+        with operator_span(self.bl_idname) as op_span:
+            with span('index_update'):
+                index = get_bounds_index(view_layer)
+            op_span.count('objects', len(index.uids))
+
+            with span('cull'):
+                outside = get_outside_mask(index, scene.camera, scene, self.use_frustum, self.max_distance)
+
+            with span('apply'):
+                changes = cull(view_layer, index, outside, ISOLATE_FLAGS[hide_method])
+            op_span.count('changed', sum(len(uids) for _, _, uids, _ in changes))
+
+            if undo_strategy == 'VISIBILITY' and len(changes) > 0:
+                with span('undo_record'):
+                    undo.push(undo.VisibilityDelta(self.bl_label, scene.session_uid, view_layer.name, changes))
+
+            if uses_full_undo(hide_method, undo_strategy):
+                with span('undo_push'):
+                    push_undo(self.bl_label)
+
+        self.report({"INFO"}, f'{int(outside.sum())} objects culled')
+
+        return {"FINISHED"}
+
+handlers = (
+    (bpy.app.handlers.depsgraph_update_post, on_depsgraph_update_post),
+    (bpy.app.handlers.frame_change_post, on_frame_change_post),
+    (bpy.app.handlers.load_post, on_file_changed),
+    (bpy.app.handlers.undo_post, on_file_changed),
+    (bpy.app.handlers.redo_post, on_file_changed),
+)
+
+classes = (
+    Cull,
+)
+
+def register():
+    from bpy.utils import register_class
+    for cls in classes:
+        register_class(cls)
+
+    for handler_list, handler in handlers:
+        if handler not in handler_list:
+            handler_list.append(handler)
+
+def unregister():
+    for handler_list, handler in handlers:
+        if handler in handler_list:
+            handler_list.remove(handler)
+
+    clear()
+
+    from bpy.utils import unregister_class
+    for cls in reversed(classes):
+        unregister_class(cls)
@@ -0,0 +1,160 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+"""
+Lightweight stand-in for the parts of `bpy` used by `core`.
+
+It lets the selection and visibility logic run in plain CPython, e.g. under cProfile,
+py-spy or pytest, without a Blender build. Like `core`, this module must not import
+`bpy` nor use relative imports.
+
+    import core, fake_bpy
+    fake_bpy.make_scene(object_count=100000, collection_count=100)
+    sel = core.SelectionSnapshot.from_ids(fake_bpy.data.objects)
+"""
+
+from itertools import count
+from types import SimpleNamespace
+
+_session_uids = count(1)
+
+class RNA:
+    def __init__(self, identifier: str):
+        self.identifier = identifier
+
+class ID:
+    bl_rna = RNA('ID')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.session_uid = next(_session_uids)
+        self.hide_viewport = False
+        self.hide_render = False
+
+    def __repr__(self) -> str:
+        return f'<{self.bl_rna.identifier} "{self.name}">'
+
+class Object(ID):
+    bl_rna = RNA('Object')
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.parent: Object | None = None
+        self.users_collection: list[Collection] = []
+        # Per view layer states, keyed by view layer name
+        self._hidden: dict[str, bool] = {}
+        self._selected: dict[str, bool] = {}
+
+    def _get_view_layer_name(self, view_layer) -> str:
+        if view_layer == None:
+            view_layer = context.view_layer
+        return view_layer.name
+
+    def hide_get(self, view_layer=None) -> bool:
+        return self._hidden.get(self._get_view_layer_name(view_layer), False)
+
+    def hide_set(self, state: bool, view_layer=None) -> None:
+        self._hidden[self._get_view_layer_name(view_layer)] = state
+
+    def select_get(self, view_layer=None) -> bool:
+        return self._selected.get(self._get_view_layer_name(view_layer), False)
+
+    def select_set(self, state: bool, view_layer=None) -> None:
+        self._selected[self._get_view_layer_name(view_layer)] = state
+
+class Collection(ID):
+    bl_rna = RNA('Collection')
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.objects: list[Object] = []
+        self.children: list[Collection] = []
+
+class LayerCollection:
+    bl_rna = RNA('LayerCollection')
+
+    def __init__(self, collection: Collection):
+        self.collection = collection
+        self.name = collection.name
+        self.hide_viewport = False
+        self.exclude = False
+        self.children = [LayerCollection(child) for child in collection.children]
+
+class ViewLayer:
+    bl_rna = RNA('ViewLayer')
+
+    def __init__(self, name: str, scene_collection: Collection):
+        self.name = name
+        self.layer_collection = LayerCollection(scene_collection)
+
+class Scene(ID):
+    bl_rna = RNA('Scene')
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.collection = Collection('Scene Collection')
+        self.view_layers: list[ViewLayer] = []
+
+types = SimpleNamespace(
+    ID=ID,
+    Object=Object,
+    Collection=Collection,
+    LayerCollection=LayerCollection,
+    ViewLayer=ViewLayer,
+    Scene=Scene,
+)
+
+data = SimpleNamespace(objects=[], collections=[], scenes=[])
+context = SimpleNamespace(scene=None, view_layer=None)
+
+def make_scene(object_count: int, collection_count: int = 10, depth: int = 1, view_layer_count: int = 1) -> Scene:
+    """
+    Replaces the fake data with a new scene, and makes it the context scene.
+
+    Parameters
+    ----------
+    object_count : int
+        Number of objects to create.
+    collection_count : int, optional
+        Number of collections per nesting level. Default is 10.
+    depth : int, optional
+        Number of nested collection levels, each level holding `collection_count` collections. Default is 1.
+    view_layer_count : int, optional
+        Number of view layers of the scene. Default is 1.
+
+    Returns
+    -------
+    Scene
+        The new scene.
+    """
+
+    scene = Scene('Scene')
+
+    collections = []
+    parent = scene.collection
+    for level in range(depth):
+        level_collections = [Collection(f'Collection_{level}_{index:04d}') for index in range(collection_count)]
+        parent.children.extend(level_collections)
+        collections.extend(level_collections)
+        parent = level_collections[0]
+
+    objects = []
+    for index in range(object_count):
+        obj = Object(f'Object_{index:06d}')
+        collection = collections[index % len(collections)]
+        collection.objects.append(obj)
+        obj.users_collection.append(collection)
+        objects.append(obj)
+
+    scene.view_layers = [ViewLayer(f'ViewLayer_{index}', scene.collection) for index in range(view_layer_count)]
+
+    data.objects = objects
+    data.collections = collections
+    data.scenes = [scene]
+    context.scene = scene
+    context.view_layer = scene.view_layers[0]
+
+    return scene
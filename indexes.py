@@ -0,0 +1,356 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+from typing import Iterable, Mapping
+
+import numpy as np
+
+import bpy
+from bpy.app.handlers import persistent
+from bpy.types import Area, Collection, LayerCollection, Object, Region, Screen, Space, ViewLayer, Depsgraph, Scene
+
+from .core import build_layer_collection_index
+
+# Layer collection indexes per view layer, keyed by the view layer pointer
+_layer_collection_indexes: dict[int, dict[Collection, LayerCollection]] = {}
+# Objects of each view layer with their session UIDs, keyed by the view layer pointer
+_object_indexes: dict[int, tuple[tuple[Object], np.ndarray]] = {}
+
+class ScreenAreas:
+    """
+    Outliners and 3D Viewports of a screen, with what is needed to read their selection.
+
+    Attributes
+    ----------
+    fingerprint : tuple[tuple[int, str]]
+        Pointer and type of every area of the screen when it was indexed.
+    outliners : tuple[tuple[Area, Region, Space]]
+        The Outliner areas, with their main region and active space.
+    viewports : tuple[tuple[Area, Region, Space]]
+        The 3D Viewport areas, with their main region and active space.
+    """
+
+    __slots__ = ('fingerprint', 'outliners', 'viewports')
+
+    def __init__(self, fingerprint: tuple[tuple[int, str]], outliners: tuple[tuple[Area, Region, Space]], viewports: tuple[tuple[Area, Region, Space]]):
+        self.fingerprint = fingerprint
+        self.outliners = outliners
+        self.viewports = viewports
+
+# Areas of each screen, keyed by the screen pointer
+_screen_areas: dict[int, ScreenAreas] = {}
+
+class ParentIndex:
+    """
+    Children of every object of the file, built in one pass and updated as objects are reparented.
+
+    Attributes
+    ----------
+    valid : bool
+        False until built, and after being invalidated.
+    objects : dict[int, Object]
+        Every object, keyed by session UID.
+    parents : dict[int, int]
+        Session UID of the parent of every parented object, keyed by the object session UID.
+    children : dict[int, set[int]]
+        Session UIDs of the direct children of every parent, keyed by the parent session UID.
+    """
+
+    __slots__ = ('valid', 'objects', 'parents', 'children')
+
+    def __init__(self):
+        self.valid = False
+        self.objects: dict[int, Object] = {}
+        self.parents: dict[int, int] = {}
+        self.children: dict[int, set[int]] = {}
+
+    def build(self) -> None:
+        self.objects = {}
+        self.parents = {}
+        self.children = {}
+        for obj in bpy.data.objects:
+            uid = obj.session_uid
+            self.objects[uid] = obj
+            parent = obj.parent
+            if parent != None:
+                self.parents[uid] = parent.session_uid
+                self.children.setdefault(parent.session_uid, set()).add(uid)
+        self.valid = True
+
+    def ensure(self) -> None:
+        # The length check catches objects added or removed since the last update
+        if not self.valid or len(self.objects) != len(bpy.data.objects):
+            self.build()
+
+    def invalidate(self) -> None:
+        self.valid = False
+        self.objects = {}
+        self.parents = {}
+        self.children = {}
+
+    def update_object(self, obj: Object) -> None:
+        """
+        Moves an object under its current parent, if it changed.
+
+        Parameters
+        ----------
+        obj : Object
+            The updated object.
+
+        Returns
+        -------
+        None
+        """
+
+        uid = obj.session_uid
+        if uid not in self.objects:
+            # Added since the last build, the next ensure rebuilds everything
+            self.valid = False
+            return
+
+        parent = obj.parent
+        parent_uid = None if parent == None else parent.session_uid
+        previous_uid = self.parents.get(uid)
+        if parent_uid == previous_uid:
+            return
+
+        if previous_uid != None:
+            siblings = self.children[previous_uid]
+            siblings.discard(uid)
+            if len(siblings) == 0:
+                del self.children[previous_uid]
+            del self.parents[uid]
+        if parent_uid != None:
+            self.parents[uid] = parent_uid
+            self.children.setdefault(parent_uid, set()).add(uid)
+
+    def get_descendants(self, objects: Iterable[Object]) -> list[Object]:
+        """
+        Retrieves the children of objects, at any depth, in a single traversal shared by all of them.
+
+        Parameters
+        ----------
+        objects : Iterable[Object]
+            The root objects.
+
+        Returns
+        -------
+        list[Object]
+            The descendants that are not themselves among the roots, each listed once.
+        """
+
+        self.ensure()
+
+        visited = {obj.session_uid for obj in objects}
+        pending = [uid for uid in visited if uid in self.children]
+        descendants = []
+        while len(pending) > 0:
+            for child_uid in self.children.get(pending.pop(), ()):
+                if child_uid not in visited:
+                    visited.add(child_uid)
+                    descendants.append(self.objects[child_uid])
+                    pending.append(child_uid)
+
+        return descendants
+
+parent_index = ParentIndex()
+
+def get_layer_collection_index(view_layer: ViewLayer | None = None) -> Mapping[Collection, LayerCollection]:
+    """
+    Retrieves the cached layer collection index of a view layer, building it if needed.
+
+    Parameters
+    ----------
+    view_layer : ViewLayer, optional
+        The view layer to get the index of. If None, the context view layer is used.
+
+    Returns
+    -------
+    Mapping[Collection, LayerCollection]
+        A mapping where keys are collections and values are their layer collections.
+    """
+
+    if view_layer == None:
+        view_layer = bpy.context.view_layer
+
+    key = view_layer.as_pointer()
+    index = _layer_collection_indexes.get(key)
+    if index == None:
+        index = build_layer_collection_index(view_layer)
+        _layer_collection_indexes[key] = index
+
+    return index
+
+def get_layer_collection(collection: Collection, view_layer: ViewLayer | None = None) -> LayerCollection | None:
+    """
+    Retrieves the layer collection of a collection.
+
+    Parameters
+    ----------
+    collection : Collection
+        The collection to look up.
+    view_layer : ViewLayer, optional
+        The view layer to look into. If None, the context view layer is used.
+
+    Returns
+    -------
+    LayerCollection | None
+        The layer collection, or None if the collection is not in the view layer.
+    """
+
+    return get_layer_collection_index(view_layer).get(collection)
+
+def get_object_index(view_layer: ViewLayer | None = None, validate: bool = False) -> tuple[tuple[Object], np.ndarray]:
+    """
+    Retrieves the cached objects of a view layer and their session UIDs, building them if needed.
+
+    Parameters
+    ----------
+    view_layer : ViewLayer, optional
+        The view layer to get the index of. If None, the context view layer is used.
+    validate : bool, optional
+        If True, the cached session UIDs are compared to a fresh `foreach_get` and the index is built
+        again if they differ. Needed before reading or writing flags by position. Default is False.
+
+    Returns
+    -------
+    tuple[tuple[Object], np.ndarray]
+        The objects, in the order of `view_layer.objects`, and an int32 array of their session UIDs.
+    """
+
+    if view_layer == None:
+        view_layer = bpy.context.view_layer
+
+    key = view_layer.as_pointer()
+    index = _object_indexes.get(key)
+    objects = view_layer.objects
+    uids = None
+
+    # Objects can be reordered or replaced without a collection update being reported yet
+    if index != None and validate:
+        uids = np.empty(len(objects), dtype=np.int32)
+        objects.foreach_get('session_uid', uids)
+        if not np.array_equal(uids, index[1]):
+            index = None
+
+    # The length check catches objects linked or unlinked without a collection update being reported yet
+    if index == None or len(index[0]) != len(objects):
+        if uids is None or len(uids) != len(objects):
+            uids = np.empty(len(objects), dtype=np.int32)
+            objects.foreach_get('session_uid', uids)
+        index = (tuple(objects[:]), uids)
+        _object_indexes[key] = index
+
+    return index
+
+def get_screen_areas(screen: Screen | None = None) -> ScreenAreas:
+    """
+    Retrieves the cached Outliners and 3D Viewports of a screen, indexing them again when its areas changed.
+
+    Parameters
+    ----------
+    screen : Screen, optional
+        The screen to get the areas of. If None, the context screen is used.
+
+    Returns
+    -------
+    ScreenAreas
+        The Outliners and 3D Viewports of the screen.
+    """
+
+    if screen == None:
+        screen = bpy.context.screen
+
+    # Splitting, joining or changing the type of an area changes the fingerprint
+    areas = screen.areas
+    fingerprint = tuple((area.as_pointer(), area.type) for area in areas)
+
+    key = screen.as_pointer()
+    screen_areas = _screen_areas.get(key)
+    if screen_areas == None or screen_areas.fingerprint != fingerprint:
+        screen_areas = ScreenAreas(
+            fingerprint,
+            tuple((area, area.regions[-1], area.spaces[0]) for area in areas if area.type == 'OUTLINER'),
+            tuple((area, area.regions[-1], area.spaces[0]) for area in areas if area.type == 'VIEW_3D'),
+        )
+        _screen_areas[key] = screen_areas
+
+    return screen_areas
+
+def invalidate_screen_areas() -> None:
+    """
+    Drops the cached areas of every screen, they will be indexed again on next use.
+
+    Returns
+    -------
+    None
+    """
+
+    _screen_areas.clear()
+
+def invalidate_indexes() -> None:
+    """
+    Drops every cached index, they will be rebuilt on next use.
+
+    Returns
+    -------
+    None
+    """
+
+    _layer_collection_indexes.clear()
+    _object_indexes.clear()
+    invalidate_screen_areas()
+    parent_index.invalidate()
+
+@persistent
+def on_depsgraph_update_post(scene: Scene, depsgraph: Depsgraph) -> None:
+    # Collections being linked, unlinked, added or removed tag either the collections or the scene
+    if depsgraph.id_type_updated('COLLECTION') or depsgraph.id_type_updated('SCENE'):
+        _layer_collection_indexes.clear()
+        _object_indexes.clear()
+
+    if parent_index.valid and depsgraph.id_type_updated('OBJECT'):
+        # Parenting tags the transform of the child, which is reported as an object update
+        for update in depsgraph.updates:
+            id = update.id.original
+            if isinstance(id, Object):
+                parent_index.update_object(id)
+                if not parent_index.valid:
+                    break
+
+@persistent
+def on_file_changed(*args) -> None:
+    # Loading a file or stepping through undo reallocates the data, cached pointers are not valid anymore
+    invalidate_indexes()
+
+handlers = (
+    (bpy.app.handlers.depsgraph_update_post, on_depsgraph_update_post),
+    (bpy.app.handlers.load_post, on_file_changed),
+    (bpy.app.handlers.undo_post, on_file_changed),
+    (bpy.app.handlers.redo_post, on_file_changed),
+)
+
+classes = ()
+
+def register():
+    from bpy.utils import register_class
+    for cls in classes:
+        register_class(cls)
+
+    for handler_list, handler in handlers:
+        if handler not in handler_list:
+            handler_list.append(handler)
+
+def unregister():
+    for handler_list, handler in handlers:
+        if handler in handler_list:
+            handler_list.remove(handler)
+
+    invalidate_indexes()
+
+    from bpy.utils import unregister_class
+    for cls in reversed(classes):
+        unregister_class(cls)
@@ -0,0 +1,357 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+import json
+from bisect import bisect_left
+from collections import deque
+from time import perf_counter
+from typing import Any
+
+import bpy
+from bpy.app.handlers import persistent
+from bpy.props import StringProperty
+
+from .constants import OP_IDNAME_PREFIX
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+HISTOGRAM_BUCKETS_MS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0, 2500.0, 5000.0)
+
+# Number of operator calls kept with their full span tree
+MAX_TRACES = 100
+
+_enabled: bool = False
+_stack: list['Span'] = []
+_traces: deque['Span'] = deque(maxlen=MAX_TRACES)
+_histograms: dict[str, 'Histogram'] = {}
+# Start of the undo or redo step being loaded, 0.0 if none is timed
+_undo_start: float = 0.0
+
+class Histogram:
+    """
+    Latency histogram of an operator.
+    """
+
+    __slots__ = ('buckets', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def add(self, duration: float) -> None:
+        duration_ms = duration * 1000.0
+        self.buckets[bisect_left(HISTOGRAM_BUCKETS_MS, duration_ms)] += 1
+        self.count += 1
+        self.total += duration_ms
+        self.min = min(self.min, duration_ms)
+        self.max = max(self.max, duration_ms)
+
+    def to_dict(self) -> dict[str, Any]:
+        labels = [f'<={bound}' for bound in HISTOGRAM_BUCKETS_MS] + [f'>{HISTOGRAM_BUCKETS_MS[-1]}']
+        return {
+            'count' : self.count,
+            'total_ms' : self.total,
+            'mean_ms' : self.total / self.count if self.count else 0.0,
+            'min_ms' : self.min if self.count else 0.0,
+            'max_ms' : self.max,
+            'buckets_ms' : dict(zip(labels, self.buckets)),
+        }
+
+class Span:
+    """
+    Timed section of code. Spans opened while another one is open are nested in it.
+    """
+
+    __slots__ = ('name', 'is_operator', 'counts', 'children', 'start', 'duration')
+
+    def __init__(self, name: str, is_operator: bool = False):
+        self.name = name
+        self.is_operator = is_operator
+        self.counts: dict[str, int] = {}
+        self.children: list[Span] = []
+        self.start = 0.0
+        self.duration = 0.0
+
+    def __enter__(self) -> 'Span':
+        _stack.append(self)
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self.duration = perf_counter() - self.start
+        _stack.pop()
+
+        if _stack:
+            _stack[-1].children.append(self)
+        else:
+            _traces.append(self)
+
+        if self.is_operator:
+            _histograms.setdefault(self.name, Histogram()).add(self.duration)
+
+        return False
+
+    def count(self, name: str, value: int) -> None:
+        """
+        Attaches a count to the span, e.g. the number of selected IDs.
+        """
+
+        self.counts[name] = value
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'name' : self.name,
+            'duration_ms' : self.duration * 1000.0,
+            'counts' : self.counts,
+            'children' : [child.to_dict() for child in self.children],
+        }
+
+class NullSpan:
+    """
+    Span used while instrumentation is disabled, it records nothing.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self) -> 'NullSpan':
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+    def count(self, name: str, value: int) -> None:
+        pass
+
+NULL_SPAN = NullSpan()
+
+def span(name: str) -> Span | NullSpan:
+    """
+    Opens a timing span, to be used as a context manager.
+
+    Parameters
+    ----------
+    name : str
+        Name of the span, e.g. 'apply'.
+
+    Returns
+    -------
+    Span | NullSpan
+        A recording span, or a shared no-op span if instrumentation is disabled.
+    """
+
+    if _enabled:
+        return Span(name)
+    return NULL_SPAN
+
+def operator_span(bl_idname: str) -> Span | NullSpan:
+    """
+    Opens the root timing span of an operator call, its duration goes to the operator latency histogram.
+
+    Parameters
+    ----------
+    bl_idname : str
+        The operator idname.
+
+    Returns
+    -------
+    Span | NullSpan
+        A recording span, or a shared no-op span if instrumentation is disabled.
+    """
+
+    if _enabled:
+        return Span(bl_idname, is_operator=True)
+    return NULL_SPAN
+
+def debug(message: str) -> None:
+    """
+    Prints a debug message, only while instrumentation is enabled.
+
+    Parameters
+    ----------
+    message : str
+        The message to print.
+
+    Returns
+    -------
+    None
+    """
+
+    if _enabled:
+        print(message)
+
+def is_enabled() -> bool:
+    return _enabled
+
+def set_enabled(state: bool) -> None:
+    """
+    Enables or disables instrumentation.
+
+    Parameters
+    ----------
+    state : bool
+        True to record spans and print debug messages.
+
+    Returns
+    -------
+    None
+    """
+
+    global _enabled
+    _enabled = state
+
+def clear() -> None:
+    """
+    Drops every recorded span and histogram.
+
+    Returns
+    -------
+    None
+    """
+
+    _traces.clear()
+    _histograms.clear()
+
+def get_report() -> dict[str, Any]:
+    """
+    Retrieves everything recorded so far.
+
+    Returns
+    -------
+    dict[str, Any]
+        The latency histogram of each operator and of undo and redo steps, and the span trees of the last calls.
+    """
+
+    return {
+        'histograms' : {name: histogram.to_dict() for name, histogram in _histograms.items()},
+        'traces' : [trace.to_dict() for trace in _traces],
+    }
+
+def export_report(filepath: str) -> None:
+    """
+    Writes everything recorded so far to a JSON file.
+
+    Parameters
+    ----------
+    filepath : str
+        Path of the JSON file to write.
+
+    Returns
+    -------
+    None
+    """
+
+    with open(filepath, 'w') as file:
+        json.dump(get_report(), file, indent=4)
+
+@persistent
+def on_undo_pre(*args) -> None:
+    global _undo_start
+    _undo_start = perf_counter() if _enabled else 0.0
+
+@persistent
+def on_undo_post(*args) -> None:
+    # Undo steps are loaded by Blender after the operators returned, so they are timed from its handlers
+    global _undo_start
+    if _enabled and _undo_start > 0.0:
+        _histograms.setdefault('ed.undo', Histogram()).add(perf_counter() - _undo_start)
+    _undo_start = 0.0
+
+@persistent
+def on_redo_post(*args) -> None:
+    global _undo_start
+    if _enabled and _undo_start > 0.0:
+        _histograms.setdefault('ed.redo', Histogram()).add(perf_counter() - _undo_start)
+    _undo_start = 0.0
+
+class ExportInstrumentation(bpy.types.Operator):
+    """
+    Operator for exporting the recorded timings to a JSON file.
+    """
+
+    bl_idname = OP_IDNAME_PREFIX + "." + "exportinstrumentation"
+    bl_label = "Hide - Export timings"
+    bl_description = "Export the recorded timings to a JSON file"
+    bl_options = {"INTERNAL"}
+
+    filepath : StringProperty(
+        name = 'filepath',
+        subtype = 'FILE_PATH',
+    ) # type: ignore
+
+    filter_glob : StringProperty(
+        default = '*.json',
+        options = {"HIDDEN"},
+    ) # type: ignore
+
+    @classmethod
+    def poll(cls, context):
+        return True
+
+    def invoke(self, context, event):
+        if not self.filepath:
+            self.filepath = 'hide_timings.json'
+        context.window_manager.fileselect_add(self)
+        return {"RUNNING_MODAL"}
+
+    def execute(self, context):
+        export_report(bpy.path.abspath(self.filepath))
+        self.report({"INFO"}, f'Timings exported to "{self.filepath}"')
+
+        return {"FINISHED"}
+
+class ClearInstrumentation(bpy.types.Operator):
+    """
+    Operator for clearing the recorded timings.
+    """
+
+    bl_idname = OP_IDNAME_PREFIX + "." + "clearinstrumentation"
+    bl_label = "Hide - Clear timings"
+    bl_description = "Clear the recorded timings"
+    bl_options = {"INTERNAL"}
+
+    @classmethod
+    def poll(cls, context):
+        return True
+
+    def execute(self, context):
+        clear()
+
+        return {"FINISHED"}
+
+handlers = (
+    (bpy.app.handlers.undo_pre, on_undo_pre),
+    (bpy.app.handlers.undo_post, on_undo_post),
+    (bpy.app.handlers.redo_pre, on_undo_pre),
+    (bpy.app.handlers.redo_post, on_redo_post),
+)
+
+classes = (
+    ExportInstrumentation,
+    ClearInstrumentation,
+)
+
+def register():
+    from bpy.utils import register_class
+    for cls in classes:
+        register_class(cls)
+
+    for handler_list, handler in handlers:
+        if handler not in handler_list:
+            handler_list.append(handler)
+
+def unregister():
+    for handler_list, handler in handlers:
+        if handler in handler_list:
+            handler_list.remove(handler)
+
+    set_enabled(False)
+    clear()
+
+    from bpy.utils import unregister_class
+    for cls in reversed(classes):
+        unregister_class(cls)
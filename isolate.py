@@ -0,0 +1,297 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+import numpy as np
+
+import bpy
+from bpy.app.handlers import persistent
+from bpy.types import Scene, ViewLayer
+
+from .constants import OP_IDNAME_PREFIX
+from . import undo
+from .core import SelectionSnapshot
+from .indexes import get_object_index
+from .instrumentation import (span,
+                              operator_span,
+                             )
+from .operators import (get_sel_snapshot,
+                        get_include_children,
+                        with_children,
+                        get_hide_method,
+                        get_undo_strategy,
+                        uses_full_undo,
+                        push_undo,
+                       )
+from .visibility import (get_flags,
+                         write_flags,
+                        )
+
+# Flag changed by each hide method on the objects outside of the selection
+ISOLATE_FLAGS = {
+    'HIDEINVIEWPORT' : 'hide_get',
+    'DISABLEINVIEWPORTS' : 'hide_viewport',
+    'DISABLEINRENDERS' : 'hide_render',
+    'PERFORMANCE' : 'hide_viewport',
+}
+
+# Active isolation of each scene, keyed by scene session UID.
+# Values are the flags changed by the isolation, and the sorted session UIDs of the objects it kept visible.
+_isolations: dict[int, tuple[undo.VisibilityDelta, np.ndarray]] = {}
+
+def get_kept_uids(sel: SelectionSnapshot) -> np.ndarray:
+    """
+    Retrieves the session UIDs of the objects a selection keeps visible.
+
+    Objects of the selected collections, at any nesting depth, are considered selected.
+
+    Parameters
+    ----------
+    sel : SelectionSnapshot
+        The selection.
+
+    Returns
+    -------
+    np.ndarray
+        Sorted unique session UIDs.
+    """
+
+    kept = set(sel.uids_per_type.get('Object', ()))
+    for collection in sel.collections:
+        kept.update(obj.session_uid for obj in collection.all_objects)
+
+    return np.unique(np.fromiter(kept, dtype=np.int32, count=len(kept)))
+
+def get_complement_mask(sel: SelectionSnapshot, uids: np.ndarray) -> np.ndarray:
+    """
+    Builds the mask of the objects that are outside of a selection.
+
+    Parameters
+    ----------
+    sel : SelectionSnapshot
+        The selection.
+    uids : np.ndarray
+        Session UIDs of the objects to mask, e.g. from `get_object_index`.
+
+    Returns
+    -------
+    np.ndarray
+        A boolean array, True where the object is not selected.
+    """
+
+    return ~np.isin(uids, get_kept_uids(sel), assume_unique=True)
+
+def merge_changes(first: list[tuple[str, str, np.ndarray, np.ndarray]], second: list[tuple[str, str, np.ndarray, np.ndarray]]) -> list[tuple[str, str, np.ndarray, np.ndarray]]:
+    """
+    Combines the flags changed by two successive calls into the flags changed by both.
+
+    Every recorded flag was flipped, so a flag changed by both calls is back to its first value.
+
+    Parameters
+    ----------
+    first : list[tuple[str, str, np.ndarray, np.ndarray]]
+        The flags changed by the first call, with their previous values.
+    second : list[tuple[str, str, np.ndarray, np.ndarray]]
+        The flags changed by the second call, with their previous values.
+
+    Returns
+    -------
+    list[tuple[str, str, np.ndarray, np.ndarray]]
+        The flags changed by both calls, with their values before the first one.
+    """
+
+    merged = []
+    for changes, others in ((first, second), (second, first)):
+        for flag, id_type, uids, values in changes:
+            other_uids = [other for other_flag, other_type, other, _ in others if other_flag == flag and other_type == id_type]
+            if len(other_uids) > 0:
+                mask = ~np.isin(uids, np.concatenate(other_uids))
+                uids, values = uids[mask], values[mask]
+            if len(uids) > 0:
+                merged.append((flag, id_type, uids, values))
+    return merged
+
+def isolate(sel: SelectionSnapshot, hide_method: str, view_layer: ViewLayer | None = None) -> list[tuple[str, str, np.ndarray, np.ndarray]]:
+    """
+    Hides every object of a view layer outside of a selection, with a hide method.
+
+    Parameters
+    ----------
+    sel : SelectionSnapshot
+        The selection to keep visible.
+    hide_method : str
+        One of the keys of ISOLATE_FLAGS.
+    view_layer : ViewLayer, optional
+        The view layer to isolate in. If None, the context view layer is used.
+
+    Returns
+    -------
+    list[tuple[str, str, np.ndarray, np.ndarray]]
+        The flags that were changed with their previous values, as recorded by `undo.capture`.
+    """
+
+    if view_layer == None:
+        view_layer = bpy.context.view_layer
+
+    flag = ISOLATE_FLAGS[hide_method]
+    # Flags are read and written by position, the cached order is checked first
+    objects, uids = get_object_index(view_layer, validate=True)
+
+    with span('complement'):
+        complement = np.flatnonzero(get_complement_mask(sel, uids))
+
+    with span('apply'):
+        if flag == 'hide_get':
+            # The per view layer state has no bulk access, only visible objects are touched
+            changed = np.fromiter((not objects[index].hide_get(view_layer=view_layer) for index in complement.tolist()), dtype=bool, count=len(complement))
+            changed = complement[changed]
+            for index in changed.tolist():
+                objects[index].hide_set(True, view_layer=view_layer)
+        else:
+            flags = get_flags(view_layer.objects, flag)
+            changed = complement[~flags[complement]]
+            if len(changed) > 0:
+                flags[changed] = True
+                write_flags(view_layer.objects, flag, flags, objects[changed[0]])
+
+    return [(flag, 'Object', uids[changed], np.zeros(len(changed), dtype=bool))]
+
+def get_isolation(scene: Scene | None = None) -> tuple[undo.VisibilityDelta, np.ndarray] | None:
+    """
+    Retrieves the active isolation of a scene.
+
+    Parameters
+    ----------
+    scene : Scene, optional
+        The scene to look into. If None, the context scene is used.
+
+    Returns
+    -------
+    tuple[undo.VisibilityDelta, np.ndarray] | None
+        The flags changed by the isolation with their previous values, and the sorted session UIDs of
+        the objects it kept visible, or None if the scene is not isolated.
+    """
+
+    if scene == None:
+        scene = bpy.context.scene
+
+    return _isolations.get(scene.session_uid)
+
+def clear() -> None:
+    """
+    Forgets every active isolation.
+
+    Returns
+    -------
+    None
+    """
+
+    _isolations.clear()
+
+@persistent
+def on_load_post(*args) -> None:
+    clear()
+
+@persistent
+def on_undo_post(*args) -> None:
+    # Regular undo steps keep the session UIDs, an isolation is only dropped once its objects
+    # are gone or were shown again, e.g. by undoing the isolation itself
+    for scene_uid, (delta, _) in list(_isolations.items()):
+        if not undo.is_current(delta):
+            del _isolations[scene_uid]
+
+class Isolate(bpy.types.Operator):
+    """
+    Operator for hiding everything but the selection, or showing again what was hidden.
+
+    When already isolated, the isolation is reverted if nothing is selected or the selection is the isolated one.
+    Otherwise the new selection is isolated instead, in a single step.
+    """
+
+    bl_idname = OP_IDNAME_PREFIX + "." + "isolate"
+    bl_label = "Hide - Isolate"
+    bl_description = "Hide every object outside of the selection with the preferred hide method. When already isolated, isolate the new selection, or show the hidden objects again if the selection did not change"
+    bl_options = set()
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene != None and context.view_layer != None
+
+    def execute(self, context):
+        scene = context.scene
+        view_layer = context.view_layer
+        hide_method = get_hide_method()
+        undo_strategy = get_undo_strategy()
+
+        with operator_span(self.bl_idname) as op_span:
+            isolation = get_isolation(scene)
+
+            with span('selection_gather'):
+                sel = get_sel_snapshot()
+                if get_include_children():
+                    sel = with_children(sel, view_layer)
+                kept_uids = get_kept_uids(sel)
+            op_span.count('collections', len(sel.collections))
+            op_span.count('objects', len(sel.objects))
+
+            if isolation == None and len(sel) == 0:
+                self.report({"WARNING"}, 'Nothing selected')
+                return {"CANCELLED"}
+
+            changes = []
+            if isolation != None:
+                delta, isolated_uids = isolation
+                with span('apply'):
+                    undo.apply_delta(delta)
+                changes = delta.inverted().changes
+                del _isolations[scene.session_uid]
+
+            # Isolates the selection, unless it is the one that was just reverted
+            if len(sel) > 0 and (isolation == None or not np.array_equal(kept_uids, isolated_uids)):
+                isolate_changes = isolate(sel, hide_method, view_layer)
+                _isolations[scene.session_uid] = (undo.VisibilityDelta(self.bl_label, scene.session_uid, view_layer.name, isolate_changes), kept_uids)
+                changes = merge_changes(changes, isolate_changes)
+
+            op_span.count('changed', sum(len(uids) for _, _, uids, _ in changes))
+
+            if undo_strategy == 'VISIBILITY' and len(changes) > 0:
+                with span('undo_record'):
+                    undo.push(undo.VisibilityDelta(self.bl_label, scene.session_uid, view_layer.name, changes))
+
+            if uses_full_undo(hide_method, undo_strategy):
+                with span('undo_push'):
+                    push_undo(self.bl_label)
+
+        return {"FINISHED"}
+
+handlers = (
+    (bpy.app.handlers.load_post, on_load_post),
+    (bpy.app.handlers.undo_post, on_undo_post),
+    (bpy.app.handlers.redo_post, on_undo_post),
+)
+
+classes = (
+    Isolate,
+)
+
+def register():
+    from bpy.utils import register_class
+    for cls in classes:
+        register_class(cls)
+
+    for handler_list, handler in handlers:
+        if handler not in handler_list:
+            handler_list.append(handler)
+
+def unregister():
+    for handler_list, handler in handlers:
+        if handler in handler_list:
+            handler_list.remove(handler)
+
+    clear()
+
+    from bpy.utils import unregister_class
+    for cls in reversed(classes):
+        unregister_class(cls)
@@ -4,9 +4,10 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
 
-from typing import Any, Iterable
+from typing import Any, Callable, Iterable
 
 import bpy
+from bpy.app.handlers import persistent
 from bpy.types import (KeyMap,
                        KeyMapItem
                       )
@@ -14,10 +15,132 @@ from bpy.types import (KeyMap,
 from .constants import (OP_IDNAME_PREFIX,
                         DEFAULT_KMI_LIST,
                        )
+from .instrumentation import debug
 
-addon_keymaps: list[tuple[KeyMap,KeyMapItem]] = []
+# KeyMapItems added by the addon, keyed by internal ID
+addon_keymaps: dict[int, list[tuple[KeyMap,KeyMapItem]]] = {}
 
-def get_user_kmis(internal_only = False, internal_id: int | None = None) -> dict[str, list[KeyMapItem]]:
+# Default KeyMapItem definitions, keyed by internal ID
+DEFAULT_KMI_DEFS: dict[int, dict[str, Any]] = {kmi_def['id']: kmi_def for kmi_def in DEFAULT_KMI_LIST}
+
+class KeymapRegistry:
+    """
+    Index of the addon KeyMapItems found in the user keyconfig.
+
+    The keyconfig is scanned once, then lookups by internal ID or by keymap name are dictionary accesses.
+    The index stores keymap names and KeyMapItem ids, resolved on each lookup, so it never holds
+    KeyMapItems that were removed or rebuilt since. A miss rebuilds it.
+
+    The index is also rebuilt on next use after `invalidate`, or when a generation key of the keyconfig changes.
+    The key is read without walking the KeyMapItems, it changes when an addon is enabled or disabled, which
+    copies the user keyconfig again, when keymaps are added, or when items are added to or removed from a
+    keymap holding addon items. Changes made through the addon invalidate it.
+    """
+
+    def __init__(self):
+        # (keymap name, KeyMapItem id, internal ID) of every addon KeyMapItem
+        self._entries: list[tuple[str, int, int | None]] = []
+        self._by_id: dict[int, list[tuple[str, int, int | None]]] = {}
+        self._by_km: dict[str, list[tuple[str, int, int | None]]] = {}
+        # Keymaps whose item count is part of the generation key
+        self._watched_km_names: tuple[str] = tuple(sorted({kmi_def['parms']['km_name'] for kmi_def in DEFAULT_KMI_LIST}))
+        self._generation_key: tuple | None = None
+        self._valid = False
+        # Incremented on every rebuild, so derived caches can tell when they are stale
+        self.generation = 0
+
+    def invalidate(self) -> None:
+        self._valid = False
+
+    def _get_generation_key(self, user_kc) -> tuple:
+        keymaps = user_kc.keymaps
+        item_counts = []
+        for km_name in self._watched_km_names:
+            km = keymaps.get(km_name)
+            item_counts.append(-1 if km == None else len(km.keymap_items))
+
+        return (
+            user_kc.as_pointer(),
+            len(bpy.context.preferences.addons),
+            len(keymaps),
+            tuple(item_counts),
+        )
+
+    def _build(self, user_kc) -> None:
+        self._entries.clear()
+        self._by_id.clear()
+        self._by_km.clear()
+
+        prefix = OP_IDNAME_PREFIX + '.'
+        km: KeyMap
+        for km in user_kc.keymaps:
+            kmi: KeyMapItem
+            for kmi in km.keymap_items:
+                if kmi.idname.startswith(prefix):
+                    internal_id = getattr(kmi.properties, 'internal_id', None)
+                    entry = (km.name, kmi.id, internal_id)
+                    self._entries.append(entry)
+                    self._by_km.setdefault(km.name, []).append(entry)
+                    if internal_id != None:
+                        self._by_id.setdefault(internal_id, []).append(entry)
+
+        self._watched_km_names = tuple(sorted(set(self._watched_km_names) | self._by_km.keys()))
+        self._generation_key = self._get_generation_key(user_kc)
+        self._valid = True
+        self.generation += 1
+
+    def ensure(self) -> bool:
+        """
+        Rebuilds the index if needed.
+
+        Returns
+        -------
+        bool
+            False if there is no user keyconfig.
+        """
+
+        user_kc = bpy.context.window_manager.keyconfigs.user
+        if user_kc is None:
+            return False
+
+        if not self._valid or self._get_generation_key(user_kc) != self._generation_key:
+            self._build(user_kc)
+
+        return True
+
+    def _resolve(self, get_entries: Callable[[], list[tuple[str, int, int | None]]]) -> list[tuple[str, KeyMapItem, int | None]]:
+        # The index is rebuilt once if an item cannot be found anymore
+        resolved = []
+        for _ in range(2):
+            if not self.ensure():
+                return []
+
+            keymaps = bpy.context.window_manager.keyconfigs.user.keymaps
+            resolved = []
+            for km_name, kmi_id, internal_id in get_entries():
+                km = keymaps.get(km_name)
+                kmi = km.keymap_items.from_id(kmi_id) if km != None else None
+                if kmi == None:
+                    self.invalidate()
+                    break
+                resolved.append((km_name, kmi, internal_id))
+            else:
+                return resolved
+
+        return resolved
+
+    def get_by_id(self, internal_id: int) -> list[tuple[str, KeyMapItem]]:
+        return [(km_name, kmi) for km_name, kmi, _ in self._resolve(lambda: self._by_id.get(internal_id, []))]
+
+    def get_by_km(self, km_name: str) -> list[tuple[KeyMapItem, int | None]]:
+        return [(kmi, internal_id) for _, kmi, internal_id in self._resolve(lambda: self._by_km.get(km_name, []))]
+
+    def get_entries(self) -> list[tuple[str, KeyMapItem, int | None]]:
+        return self._resolve(lambda: self._entries)
+
+keymap_registry = KeymapRegistry()
+
+def get_user_kmis(internal_only = False, internal_id: int | None = None) -> dict[str, set[KeyMapItem]]:
     """
     Retrieve user keymap items based on internal ID and filtering criteria.
 
@@ -31,51 +154,25 @@ def get_user_kmis(internal_only = False, internal_id: int | None = None) -> dict
     Returns
     -------
     dict
-        A dictionary where keys are keymap names, and values are lists of KeyMapItems.
+        A dictionary where keys are keymap names, and values are sets of KeyMapItems.
     """
     
-    user_keymaps: dict[str, list[KeyMapItem]] = {}
-
-    wm = bpy.context.window_manager
-    user_kc = wm.keyconfigs.user
+    user_keymaps: dict[str, set[KeyMapItem]] = {}
 
-    if user_kc is None:
+    if not keymap_registry.ensure():
         print("No user keyconfig found.")
         return user_keymaps
-    
-    km: KeyMap
-    for km in user_kc.keymaps:
-        kmi: KeyMapItem
-        for kmi in km.keymap_items:
-            if kmi.idname.startswith( OP_IDNAME_PREFIX + '.'):
-                if internal_id != None and internal_only == False:
-                    try:
-                        if kmi.properties.internal_id == internal_id:
-                            user_keymaps.setdefault(km.name, []).append(kmi)
-                    except:
-                        pass
-
-                elif internal_id != None and internal_only == True:
-                    try:
-                        if kmi.properties.internal_id == internal_id and kmi.properties.internal_id != 0:
-                            user_keymaps.setdefault(km.name, []).append(kmi)
-                    except:
-                        pass
-
-                elif internal_id == None and internal_only == False:
-                    user_keymaps.setdefault(km.name, []).append(kmi)
-
-                elif internal_id == None and internal_only == True:
-                    try:
-                        if kmi.properties.internal_id != 0:
-                            user_keymaps.setdefault(km.name, []).append(kmi)
-                    except:
-                        pass
-    
-    # Remove duplicates
-    if len(user_keymaps) > 0:
-        for km_name in user_keymaps:
-            user_keymaps[km_name] = set(user_keymaps[km_name])
+
+    if internal_id != None:
+        if internal_only == True and internal_id == 0:
+            return user_keymaps
+        for km_name, kmi in keymap_registry.get_by_id(internal_id):
+            user_keymaps.setdefault(km_name, set()).add(kmi)
+
+    else:
+        for km_name, kmi, kmi_internal_id in keymap_registry.get_entries():
+            if internal_only == False or (kmi_internal_id != None and kmi_internal_id != 0):
+                user_keymaps.setdefault(km_name, set()).add(kmi)
 
     return user_keymaps
 
@@ -149,14 +246,7 @@ def get_default_kmi_def_from_id(id: int) -> dict[str, Any] | None:
         The keymap item definition if found, otherwise None.
     """
 
-    result: dict[str, Any] | None = None
-
-    for kmi_def in DEFAULT_KMI_LIST:
-        if kmi_def['id'] == id:
-            result = kmi_def
-            break
-
-    return result
+    return DEFAULT_KMI_DEFS.get(id)
 
 def create_addon_kmi(km_name, kmi_op_idname, kmi_type, kmi_value, kmi_any, kmi_shift, kmi_ctrl, kmi_alt, kmi_oskey, kmi_key_modifier, kmi_direction, kmi_repeat, kmi_head, km_space_type, km_region_type, km_modal, km_tool) -> tuple[KeyMap, KeyMapItem] | None:
     """
@@ -270,9 +360,10 @@ def add_addon_kmi(internal_id: int, km_name: str, kmi_op_idname: str, kmi_type,
         kmi_tuple[1].properties.internal_id = internal_id
         kmi_tuple[1].active = kmi_active
         
-        addon_keymaps.append(kmi_tuple)
+        addon_keymaps.setdefault(internal_id, []).append(kmi_tuple)
+        keymap_registry.invalidate()
 
-        print(f'KeyMapItem added : "Addon" - "{km_name}" - [{kmi_op_idname}] - "{kmi_type}"')
+        debug(f'KeyMapItem added : "Addon" - "{km_name}" - [{kmi_op_idname}] - "{kmi_type}"')
     else:
         print(f'WARNING : Failed to add KeyMapItem : "Addon" - "{km_name}" - [{kmi_op_idname}] - "{kmi_type}"')
 
@@ -290,18 +381,16 @@ def remove_addon_kmi(internal_id: int) -> None:
     None
     """
 
-    index = 0
-    for km, kmi in addon_keymaps:
-        if kmi.properties.internal_id == internal_id:
-            km_name = km.name
-            kmi_idname = kmi.idname
-            kmi_type = kmi.type
+    for km, kmi in addon_keymaps.pop(internal_id, []):
+        km_name = km.name
+        kmi_idname = kmi.idname
+        kmi_type = kmi.type
 
-            km.keymap_items.remove(kmi)
-            addon_keymaps.pop(index)
+        km.keymap_items.remove(kmi)
 
-            print(f'KeyMapItem removed : "Addon" - "{km_name}" - [{kmi_idname}] - "{kmi_type}"')
-        index = index + 1
+        debug(f'KeyMapItem removed : "Addon" - "{km_name}" - [{kmi_idname}] - "{kmi_type}"')
+
+    keymap_registry.invalidate()
 
 def add_default_keymaps(id_list: Iterable[int] | None = None) -> None:
     """
@@ -318,8 +407,9 @@ def add_default_keymaps(id_list: Iterable[int] | None = None) -> None:
     """
 
     if id_list:
-        for kmi_def in DEFAULT_KMI_LIST:
-            if kmi_def['id'] in id_list:
+        for id in id_list:
+            kmi_def = DEFAULT_KMI_DEFS.get(id)
+            if kmi_def != None:
                 add_addon_kmi(kmi_def['id'], **kmi_def['parms'])
     else:
         for kmi_def in DEFAULT_KMI_LIST:
@@ -334,16 +424,18 @@ def remove_addon_kmis() -> None:
     None
     """
 
-    for km, kmi in addon_keymaps:
-        km_name = km.name
-        kmi_idname = kmi.idname
-        kmi_type = kmi.type
+    for kmi_tuples in addon_keymaps.values():
+        for km, kmi in kmi_tuples:
+            km_name = km.name
+            kmi_idname = kmi.idname
+            kmi_type = kmi.type
 
-        km.keymap_items.remove(kmi)
+            km.keymap_items.remove(kmi)
 
-        print(f'KeyMapItem removed : "Addon" - "{km_name}" - [{kmi_idname}] - "{kmi_type}"')
+            debug(f'KeyMapItem removed : "Addon" - "{km_name}" - [{kmi_idname}] - "{kmi_type}"')
         
     addon_keymaps.clear()
+    keymap_registry.invalidate()
 
 def remove_user_keymapitems(internal_only=False) -> None:
     """
@@ -370,8 +462,18 @@ def remove_user_keymapitems(internal_only=False) -> None:
             kmi_type = kmi.type
 
             km.keymap_items.remove(kmi)
+            keymap_registry.invalidate()
 
-            print(f'KeyMapItem removed : "User" - "{km_name}" - [{kmi_idname}] - "{kmi_type}"')
+            debug(f'KeyMapItem removed : "User" - "{km_name}" - [{kmi_idname}] - "{kmi_type}"')
+
+@persistent
+def on_load_post(*args) -> None:
+    # Loading a file with its own UI may load another keyconfig
+    keymap_registry.invalidate()
+
+handlers = (
+    (bpy.app.handlers.load_post, on_load_post),
+)
 
 classes = ()
 
@@ -380,7 +482,15 @@ def register():
     for cls in classes:
         register_class(cls)
 
+    for handler_list, handler in handlers:
+        if handler not in handler_list:
+            handler_list.append(handler)
+
 def unregister():
+    for handler_list, handler in handlers:
+        if handler in handler_list:
+            handler_list.remove(handler)
+
     remove_addon_kmis()
 
     from bpy.utils import unregister_class
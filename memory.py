@@ -0,0 +1,313 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+import json
+from typing import Mapping, Sequence
+
+import numpy as np
+
+import bpy
+from bpy.app.handlers import persistent
+from bpy.types import ID, Scene
+
+from .visibility import (get_data_collection,
+                         get_data_uids,
+                        )
+
+class PreviousSelection:
+    """
+    Previous selection of a scene, kept in memory.
+
+    Attributes
+    ----------
+    uids_per_type : dict[str, np.ndarray]
+        Sorted session UIDs of the remembered IDs, per ID type.
+    ids : tuple[ID] | None
+        The remembered IDs, or None when they have to be resolved again from their session UIDs.
+    dirty : bool
+        True when the selection changed since it was last written to the scene.
+    """
+
+    __slots__ = ('uids_per_type', 'ids', 'dirty')
+
+    def __init__(self, uids_per_type: dict[str, np.ndarray], ids: tuple[ID] | None, dirty: bool):
+        self.uids_per_type = uids_per_type
+        self.ids = ids
+        self.dirty = dirty
+
+# Previous selections, keyed by scene session UID
+_previous_selections: dict[int, PreviousSelection] = {}
+
+def resolve_uids(uids_per_type: Mapping[str, Sequence[int]]) -> tuple[ID]:
+    """
+    Retrieves IDs from their session UIDs, with one pass over each `bpy.data` collection.
+
+    Parameters
+    ----------
+    uids_per_type : Mapping[str, Sequence[int]]
+        Session UIDs per ID type, e.g. 'Collection' and 'Object'.
+
+    Returns
+    -------
+    tuple[ID]
+        The IDs still existing, collections first.
+    """
+
+    ids = []
+    for id_type in ('Collection', 'Object'):
+        uids = uids_per_type.get(id_type, ())
+        if len(uids) == 0:
+            continue
+
+        data_collection = get_data_collection(id_type)
+        mask = np.isin(get_data_uids(data_collection), uids)
+        ids.extend(id for id, selected in zip(data_collection, mask) if selected)
+
+    return tuple(ids)
+
+def read_scene_previous_sel(scene: Scene) -> tuple[ID]:
+    """
+    Reads the previous selection saved in a scene.
+
+    Parameters
+    ----------
+    scene : Scene
+        The scene to read from.
+
+    Returns
+    -------
+    tuple[ID]
+        The saved IDs still existing.
+    """
+
+    ids = []
+
+    if scene.hide.previous_sel_names:
+        try:
+            names_per_type: dict[str, list[str]] = json.loads(scene.hide.previous_sel_names)
+        except ValueError:
+            names_per_type = {}
+        for id_type, names in names_per_type.items():
+            data_collection = get_data_collection(id_type)
+            for name in names:
+                id = data_collection.get(name)
+                if id != None:
+                    ids.append(id)
+
+    # Files saved by older versions store one item per ID
+    elif len(scene.hide.previous_sel) > 0:
+        ids = [item.id for item in scene.hide.previous_sel if item.id != None]
+
+    return tuple(ids)
+
+def write_scene_previous_sel(scene: Scene, ids: Sequence[ID]) -> None:
+    """
+    Saves a previous selection in a scene, as a single string of ID names.
+
+    Parameters
+    ----------
+    scene : Scene
+        The scene to write to.
+    ids : Sequence[ID]
+        The IDs to save.
+
+    Returns
+    -------
+    None
+    """
+
+    names_per_type: dict[str, list[str]] = {}
+    for id in ids:
+        names_per_type.setdefault(id.bl_rna.identifier, []).append(id.name)
+
+    scene.hide.previous_sel_names = json.dumps(names_per_type, separators=(',', ':'))
+    if len(scene.hide.previous_sel) > 0:
+        scene.hide.previous_sel.clear()
+
+def get_previous_ids(scene: Scene | None = None) -> tuple[ID]:
+    """
+    Retrieves the previous selection of a scene.
+
+    Parameters
+    ----------
+    scene : Scene, optional
+        The scene to get the previous selection of. If None, the context scene is used.
+
+    Returns
+    -------
+    tuple[ID]
+        The previously selected IDs.
+    """
+
+    if scene == None:
+        scene = bpy.context.scene
+
+    previous_selection = _previous_selections.get(scene.session_uid)
+    if previous_selection == None:
+        ids = read_scene_previous_sel(scene)
+        uids_per_type: dict[str, list[int]] = {}
+        for id in ids:
+            uids_per_type.setdefault(id.bl_rna.identifier, []).append(id.session_uid)
+
+        previous_selection = PreviousSelection(get_sorted_uids(uids_per_type), ids, dirty=False)
+        _previous_selections[scene.session_uid] = previous_selection
+
+    elif previous_selection.ids == None:
+        previous_selection.ids = resolve_uids(previous_selection.uids_per_type)
+
+    return previous_selection.ids
+
+def get_sorted_uids(uids_per_type: Mapping[str, Sequence[int]]) -> dict[str, np.ndarray]:
+    """
+    Converts session UIDs per ID type to sorted arrays, leaving out the types without any.
+
+    Parameters
+    ----------
+    uids_per_type : Mapping[str, Sequence[int]]
+        Session UIDs per ID type.
+
+    Returns
+    -------
+    dict[str, np.ndarray]
+        Sorted unique session UIDs per ID type.
+    """
+
+    return {id_type: np.unique(np.asarray(uids, dtype=np.int32)) for id_type, uids in uids_per_type.items() if len(uids) > 0}
+
+def get_uids_diff(old: Mapping[str, np.ndarray], new: Mapping[str, np.ndarray]) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    """
+    Compares two sets of sorted session UIDs per ID type.
+
+    Parameters
+    ----------
+    old : Mapping[str, np.ndarray]
+        Sorted session UIDs per ID type, before.
+    new : Mapping[str, np.ndarray]
+        Sorted session UIDs per ID type, after.
+
+    Returns
+    -------
+    dict[str, tuple[np.ndarray, np.ndarray]]
+        The added and removed session UIDs of each ID type that changed.
+    """
+
+    empty = np.empty(0, dtype=np.int32)
+    diff = {}
+    for id_type in old.keys() | new.keys():
+        old_uids = old.get(id_type, empty)
+        new_uids = new.get(id_type, empty)
+        if np.array_equal(old_uids, new_uids):
+            continue
+        diff[id_type] = (np.setdiff1d(new_uids, old_uids, assume_unique=True), np.setdiff1d(old_uids, new_uids, assume_unique=True))
+    return diff
+
+def set_previous_ids(ids: Sequence[ID], uids_per_type: Mapping[str, Sequence[int]], scene: Scene | None = None) -> None:
+    """
+    Remembers a previous selection for a scene, by applying the added and removed session UIDs
+    to the remembered ones. Nothing is written when it did not change.
+
+    Parameters
+    ----------
+    ids : Sequence[ID]
+        The IDs to remember.
+    uids_per_type : Mapping[str, Sequence[int]]
+        Session UIDs of `ids`, per ID type.
+    scene : Scene, optional
+        The scene to remember the selection for. If None, the context scene is used.
+
+    Returns
+    -------
+    None
+    """
+
+    if scene == None:
+        scene = bpy.context.scene
+
+    new_uids_per_type = get_sorted_uids(uids_per_type)
+
+    previous_selection = _previous_selections.get(scene.session_uid)
+    if previous_selection == None:
+        _previous_selections[scene.session_uid] = PreviousSelection(new_uids_per_type, tuple(ids), dirty=True)
+        return
+
+    previous_selection.ids = tuple(ids)
+
+    diff = get_uids_diff(previous_selection.uids_per_type, new_uids_per_type)
+    if len(diff) == 0:
+        return
+
+    for id_type, (added, removed) in diff.items():
+        uids = previous_selection.uids_per_type.get(id_type, np.empty(0, dtype=np.int32))
+        if len(removed) > 0:
+            uids = uids[~np.isin(uids, removed, assume_unique=True)]
+        if len(added) > 0:
+            uids = np.union1d(uids, added)
+
+        if len(uids) > 0:
+            previous_selection.uids_per_type[id_type] = uids
+        else:
+            del previous_selection.uids_per_type[id_type]
+
+    previous_selection.dirty = True
+
+def clear() -> None:
+    """
+    Forgets every previous selection kept in memory.
+
+    Returns
+    -------
+    None
+    """
+
+    _previous_selections.clear()
+
+@persistent
+def on_save_pre(*args) -> None:
+    # Previous selections are only written to the file when saving, so they do not weigh on undo steps
+    for scene in bpy.data.scenes:
+        previous_selection = _previous_selections.get(scene.session_uid)
+        if previous_selection != None and previous_selection.dirty:
+            write_scene_previous_sel(scene, get_previous_ids(scene))
+            previous_selection.dirty = False
+
+@persistent
+def on_load_post(*args) -> None:
+    clear()
+
+@persistent
+def on_undo_post(*args) -> None:
+    # Undo reallocates the IDs, they are resolved again from their session UIDs on next use
+    for previous_selection in _previous_selections.values():
+        previous_selection.ids = None
+
+handlers = (
+    (bpy.app.handlers.save_pre, on_save_pre),
+    (bpy.app.handlers.load_post, on_load_post),
+    (bpy.app.handlers.undo_post, on_undo_post),
+    (bpy.app.handlers.redo_post, on_undo_post),
+)
+
+classes = ()
+
+def register():
+    from bpy.utils import register_class
+    for cls in classes:
+        register_class(cls)
+
+    for handler_list, handler in handlers:
+        if handler not in handler_list:
+            handler_list.append(handler)
+
+def unregister():
+    for handler_list, handler in handlers:
+        if handler in handler_list:
+            handler_list.remove(handler)
+
+    clear()
+
+    from bpy.utils import unregister_class
+    for cls in reversed(classes):
+        unregister_class(cls)
@@ -0,0 +1,276 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+import numpy as np
+
+import bpy
+import bmesh
+from bpy.app.handlers import persistent
+from bpy.types import Mesh, Object
+from bpy.props import IntProperty
+
+from .constants import OP_IDNAME_PREFIX
+from .instrumentation import (debug,
+                              span,
+                              operator_span,
+                             )
+
+# Edit Mode element sequences, in the order of `ToolSettings.mesh_select_mode`
+DOMAINS = ('verts', 'edges', 'faces')
+# Mesh element sequences matching DOMAINS
+MESH_DOMAINS = ('vertices', 'edges', 'polygons')
+# Selected element counts of each domain, kept by the mesh while in Edit Mode
+SELECTED_COUNTS = ('total_vert_sel', 'total_edge_sel', 'total_face_sel')
+
+# Elements hidden by the last toggle of each mesh, keyed by mesh session UID.
+# Values are the element counts when they were hidden, and the hidden indices per domain.
+_hidden_elements: dict[int, tuple[tuple[int, int, int], dict[str, np.ndarray]]] = {}
+
+def read_hidden(obj: Object) -> dict[str, np.ndarray]:
+    """
+    Reads the hide state of every element of a mesh in Edit Mode, in bulk.
+
+    The Edit Mode data is written to the mesh first, so the state can be read with `foreach_get`
+    instead of visiting every BMesh element.
+
+    Parameters
+    ----------
+    obj : Object
+        A mesh object in Edit Mode.
+
+    Returns
+    -------
+    dict[str, np.ndarray]
+        The hide state of every element, per domain of DOMAINS.
+    """
+
+    obj.update_from_editmode()
+
+    hidden = {}
+    for domain, mesh_domain in zip(DOMAINS, MESH_DOMAINS):
+        elements = getattr(obj.data, mesh_domain)
+        flags = np.empty(len(elements), dtype=bool)
+        elements.foreach_get('hide', flags)
+        hidden[domain] = flags
+    return hidden
+
+def get_counts(hidden: dict[str, np.ndarray]) -> tuple[int, int, int]:
+    return tuple(len(hidden[domain]) for domain in DOMAINS)
+
+def hide_elements(objects: list[Object]) -> None:
+    """
+    Hides the selected elements with `bpy.ops.mesh.hide`, and remembers every element that got
+    hidden to be revealed by the next toggle.
+
+    The elements that got hidden, including the neighbors the hiding flushed to, are found by
+    comparing the hide state read in bulk before and after.
+
+    Parameters
+    ----------
+    objects : list[Object]
+        Mesh objects in Edit Mode, one per mesh.
+
+    Returns
+    -------
+    None
+    """
+
+    before = {obj.data.session_uid: read_hidden(obj) for obj in objects}
+
+    bpy.ops.mesh.hide(unselected=False)
+
+    for obj in objects:
+        hidden = read_hidden(obj)
+        # Elements already hidden by an earlier toggle are left to it
+        indices = {domain: np.flatnonzero(hidden[domain] & ~before[obj.data.session_uid][domain]).astype(np.int32) for domain in DOMAINS}
+        _hidden_elements[obj.data.session_uid] = (get_counts(hidden), indices)
+
+def reveal_bmesh_elements(mesh: Mesh, indices: dict[str, np.ndarray]) -> None:
+    """
+    Reveals and selects elements of a mesh in Edit Mode one at a time.
+
+    Parameters
+    ----------
+    mesh : Mesh
+        The mesh, in Edit Mode.
+    indices : dict[str, np.ndarray]
+        The indices of the elements to reveal, per domain of DOMAINS.
+
+    Returns
+    -------
+    None
+    """
+
+    bm = bmesh.from_edit_mesh(mesh)
+    for domain in DOMAINS:
+        elements = getattr(bm, domain)
+        elements.ensure_lookup_table()
+        for index in indices[domain].tolist():
+            element = elements[index]
+            element.hide = False
+            element.select = True
+    bm.select_flush_mode()
+    bmesh.update_edit_mesh(mesh, loop_triangles=False, destructive=False)
+
+def reveal_elements(objects: list[Object]) -> bool:
+    """
+    Reveals and selects the mesh elements hidden by the last toggle.
+
+    When they are the only hidden elements, which is the usual case, they are all revealed at once
+    with `bpy.ops.mesh.reveal`. Otherwise only the remembered elements are visited.
+
+    Parameters
+    ----------
+    objects : list[Object]
+        Mesh objects in Edit Mode, one per mesh.
+
+    Returns
+    -------
+    bool
+        True if elements were revealed, False if none are remembered or the topology changed since.
+    """
+
+    revealed = {}
+    only_hidden = True
+    for obj in objects:
+        hidden = read_hidden(obj)
+        counts, indices = _hidden_elements.pop(obj.data.session_uid, (None, None))
+        if counts != get_counts(hidden):
+            debug(f'No hidden elements to reveal in {obj.data.name}')
+            # Other hidden elements would be revealed too
+            only_hidden = only_hidden and not any(flags.any() for flags in hidden.values())
+            continue
+
+        revealed[obj.data] = indices
+        for domain in DOMAINS:
+            if np.count_nonzero(hidden[domain]) != len(indices[domain]) or not hidden[domain][indices[domain]].all():
+                only_hidden = False
+
+    if len(revealed) == 0:
+        return False
+
+    if only_hidden:
+        bpy.ops.mesh.reveal(select=True)
+    else:
+        for mesh, indices in revealed.items():
+            reveal_bmesh_elements(mesh, indices)
+
+    return True
+
+def has_selection(mesh: Mesh, select_mode: tuple[bool, bool, bool]) -> bool:
+    return getattr(mesh, SELECTED_COUNTS[select_mode.index(True)]) > 0
+
+def toggle_mesh_elements(objects: list[Object], select_mode: tuple[bool, bool, bool]) -> bool:
+    """
+    Toggles mesh elements with the add-on semantics: the selection is hidden, and when nothing
+    is selected, the elements hidden by the last toggle are revealed and selected again.
+
+    The Edit Mode data is changed in place, without leaving Edit Mode.
+
+    Parameters
+    ----------
+    objects : list[Object]
+        Mesh objects in Edit Mode, one per mesh.
+    select_mode : tuple[bool, bool, bool]
+        The vertex, edge and face select modes.
+
+    Returns
+    -------
+    bool
+        True if elements were hidden, False if they were revealed.
+    """
+
+    with span('state_compute'):
+        selected = [obj for obj in objects if has_selection(obj.data, select_mode)]
+        hide = len(selected) > 0
+
+    with span('apply'):
+        if hide:
+            hide_elements(selected)
+        else:
+            reveal_elements(objects)
+
+    return hide
+
+def clear() -> None:
+    """
+    Forgets every remembered hidden element.
+
+    Returns
+    -------
+    None
+    """
+
+    _hidden_elements.clear()
+
+@persistent
+def on_file_changed(*args) -> None:
+    # A new file or an undo step leaves the remembered elements out of sync with the meshes
+    clear()
+
+class HideMeshElements(bpy.types.Operator):
+    """
+    Operator for hiding selected mesh elements in Edit Mode, or revealing the last hidden ones.
+    """
+
+    bl_idname = OP_IDNAME_PREFIX + "." + "hidemeshelements"
+    bl_label = "Hide - Hide mesh elements"
+    bl_description = "Hide the selected vertices, edges or faces. With nothing selected, reveal the last hidden ones"
+    bl_options = {"UNDO", "INTERNAL"}
+
+    internal_id : IntProperty(
+        name = 'internal_id',
+        options = {"HIDDEN"}
+    ) # type: ignore
+
+    @classmethod
+    def poll(cls, context):
+        return context.mode == 'EDIT_MESH'
+
+    def execute(self, context):
+        debug('Hide - HideMeshElements - execute')
+
+        with operator_span(self.bl_idname) as op_span:
+            # Objects sharing a mesh are toggled once
+            objects = list({obj.data: obj for obj in context.objects_in_mode if obj.type == 'MESH'}.values())
+            select_mode = tuple(context.tool_settings.mesh_select_mode)
+
+            op_span.count('meshes', len(objects))
+            hide = toggle_mesh_elements(objects, select_mode)
+
+        self.report({"INFO"}, 'Hidden' if hide else 'Revealed')
+
+        return {"FINISHED"}
+
+handlers = (
+    (bpy.app.handlers.load_post, on_file_changed),
+    (bpy.app.handlers.undo_post, on_file_changed),
+    (bpy.app.handlers.redo_post, on_file_changed),
+)
+
+classes = (
+    HideMeshElements,
+)
+
+def register():
+    from bpy.utils import register_class
+    for cls in classes:
+        register_class(cls)
+
+    for handler_list, handler in handlers:
+        if handler not in handler_list:
+            handler_list.append(handler)
+
+def unregister():
+    for handler_list, handler in handlers:
+        if handler in handler_list:
+            handler_list.remove(handler)
+
+    clear()
+
+    from bpy.utils import unregister_class
+    for cls in reversed(classes):
+        unregister_class(cls)
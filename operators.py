@@ -4,15 +4,43 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
 
-from typing import Any, Iterable
+from typing import Any, Callable, Iterable, Sequence
 
 import bpy
-from bpy.types import ID, Object, Collection, LayerCollection
+from bpy.types import ID, Area, Object, Collection, LayerCollection, Region, ViewLayer
 from bpy.props import IntProperty
 
-from .constants import (ADDON_NAME,
-                        OP_IDNAME_PREFIX,
-                       )
+from .constants import OP_IDNAME_PREFIX
+from . import undo
+from .core import (SelectionSnapshot,
+                   ChunkedJob,
+                   sort_ids_per_type,
+                   resolve_selection,
+                   get_global_hide_state,
+                   get_target_state,
+                  )
+from .counters import (is_counted,
+                       visibility_counters,
+                      )
+from .indexes import (get_layer_collection_index,
+                      get_object_index,
+                      get_screen_areas,
+                      parent_index,
+                     )
+from .performance import get_heaviest_objects
+from .preferences import get_addon_preferences
+from .memory import (get_previous_ids,
+                     set_previous_ids,
+                    )
+from .instrumentation import (debug,
+                              span,
+                              operator_span,
+                             )
+from .visibility import (get_global_flag,
+                         get_selected_objects,
+                         set_flag,
+                         set_objects_selected,
+                        )
 
 def get_sel_ids() -> tuple[ID]:
     """
@@ -29,112 +57,315 @@ def get_sel_ids() -> tuple[ID]:
     # https://blender.stackexchange.com/questions/325004/how-can-i-get-the-currently-selected-objects-in-the-outliner-if-they-are-hidden Override the context
     # https://blender.stackexchange.com/questions/326453/cant-get-proper-context-selected-ids-from-3d-view DO NOT copy the entire context
 
-    sel_ids = []
-
-    # Get context_outliners
-    context_outliners: list[dict[str, Any]] | None = []
-    outliner_areas = [area for area in bpy.context.screen.areas if area.type == "OUTLINER"]
-    if outliner_areas != []:
-        for area in outliner_areas:
-            context_outliners.append(
-                {
-                    'parms': {
-                        'area' : area,
-                        'region' : area.regions[-1],
-                    },
-                }
-            )
-    else:
-        context_outliners: list[dict[str, Any]] | None = None
-        print('No Outliner found')
-    
-    # Get context_viewports
-    context_viewports: list[dict[str, Any]] | None = []
-    viewport_areas = [area for area in bpy.context.screen.areas if area.type == "VIEW_3D"]
-    if viewport_areas != []:
-        for area in viewport_areas:
-            context_viewports.append(
-                {
-                    'parms': {
-                        'area' : area,
-                        'region' : area.regions[-1],
-                    },
-                }
-            )
-    else:
-        context_viewports: list[dict[str, Any]] | None = None
-        print('No Viewport found')
+    sel_ids = set()
+
+    # Headless sessions and some script contexts have no screen to read the selection from
+    if bpy.context.screen == None or bpy.context.area == None:
+        debug('No screen found')
+        return tuple(sel_ids)
+
+    # Outliners and Viewports are indexed once per screen layout
+    screen_areas = get_screen_areas(bpy.context.screen)
+    if screen_areas.outliners == ():
+        debug('No Outliner found')
+    if screen_areas.viewports == ():
+        debug('No Viewport found')
 
     # Debug
-    if context_outliners == None and context_viewports == None:
-        print('Neither Outliner nor Viewport was found')
+    if screen_areas.outliners == () and screen_areas.viewports == ():
+        debug('Neither Outliner nor Viewport was found')
         return tuple(sel_ids)
 
-    # Get sync states
-    if context_outliners != None:
-        if bpy.context.area.type == 'OUTLINER':
-            current_sync: bool | None = bpy.context.area.spaces[0].use_sync_select
-        else:
-            current_sync: bool | None = None
-        for context_outliner in context_outliners:
-            with bpy.context.temp_override(**context_outliner['parms']):
-                sync: bool = bpy.context.area.spaces[0].use_sync_select
-            context_outliner['sync'] = sync
+    # Sync states are read from the spaces directly, only the selection needs a context override
+    def add_selected_ids(area : Area, region : Region) -> None:
+        with bpy.context.temp_override(area=area, region=region):
+            sel_ids.update(bpy.context.selected_ids)
+
+    def add_viewports_selected_ids() -> None:
+        # Viewports without local view nor local collections all show the view layer selection, it is read once
+        read_view_layer = False
+        for area, region, space in screen_areas.viewports:
+            if space.local_view == None and space.use_local_collections == False:
+                if read_view_layer:
+                    continue
+                read_view_layer = True
+            add_selected_ids(area, region)
 
     # Get selected ids
-    sel_outliners: Iterable[ID] = []
-    sel_viewports: Iterable[ID] = []
     if bpy.context.area.type == 'OUTLINER':
-        if current_sync == True:
-            for context_outliner in context_outliners:
-                if context_outliner['sync'] == True:
-                    with bpy.context.temp_override(**context_outliner['parms']):
-                        sel_outliners.extend(bpy.context.selected_ids)
-            if context_viewports != None:
-                for context_viewport in context_viewports:
-                    with bpy.context.temp_override(**context_viewport['parms']):
-                        sel_viewports.extend(bpy.context.selected_ids)
+        if bpy.context.area.spaces[0].use_sync_select == True:
+            for area, region, space in screen_areas.outliners:
+                if space.use_sync_select == True:
+                    add_selected_ids(area, region)
+            add_viewports_selected_ids()
         else:
-            sel_outliners.extend(bpy.context.selected_ids)
+            sel_ids.update(bpy.context.selected_ids)
     elif bpy.context.area.type == 'VIEW_3D':
-        if context_outliners != None:
-            for context_outliner in context_outliners:
-                if context_outliner['sync'] == True:
-                    with bpy.context.temp_override(**context_outliner['parms']):
-                        sel_outliners.extend(bpy.context.selected_ids)
-        for context_viewport in context_viewports:
-            with bpy.context.temp_override(**context_viewport['parms']):
-                sel_viewports.extend(bpy.context.selected_ids)
-    
-    # Remove any duplicate
-    sel_ids = set(sel_outliners + sel_viewports)
+        for area, region, space in screen_areas.outliners:
+            if space.use_sync_select == True:
+                add_selected_ids(area, region)
+        add_viewports_selected_ids()
 
     # Debug
-    if sel_ids == []:
-        print('WARNING : Selection is empty')
+    if len(sel_ids) == 0:
+        debug('WARNING : Selection is empty')
 
     return tuple(sel_ids)
 
-def sort_ids_per_type(ids : Iterable[ID]) -> dict[str, list[ID]]:
+def get_snapshot(ids : Iterable[ID], view_layer: ViewLayer | None = None) -> SelectionSnapshot:
     """
-    Sorts a list of Blender IDs by their type.
+    Builds a snapshot of the given IDs, resolving layer collections in a view layer.
 
     Parameters
     ----------
     ids : Iterable[ID]
-        A list of Blender IDs to sort.
+        The IDs to snapshot.
+    view_layer : ViewLayer, optional
+        The view layer used to resolve layer collections. If None, the context view layer is used.
+
+    Returns
+    -------
+    SelectionSnapshot
+        The snapshot of the given IDs.
+    """
+
+    return SelectionSnapshot.from_ids(ids, get_layer_collection_index(view_layer))
+
+def as_snapshot(sel : SelectionSnapshot | Iterable[ID] | None = None) -> SelectionSnapshot:
+    """
+    Returns the given selection as a SelectionSnapshot.
+
+    Parameters
+    ----------
+    sel : SelectionSnapshot | Iterable[ID], optional
+        A snapshot, which is returned as is, or a list of IDs to snapshot. If None, the currently selected IDs are used.
+
+    Returns
+    -------
+    SelectionSnapshot
+        The snapshot of the selection.
+    """
+
+    if isinstance(sel, SelectionSnapshot):
+        return sel
+    if sel == None:
+        return get_sel_snapshot()
+    return get_snapshot(sel)
+
+def get_sel_snapshot() -> SelectionSnapshot:
+    """
+    Gathers the currently selected IDs once and returns them as a snapshot.
+
+    Returns
+    -------
+    SelectionSnapshot
+        The snapshot of the current selection.
+    """
+
+    return get_snapshot(get_sel_ids())
+
+def get_previous_sel_snapshot() -> SelectionSnapshot:
+    """
+    Returns the selection remembered by the last operator call as a snapshot.
+
+    Returns
+    -------
+    SelectionSnapshot
+        The snapshot of the previous selection.
+    """
+
+    return get_snapshot(get_previous_ids())
+
+def with_children(sel : SelectionSnapshot, view_layer: ViewLayer | None = None) -> SelectionSnapshot:
+    """
+    Adds the children of the selected objects, at any depth, to a selection.
+
+    Children outside of the view layer are left out, they cannot be hidden in it.
+
+    Parameters
+    ----------
+    sel : SelectionSnapshot
+        The selection.
+    view_layer : ViewLayer, optional
+        The view layer the selection is resolved in. If None, the context view layer is used.
+
+    Returns
+    -------
+    SelectionSnapshot
+        The selection with the children of its objects, or the same snapshot if they have none.
+    """
+
+    descendants = parent_index.get_descendants(sel.objects)
+    if len(descendants) == 0:
+        return sel
+
+    view_layer_uids = set(get_object_index(view_layer)[1].tolist())
+    descendants = [obj for obj in descendants if obj.session_uid in view_layer_uids]
+    if len(descendants) == 0:
+        return sel
+
+    return get_snapshot(sel.ids + tuple(descendants), view_layer)
+
+def get_include_children() -> bool:
+    """
+    Retrieves whether the children of the selected objects are toggled with them, from the addon preferences.
+
+    Returns
+    -------
+    bool
+        True if children are included.
+    """
+
+    return get_addon_preferences().include_children
+
+def get_scope() -> str:
+    """
+    Retrieves the scope of Hide in Viewport set in the addon preferences.
+
+    Returns
+    -------
+    str
+        Either 'VIEW_LAYER', 'SCENE' or 'ALL_SCENES'.
+    """
+
+    return get_addon_preferences().scope
+
+def get_scope_view_layers(scope : str, view_layer : ViewLayer | None = None) -> list[ViewLayer]:
+    """
+    Retrieves the view layers a scope covers.
+
+    Parameters
+    ----------
+    scope : str
+        Either 'VIEW_LAYER', 'SCENE' or 'ALL_SCENES'.
+    view_layer : ViewLayer, optional
+        The current view layer. If None, the context view layer is used.
+
+    Returns
+    -------
+    list[ViewLayer]
+        The view layers, starting with the current one.
+    """
+
+    if view_layer == None:
+        view_layer = bpy.context.view_layer
+
+    if scope == 'VIEW_LAYER':
+        return [view_layer]
+
+    scenes = (view_layer.id_data,) if scope == 'SCENE' else bpy.data.scenes
+    return [view_layer] + [other for scene in scenes for other in scene.view_layers if other != view_layer]
+
+def get_scope_selections(sel : SelectionSnapshot, scope : str | None = None) -> list[tuple[ViewLayer, SelectionSnapshot]]:
+    """
+    Resolves a selection in every view layer of a scope.
+
+    The selection of the current view layer is returned as is. In the other view layers, it is
+    reduced to its collections and objects that are in the view layer, through their cached indexes.
+
+    Parameters
+    ----------
+    sel : SelectionSnapshot
+        The selection, resolved in the context view layer.
+    scope : str, optional
+        Either 'VIEW_LAYER', 'SCENE' or 'ALL_SCENES'. If None, the scope set in the addon preferences is used.
+
+    Returns
+    -------
+    list[tuple[ViewLayer, SelectionSnapshot]]
+        One (view layer, selection) tuple per view layer holding part of the selection, starting with the current one.
+    """
+
+    if scope == None:
+        scope = get_scope()
+
+    view_layers = get_scope_view_layers(scope)
+    scope_sels = [(view_layers[0], sel)]
+    for view_layer in view_layers[1:]:
+        objects = sel.objects
+        if len(objects) > 0:
+            view_layer_uids = set(get_object_index(view_layer)[1].tolist())
+            objects = tuple(obj for obj, uid in zip(objects, sel.uids_per_type['Object']) if uid in view_layer_uids)
+
+        layer_sel = get_snapshot(sel.collections + objects, view_layer)
+        if len(layer_sel.layer_collections) + len(layer_sel.objects) > 0:
+            scope_sels.append((view_layer, layer_sel))
+
+    return scope_sels
+
+def get_operator_sel(hide_method : str | None = None) -> SelectionSnapshot:
+    """
+    Returns the selection an operator should act on.
+
+    The current selection is used, or the previous selection when nothing is selected.
+    The children of the selected objects are added when enabled in the preferences.
+
+    The performance hide method narrows it down to the heaviest objects. When nothing is selected,
+    it picks them from the whole view layer instead, and only falls back to the previous selection
+    once the budget is met, to enable again the objects it disabled.
+
+    Parameters
+    ----------
+    hide_method : str, optional
+        The hide method the selection will be toggled with, one of the keys of HIDE_METHODS.
+
+    Returns
+    -------
+    SelectionSnapshot
+        The snapshot the operator should act on.
+    """
+
+    if hide_method == 'PERFORMANCE':
+        sel = get_sel_snapshot()
+        if get_include_children():
+            with span('children_gather'):
+                sel = with_children(sel)
+        with span('performance_rank'):
+            budget = get_addon_preferences().polygon_budget
+            objects = get_heaviest_objects(sel, budget)
+            if len(sel) == 0 and len(objects) == 0:
+                # Only returned if they are all disabled
+                objects = get_heaviest_objects(get_previous_sel_snapshot(), budget)
+        return get_snapshot(objects)
+
+    sel = resolve_selection(get_sel_snapshot(), get_previous_sel_snapshot)
+    if get_include_children():
+        with span('children_gather'):
+            sel = with_children(sel)
+    return sel
+
+def set_previous_sel(sel : SelectionSnapshot) -> None:
+    """
+    Remembers the given selection as the previous selection.
+
+    Parameters
+    ----------
+    sel : SelectionSnapshot
+        The selection to remember.
+
+    Returns
+    -------
+    None
+    """
+
+    set_previous_ids(sel.ids, sel.uids_per_type)
+
+def push_undo(message: str) -> None:
+    """
+    Pushes a regular undo step, when the undo system is available.
+
+    Parameters
+    ----------
+    message : str
+        Name of the undo step.
 
     Returns
     -------
-    dict[str, list[ID]]
-        A dictionary where keys are ID types and values are lists of IDs of that type.
+    None
     """
 
-    # Sort ids per types
-    sorted_ids = {}
-    for id in ids:
-        sorted_ids.setdefault(id.bl_rna.identifier, []).append(id)
-    return sorted_ids
+    if bpy.ops.ed.undo_push.poll():
+        bpy.ops.ed.undo_push(message=message)
 
 def get_sorted_sel() -> dict[str, ID]:
     """
@@ -148,14 +379,14 @@ def get_sorted_sel() -> dict[str, ID]:
 
     return sort_ids_per_type(get_sel_ids())
 
-def get_sel_collections(sel : Iterable[ID] | None = None) -> tuple[Collection]:
+def get_sel_collections(sel : SelectionSnapshot | Iterable[ID] | None = None) -> tuple[Collection]:
     """
     Retrieves the selected collections.
 
     Parameters
     ----------
-    sel : Iterable[ID], optional
-        A list of IDs to filter for collections. If None, the currently selected IDs are used.
+    sel : SelectionSnapshot | Iterable[ID], optional
+        A snapshot or a list of IDs to filter for collections. If None, the currently selected IDs are used.
 
     Returns
     -------
@@ -163,29 +394,16 @@ def get_sel_collections(sel : Iterable[ID] | None = None) -> tuple[Collection]:
         A tuple of selected collections.
     """
 
-    ids = []
+    return as_snapshot(sel).collections
 
-    if sel == None:
-        sorted_sel = get_sorted_sel()
-    else:
-        sel = set(sel)
-        sorted_sel = sort_ids_per_type(sel)
-
-    try:
-        ids = sorted_sel['Collection']
-    except:
-        pass
-
-    return tuple(ids)
-
-def get_sel_layer_collections(sel : Iterable[ID] | None = None) -> tuple[LayerCollection]:
+def get_sel_layer_collections(sel : SelectionSnapshot | Iterable[ID] | None = None) -> tuple[LayerCollection]:
     """
     Retrieves the selected layer collections.
 
     Parameters
     ----------
-    sel : Iterable[ID], optional
-        A list of IDs to filter for layer collections. If None, the currently selected collections are used.
+    sel : SelectionSnapshot | Iterable[ID], optional
+        A snapshot or a list of IDs to filter for layer collections. If None, the currently selected collections are used.
 
     Returns
     -------
@@ -193,21 +411,16 @@ def get_sel_layer_collections(sel : Iterable[ID] | None = None) -> tuple[LayerCo
         A tuple of selected layer collections.
     """
 
-    layer_collections = []
-    for layer_collection in bpy.context.view_layer.layer_collection.children:
-        if layer_collection.collection in get_sel_collections(sel):
-            layer_collections.append(layer_collection)
+    return as_snapshot(sel).layer_collections
 
-    return tuple(layer_collections)
-
-def get_sel_objects(sel : Iterable[ID] | None = None) -> tuple[Object]:
+def get_sel_objects(sel : SelectionSnapshot | Iterable[ID] | None = None) -> tuple[Object]:
     """
     Retrieves the selected objects.
 
     Parameters
     ----------
-    sel : Iterable[ID], optional
-        A list of IDs to filter for objects. If None, the currently selected IDs are used.
+    sel : SelectionSnapshot | Iterable[ID], optional
+        A snapshot or a list of IDs to filter for objects. If None, the currently selected IDs are used.
 
     Returns
     -------
@@ -215,29 +428,16 @@ def get_sel_objects(sel : Iterable[ID] | None = None) -> tuple[Object]:
         A tuple of selected objects.
     """
 
-    ids = []
-
-    if sel == None:
-        sorted_sel = get_sorted_sel()
-    else:
-        sel = set(sel)
-        sorted_sel = sort_ids_per_type(sel)
-
-    try:
-        ids = sorted_sel['Object']
-    except:
-        pass
+    return as_snapshot(sel).objects
 
-    return tuple(ids)
-
-def get_sel_global_state_hide_viewport(sel : Iterable[ID] | None = None) -> bool | None:
+def get_sel_global_state_hide_viewport(sel : SelectionSnapshot | Iterable[ID] | None = None) -> bool | None:
     """
     Determines the global state of `hide_viewport` for the selected items.
 
     Parameters
     ----------
-    sel : Iterable[ID], optional
-        A list of IDs to check the hide state for. If None, the currently selected IDs are used.
+    sel : SelectionSnapshot | Iterable[ID], optional
+        A snapshot or a list of IDs to check the hide state for. If None, the currently selected IDs are used.
 
     Returns
     -------
@@ -246,42 +446,18 @@ def get_sel_global_state_hide_viewport(sel : Iterable[ID] | None = None) -> bool
     """
 
     # https://blender.stackexchange.com/questions/155563/how-to-hide-a-collection-in-viewport-but-not-disable-in-viewport-via-script
-    global_state = None
-
-    sel_layer_collections: tuple[LayerCollection] = get_sel_layer_collections(sel)
-    if len(sel_layer_collections) > 0:
-        layer_collections_global_state = sel_layer_collections[0].hide_viewport
-        for layer_collection in sel_layer_collections[1:]:
-            if layer_collections_global_state != layer_collection.hide_viewport:
-                layer_collections_global_state = None
-    
-    sel_objects: list[Object] = get_sel_objects(sel)
-    if len(sel_objects) > 0:
-        objects_global_state = sel_objects[0].hide_get()
-        for id in sel_objects[1:]:
-            if objects_global_state != id.hide_get():
-                objects_global_state = None
-
-    if len(sel_layer_collections) > 0 and len(sel_objects) > 0:
-        if layer_collections_global_state == objects_global_state:
-            global_state = layer_collections_global_state
-        else:
-            global_state = None
-    elif len(sel_layer_collections) > 0:
-        global_state = layer_collections_global_state
-    elif len(sel_objects) > 0:
-        global_state = objects_global_state
+    sel = as_snapshot(sel)
 
-    return global_state
+    return get_global_hide_state(sel.layer_collections, sel.objects, bpy.context.view_layer)
 
-def get_sel_global_state_disable_viewport(sel : Iterable[ID] | None = None) -> bool | None:
+def get_sel_global_state_disable_viewport(sel : SelectionSnapshot | Iterable[ID] | None = None) -> bool | None:
     """
     Determines the global state of `disable_viewport` for the selected items.
 
     Parameters
     ----------
-    sel : Iterable[ID], optional
-        A list of IDs to check the disable state for. If None, the currently selected IDs are used.
+    sel : SelectionSnapshot | Iterable[ID], optional
+        A snapshot or a list of IDs to check the disable state for. If None, the currently selected IDs are used.
 
     Returns
     -------
@@ -289,22 +465,20 @@ def get_sel_global_state_disable_viewport(sel : Iterable[ID] | None = None) -> b
         The global disable state, or None if the states are mixed.
     """
 
-    ids: list[Object, Collection] = get_sel_collections(sel) + get_sel_objects(sel)
-    global_state = ids[0].hide_viewport
-    for id in ids[1:]:
-        if global_state != id.hide_viewport:
-            global_state = None
+    sel = as_snapshot(sel)
 
-    return global_state
+    if is_counted('hide_viewport', sel.uids_per_type):
+        return visibility_counters.get_global_flag(sel.ids_per_type, 'hide_viewport', sel.uids_per_type, sel.collections)
+    return get_global_flag(sel.ids_per_type, 'hide_viewport', sel.uids_per_type)
 
-def get_sel_global_state_disable_render(sel : Iterable[ID] | None = None) -> bool | None:
+def get_sel_global_state_disable_render(sel : SelectionSnapshot | Iterable[ID] | None = None) -> bool | None:
     """
     Determines the global state of `disable_render` for the selected items.
 
     Parameters
     ----------
-    sel : Iterable[ID], optional
-        A list of IDs to check the render disable state for. If None, the currently selected IDs are used.
+    sel : SelectionSnapshot | Iterable[ID], optional
+        A snapshot or a list of IDs to check the render disable state for. If None, the currently selected IDs are used.
 
     Returns
     -------
@@ -312,15 +486,551 @@ def get_sel_global_state_disable_render(sel : Iterable[ID] | None = None) -> boo
         The global render disable state, or None if the states are mixed.
     """
 
-    ids: list[Object, Collection] = get_sel_collections(sel) + get_sel_objects(sel)
-    global_state = ids[0].hide_render
-    for id in ids[1:]:
-        if global_state != id.hide_render:
-            global_state = None
+    sel = as_snapshot(sel)
+
+    if is_counted('hide_render', sel.uids_per_type):
+        return visibility_counters.get_global_flag(sel.ids_per_type, 'hide_render', sel.uids_per_type, sel.collections)
+    return get_global_flag(sel.ids_per_type, 'hide_render', sel.uids_per_type)
+
+# Selections of at least this many IDs are hidden modally, in time-limited chunks
+MODAL_MIN_IDS = 20000
+
+# Time spent hiding per modal event, in seconds, so the interface keeps redrawing
+MODAL_CHUNK_BUDGET = 0.05
+
+# Number of IDs written at once by the bulk steps of modal calls, between two checks of the time budget
+MODAL_BULK_SLICE = 4096
 
-    return global_state
+# A step of a hide method, calling a function on each item of a sequence, see core.ChunkedJob.
+# Steps writing in bulk also give their batch size.
+HideStep = tuple[Sequence[Any], Callable[[Any], None]] | tuple[Sequence[Any], Callable[[Any], None], int]
+
+def set_flag_step(sel : SelectionSnapshot, attr : str, value : bool, slice_size : int | None = None) -> HideStep:
+    """
+    Plans writing a flag on every ID of a selection.
+
+    Parameters
+    ----------
+    sel : SelectionSnapshot
+        The selection to write.
+    attr : str
+        Name of the property, e.g. 'hide_viewport'.
+    value : bool
+        The value to write.
+    slice_size : int, optional
+        If given, the IDs are written in bulk by slices of this size, with the time budget checked
+        after each one. Otherwise they are written at once, as a step of a single item.
 
-class HideInViewport(bpy.types.Operator):
+    Returns
+    -------
+    HideStep
+        The step writing the flag.
+    """
+
+    if slice_size == None:
+        return ((sel,), lambda sel: set_flag(sel.ids, attr, value, sel.uids_per_type))
+
+    ids = sel.ids
+    slices = [ids[start:start + slice_size] for start in range(0, len(ids), slice_size)]
+    return (slices, lambda ids: set_flag(ids, attr, value), 1)
+
+def hide_in_viewport_steps(sel : SelectionSnapshot, slice_size : int | None = None) -> tuple[bool, list[HideStep]]:
+    """
+    Plans the toggle of the "hide in viewport" state of a selection, in every view layer of the scope.
+
+    The state of the selection in the current view layer decides whether it is hidden or unhidden everywhere.
+
+    Parameters
+    ----------
+    sel : SelectionSnapshot
+        The selection to toggle.
+    slice_size : int, optional
+        Unused, the states are written one ID at a time.
+
+    Returns
+    -------
+    tuple[bool, list[HideStep]]
+        True if the selection will be hidden, False if it will be unhidden, and the steps doing it.
+    """
+
+    with span('state_compute'):
+        hide = get_target_state(get_sel_global_state_hide_viewport(sel))
+
+    def set_layer_collection(layer_collection : LayerCollection) -> None:
+        layer_collection.hide_viewport = hide
+
+    def set_object(obj : Object) -> None:
+        obj.hide_set(hide)
+        obj.select_set(not hide)
+
+    def get_set_layer_object(view_layer : ViewLayer) -> Callable[[Object], None]:
+        def set_layer_object(obj : Object) -> None:
+            obj.hide_set(hide, view_layer=view_layer)
+        return set_layer_object
+
+    steps = [(sel.layer_collections, set_layer_collection), (sel.objects, set_object)]
+
+    with span('scope_resolve'):
+        scope_sels = get_scope_selections(sel)
+    # One batch of layer collections and objects per other view layer
+    for view_layer, layer_sel in scope_sels[1:]:
+        steps.append((layer_sel.layer_collections, set_layer_collection))
+        steps.append((layer_sel.objects, get_set_layer_object(view_layer)))
+
+    return hide, steps
+
+def disable_in_viewports_steps(sel : SelectionSnapshot, slice_size : int | None = None) -> tuple[bool, list[HideStep]]:
+    """
+    Plans the toggle of the "disable in viewports" state of a selection.
+
+    Parameters
+    ----------
+    sel : SelectionSnapshot
+        The selection to toggle.
+    slice_size : int, optional
+        If given, the flags are written by slices of this size, see `set_flag_step`.
+
+    Returns
+    -------
+    tuple[bool, list[HideStep]]
+        True if the selection will be hidden, False if it will be unhidden, and the steps doing it.
+        The flags are written in bulk.
+    """
+
+    with span('state_compute'):
+        hide = get_target_state(get_sel_global_state_disable_viewport(sel))
+
+    write_step = set_flag_step(sel, 'hide_viewport', hide, slice_size)
+
+    if hide:
+        return hide, [(get_selected_objects(sel.objects), lambda obj: obj.select_set(False)), write_step]
+    else:
+        return hide, [write_step, (sel.objects, lambda obj: obj.select_set(True))]
+
+def disable_in_renders_steps(sel : SelectionSnapshot, slice_size : int | None = None) -> tuple[bool, list[HideStep]]:
+    """
+    Plans the toggle of the "disable in renders" state of a selection.
+
+    Parameters
+    ----------
+    sel : SelectionSnapshot
+        The selection to toggle.
+    slice_size : int, optional
+        If given, the flags are written by slices of this size, see `set_flag_step`.
+
+    Returns
+    -------
+    tuple[bool, list[HideStep]]
+        True if the selection will be hidden, False if it will be unhidden, and the steps doing it.
+        The flags are written in bulk.
+    """
+
+    with span('state_compute'):
+        hide = get_target_state(get_sel_global_state_disable_render(sel))
+
+    steps = [set_flag_step(sel, 'hide_render', hide, slice_size)]
+    if not hide:
+        steps.append((sel.objects, lambda obj: obj.select_set(True)))
+
+    return hide, steps
+
+def hide_in_viewport(sel : SelectionSnapshot) -> bool:
+    """
+    Toggles the "hide in viewport" state of a selection.
+
+    Parameters
+    ----------
+    sel : SelectionSnapshot
+        The selection to toggle.
+
+    Returns
+    -------
+    bool
+        True if the selection was hidden, False if it was unhidden.
+    """
+
+    hide, steps = hide_in_viewport_steps(sel)
+
+    with span('apply'):
+        ChunkedJob(steps).run()
+
+    return hide
+
+def disable_in_viewports(sel : SelectionSnapshot) -> bool:
+    """
+    Toggles the "disable in viewports" state of a selection.
+
+    Parameters
+    ----------
+    sel : SelectionSnapshot
+        The selection to toggle.
+
+    Returns
+    -------
+    bool
+        True if the selection was hidden, False if it was unhidden.
+    """
+
+    hide, steps = disable_in_viewports_steps(sel)
+
+    with span('apply'):
+        ChunkedJob(steps).run()
+
+    return hide
+
+def disable_in_renders(sel : SelectionSnapshot) -> bool:
+    """
+    Toggles the "disable in renders" state of a selection.
+
+    Parameters
+    ----------
+    sel : SelectionSnapshot
+        The selection to toggle.
+
+    Returns
+    -------
+    bool
+        True if the selection was hidden, False if it was unhidden.
+    """
+
+    hide, steps = disable_in_renders_steps(sel)
+
+    with span('apply'):
+        ChunkedJob(steps).run()
+
+    return hide
+
+# Implementation of each hide method, keyed by HidePreferences.hide_method
+HIDE_METHODS = {
+    'HIDEINVIEWPORT' : hide_in_viewport,
+    'DISABLEINVIEWPORTS' : disable_in_viewports,
+    'DISABLEINRENDERS' : disable_in_renders,
+    # The selection is narrowed down to the heaviest objects by get_operator_sel
+    'PERFORMANCE' : disable_in_viewports,
+}
+
+# Steps of each hide method, keyed by HidePreferences.hide_method
+HIDE_METHOD_STEPS = {
+    'HIDEINVIEWPORT' : hide_in_viewport_steps,
+    'DISABLEINVIEWPORTS' : disable_in_viewports_steps,
+    'DISABLEINRENDERS' : disable_in_renders_steps,
+    'PERFORMANCE' : disable_in_viewports_steps,
+}
+
+def get_hide_method() -> str:
+    """
+    Retrieves the hide method set in the addon preferences.
+
+    Returns
+    -------
+    str
+        One of the keys of HIDE_METHODS.
+    """
+
+    return get_addon_preferences().hide_method
+
+def get_undo_strategy() -> str:
+    """
+    Retrieves the undo strategy set in the addon preferences.
+
+    Returns
+    -------
+    str
+        Either 'FULL', 'VISIBILITY' or 'NO_VIEWPORT_HIDE'.
+    """
+
+    return get_addon_preferences().undo_strategy
+
+def get_hide_undo_strategy(hide_method : str) -> str:
+    """
+    Retrieves the undo strategy to use with a hide method.
+
+    Visibility only undo records the states of a single view layer, so Hide in Viewport pushes
+    regular undo steps instead when its scope covers other view layers.
+
+    Parameters
+    ----------
+    hide_method : str
+        One of the keys of HIDE_METHODS.
+
+    Returns
+    -------
+    str
+        Either 'FULL', 'VISIBILITY' or 'NO_VIEWPORT_HIDE'.
+    """
+
+    undo_strategy = get_undo_strategy()
+    if undo_strategy == 'VISIBILITY' and hide_method == 'HIDEINVIEWPORT' and get_scope() != 'VIEW_LAYER':
+        return 'FULL'
+    return undo_strategy
+
+def uses_full_undo(hide_method : str, undo_strategy : str) -> bool:
+    """
+    Tells whether a regular undo step has to be pushed.
+
+    Parameters
+    ----------
+    hide_method : str
+        One of the keys of HIDE_METHODS.
+    undo_strategy : str
+        Either 'FULL', 'VISIBILITY' or 'NO_VIEWPORT_HIDE'.
+
+    Returns
+    -------
+    bool
+        True if a regular undo step has to be pushed.
+    """
+
+    if undo_strategy == 'FULL':
+        return True
+    elif undo_strategy == 'NO_VIEWPORT_HIDE':
+        # Hide in viewport only changes view layer state
+        return hide_method != 'HIDEINVIEWPORT'
+    return False
+
+def apply_hide_method(hide_method : str, undo_message : str, sel : SelectionSnapshot, push : bool = True) -> None:
+    """
+    Toggles a selection with a hide method, remembers the selection and records a single undo step
+    according to the undo strategy. Timings go to the span opened by the caller.
+
+    The hide operators have no UNDO option, so the regular undo step is only pushed when the
+    undo strategy asks for it.
+
+    Parameters
+    ----------
+    hide_method : str
+        One of the keys of HIDE_METHODS.
+    undo_message : str
+        Name of the undo step.
+    sel : SelectionSnapshot
+        The selection to toggle.
+    push : bool, optional
+        Whether to push the regular undo step. False for calling operators with the UNDO option,
+        whose step is pushed by Blender. Default is True.
+
+    Returns
+    -------
+    None
+    """
+
+    if len(sel) == 0:
+        return
+
+    undo_strategy = get_hide_undo_strategy(hide_method)
+
+    if undo_strategy == 'VISIBILITY':
+        with span('undo_capture'):
+            changes = undo.capture(hide_method, sel)
+
+    hide = HIDE_METHODS[hide_method](sel)
+
+    with span('previous_sel_write'):
+        set_previous_sel(sel)
+
+    if undo_strategy == 'VISIBILITY':
+        with span('undo_record'):
+            undo.record(undo_message, changes, hide)
+
+    if push and uses_full_undo(hide_method, undo_strategy):
+        with span('undo_push'):
+            push_undo(undo_message)
+
+def run_hide_method(hide_method : str, bl_idname : str, undo_message : str, sel : SelectionSnapshot | None = None) -> None:
+    """
+    Toggles the selection with a hide method in the timing span of an operator call, see `apply_hide_method`.
+
+    Parameters
+    ----------
+    hide_method : str
+        One of the keys of HIDE_METHODS.
+    bl_idname : str
+        Idname of the calling operator, used for timings.
+    undo_message : str
+        Name of the undo step.
+    sel : SelectionSnapshot, optional
+        The selection to toggle. If None, it is gathered from the context.
+
+    Returns
+    -------
+    None
+    """
+
+    with operator_span(bl_idname) as op_span:
+        if sel == None:
+            with span('selection_gather'):
+                sel = get_operator_sel(hide_method)
+        op_span.count('collections', len(sel.collections))
+        op_span.count('objects', len(sel.objects))
+
+        apply_hide_method(hide_method, undo_message, sel)
+
+class HideJob:
+    """
+    Call of a hide method run in time-limited chunks, that can be rolled back until it is finished.
+
+    Attributes
+    ----------
+    hide_method : str
+        One of the keys of HIDE_METHOD_STEPS.
+    sel : SelectionSnapshot
+        The selection being toggled.
+    undo_message : str
+        Name of the undo step.
+    hide : bool
+        True if the selection is being hidden, False if it is being unhidden.
+    job : ChunkedJob
+        The steps of the hide method.
+    """
+
+    def __init__(self, hide_method : str, sel : SelectionSnapshot, undo_message : str):
+        self.hide_method = hide_method
+        self.sel = sel
+        self.undo_message = undo_message
+        self.undo_strategy = get_hide_undo_strategy(hide_method)
+        self.scene = bpy.context.scene
+        self.view_layer = bpy.context.view_layer
+
+        # Needed to roll back, and reused by the visibility undo strategy
+        with span('undo_capture'):
+            self.changes = undo.capture(hide_method, sel, self.view_layer)
+            # States of the other view layers of the scope, only rolled back
+            self.scope_changes = []
+            if hide_method == 'HIDEINVIEWPORT':
+                for view_layer, layer_sel in get_scope_selections(sel)[1:]:
+                    self.scope_changes.append((view_layer, undo.capture(hide_method, layer_sel, view_layer)))
+        self.selected = get_selected_objects(sel.objects, self.view_layer)
+
+        # Bulk writes are sliced, so every chunk keeps to its time budget
+        self.hide, steps = HIDE_METHOD_STEPS[hide_method](sel, MODAL_BULK_SLICE)
+        self.job = ChunkedJob(steps)
+
+    def run(self, budget : float | None = None) -> bool:
+        """
+        Runs the hide method for at most `budget` seconds, and finishes the call once it is done.
+
+        Returns
+        -------
+        bool
+            True if the call is finished.
+        """
+
+        with span('apply'):
+            done = self.job.run(budget)
+
+        if done:
+            with span('previous_sel_write'):
+                set_previous_sel(self.sel)
+
+            if self.undo_strategy == 'VISIBILITY':
+                with span('undo_record'):
+                    undo.record(self.undo_message, self.changes, self.hide, self.scene, self.view_layer)
+
+            if uses_full_undo(self.hide_method, self.undo_strategy):
+                with span('undo_push'):
+                    push_undo(self.undo_message)
+
+        return done
+
+    def rollback(self) -> None:
+        """
+        Sets back the flags and the selection the hide method may have changed so far.
+
+        Returns
+        -------
+        None
+        """
+
+        for view_layer, layer_changes in [(self.view_layer, self.changes)] + self.scope_changes:
+            changes = []
+            for flag, id_type, uids, values in layer_changes:
+                mask = values != self.hide
+                changes.append((flag, id_type, uids[mask], values[mask]))
+            undo.apply_delta(undo.VisibilityDelta(self.undo_message, view_layer.id_data.session_uid, view_layer.name, changes))
+
+        selected = set(self.selected)
+        set_objects_selected([obj for obj in self.sel.objects if obj not in selected], False, self.view_layer)
+        set_objects_selected(self.selected, True, self.view_layer)
+
+class ModalHideOperator:
+    """
+    Mixin for the hide operators. Large selections are hidden modally, in time-limited chunks
+    showing progress, and Esc cancels by rolling back what was already done.
+
+    They have no UNDO option, the regular undo step is pushed according to the undo strategy.
+
+    Attributes
+    ----------
+    hide_method : str
+        One of the keys of HIDE_METHODS, or 'PREFERENCES' to use the hide method set in the addon preferences.
+    """
+
+    hide_method = 'PREFERENCES'
+
+    def get_operator_hide_method(self) -> str:
+        if self.hide_method == 'PREFERENCES':
+            return get_hide_method()
+        return self.hide_method
+
+    def execute(self, context):
+        debug(f'{self.bl_label} - execute')
+
+        run_hide_method(self.get_operator_hide_method(), self.bl_idname, self.bl_label)
+
+        return {"FINISHED"}
+
+    def invoke(self, context, event):
+        hide_method = self.get_operator_hide_method()
+
+        # Gathering a huge selection and capturing its state are part of the hotkey latency
+        with operator_span(self.bl_idname) as op_span:
+            with span('selection_gather'):
+                sel = get_operator_sel(hide_method)
+            op_span.count('collections', len(sel.collections))
+            op_span.count('objects', len(sel.objects))
+
+            if len(sel) < MODAL_MIN_IDS or context.window == None:
+                apply_hide_method(hide_method, self.bl_label, sel)
+                return {"FINISHED"}
+
+            self._hide_job = HideJob(hide_method, sel, self.bl_label)
+
+        wm = context.window_manager
+        wm.progress_begin(0, max(self._hide_job.job.total, 1))
+        self._timer = wm.event_timer_add(0.001, window=context.window)
+        wm.modal_handler_add(self)
+        context.workspace.status_text_set(f'{self.bl_label} : {len(sel)} items, press Esc to cancel')
+
+        return {"RUNNING_MODAL"}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self._hide_job.rollback()
+            self.end_modal(context)
+            self.report({"INFO"}, f'{self.bl_label} cancelled')
+            return {"CANCELLED"}
+
+        if event.type == 'TIMER':
+            with operator_span(self.bl_idname + '.chunk'):
+                done = self._hide_job.run(MODAL_CHUNK_BUDGET)
+            if done:
+                self.end_modal(context)
+                return {"FINISHED"}
+            context.window_manager.progress_update(self._hide_job.job.done)
+
+        # Other events are blocked until the selection is hidden
+        return {"RUNNING_MODAL"}
+
+    def cancel(self, context):
+        self._hide_job.rollback()
+        self.end_modal(context)
+
+    def end_modal(self, context) -> None:
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+
+class HideInViewport(ModalHideOperator, bpy.types.Operator):
     """
     Operator for hiding selected items in the viewport.
     """
@@ -328,7 +1038,8 @@ class HideInViewport(bpy.types.Operator):
     bl_idname = OP_IDNAME_PREFIX + "." + "hideinviewport"
     bl_label = "Hide - Hide in viewport"
     bl_description = "Temporarily hide in viewport."
-    bl_options = {"UNDO", "INTERNAL"}
+    bl_options = {"INTERNAL"}
+    hide_method = 'HIDEINVIEWPORT'
 
     internal_id : IntProperty(
         name = 'internal_id',
@@ -339,46 +1050,7 @@ class HideInViewport(bpy.types.Operator):
     def poll(cls, context):
         return True
 
-    def execute(self, context):
-        print('Hide - HideInViewport - execute')
-
-        ids: list[Object, Collection] = get_sel_collections() + get_sel_objects()
-        if len(ids) == 0:
-            ids = [item.id for item in bpy.context.scene.hide.previous_sel]
-
-        global_state = get_sel_global_state_hide_viewport(ids)
-
-        sel_layer_collections: tuple[LayerCollection] = get_sel_layer_collections(ids)
-        if len(sel_layer_collections) > 0:
-            if global_state == None or global_state == False:
-                for layer_collection in sel_layer_collections:
-                    layer_collection.hide_viewport = True
-            else:
-                for layer_collection in sel_layer_collections:
-                    layer_collection.hide_viewport = False
-
-        sel_objects = get_sel_objects(ids)
-        if len(sel_objects) > 0:
-            if global_state == None or global_state == False:
-                for obj in sel_objects:
-                    obj.hide_set(True)
-                    obj.select_set(False)
-            else:
-                for obj in sel_objects:
-                    obj.hide_set(False)
-                    obj.select_set(True)
-
-        try:
-            bpy.context.scene.hide.previous_sel.clear()
-        except:
-            pass
-        for id in ids:
-            previous_sel_new_item = bpy.context.scene.hide.previous_sel.add()
-            previous_sel_new_item.id = id
-
-        return {"FINISHED"}
-
-class DisableInViewports(bpy.types.Operator):
+class DisableInViewports(ModalHideOperator, bpy.types.Operator):
     """
     Operator for disabling selected items in the viewport.
     """
@@ -386,7 +1058,8 @@ class DisableInViewports(bpy.types.Operator):
     bl_idname = OP_IDNAME_PREFIX + "." + "disableinviewports"
     bl_label = "Hide - Disable in viewport"
     bl_description = "Disable in viewport."
-    bl_options = {"UNDO", "INTERNAL"}
+    bl_options = {"INTERNAL"}
+    hide_method = 'DISABLEINVIEWPORTS'
 
     internal_id : IntProperty(
         name = 'internal_id',
@@ -397,37 +1070,7 @@ class DisableInViewports(bpy.types.Operator):
     def poll(cls, context):
         return True
 
-    def execute(self, context):
-        print('Hide - DisableInViewports - execute')
-
-        ids: list[Object, Collection] = get_sel_collections() + get_sel_objects()
-        if len(ids) == 0:
-            ids = [item.id for item in bpy.context.scene.hide.previous_sel]
-
-        if len(ids) > 0:
-            global_state = get_sel_global_state_disable_viewport(ids)
-            if global_state == None or global_state == False:
-                for id in ids:
-                    id.hide_viewport = True
-                    if id.bl_rna.identifier == 'Object':
-                        id.select_set(False)
-            else:
-                for id in ids:
-                    id.hide_viewport = False
-                    if id.bl_rna.identifier == 'Object':
-                        id.select_set(True)
-
-            try:
-                bpy.context.scene.hide.previous_sel.clear()
-            except:
-                pass
-            for id in ids:
-                previous_sel_new_item = bpy.context.scene.hide.previous_sel.add()
-                previous_sel_new_item.id = id
-
-        return {"FINISHED"}
-
-class DisableInRenders(bpy.types.Operator):
+class DisableInRenders(ModalHideOperator, bpy.types.Operator):
     """
     Operator for disabling selected items in renders.
     """
@@ -435,7 +1078,8 @@ class DisableInRenders(bpy.types.Operator):
     bl_idname = OP_IDNAME_PREFIX + "." + "disableinrenders"
     bl_label = "Hide - Disable in render"
     bl_description = "Disable in render."
-    bl_options = {"UNDO", "INTERNAL"}
+    bl_options = {"INTERNAL"}
+    hide_method = 'DISABLEINRENDERS'
 
     internal_id : IntProperty(
         name = 'internal_id',
@@ -446,35 +1090,27 @@ class DisableInRenders(bpy.types.Operator):
     def poll(cls, context):
         return True
 
-    def execute(self, context):
-        print('Hide - DisableInRenders - execute')
-
-        ids: list[Object, Collection] = get_sel_collections() + get_sel_objects()
-        if len(ids) == 0:
-            ids = [item.id for item in bpy.context.scene.hide.previous_sel]
-
-        if len(ids) > 0:
-            global_state = get_sel_global_state_disable_render(ids)
-            if global_state == None or global_state == False:
-                for id in ids:
-                    id.hide_render = True
-            else:
-                for id in ids:
-                    id.hide_render = False
-                    if id.bl_rna.identifier == 'Object':
-                        id.select_set(True)
-            
-            try:
-                bpy.context.scene.hide.previous_sel.clear()
-            except:
-                pass
-            for id in ids:
-                previous_sel_new_item = bpy.context.scene.hide.previous_sel.add()
-                previous_sel_new_item.id = id
+class PerformanceHide(ModalHideOperator, bpy.types.Operator):
+    """
+    Operator for disabling the heaviest objects in viewports until the polygon budget is met.
+    """
 
-        return {"FINISHED"}
+    bl_idname = OP_IDNAME_PREFIX + "." + "performancehide"
+    bl_label = "Hide - Performance hide"
+    bl_description = "Disable the heaviest objects of the selection, or of the view layer when nothing is selected, until the polygon budget is met."
+    bl_options = {"INTERNAL"}
+    hide_method = 'PERFORMANCE'
+
+    internal_id : IntProperty(
+        name = 'internal_id',
+        options = {"HIDDEN"}
+    ) # type: ignore
 
-class Hide(bpy.types.Operator):
+    @classmethod
+    def poll(cls, context):
+        return True
+
+class Hide(ModalHideOperator, bpy.types.Operator):
     """
     Operator for hiding selected items using prefered hide method.
     """
@@ -482,7 +1118,7 @@ class Hide(bpy.types.Operator):
     bl_idname = OP_IDNAME_PREFIX + "." + "hide"
     bl_label = "Hide - Hide"
     bl_description = "Hide the selection"
-    bl_options = {"UNDO", "INTERNAL"}
+    bl_options = {"INTERNAL"}
 
     internal_id : IntProperty(
         name = 'internal_id',
@@ -493,26 +1129,12 @@ class Hide(bpy.types.Operator):
     def poll(cls, context):
         return True
 
-    def execute(self, context):
-        print('Hide - Hide - execute')
-
-        addon_prefs = bpy.context.preferences.addons[ADDON_NAME].preferences
-        hide_method = addon_prefs.hide_method
-
-        if hide_method == 'HIDEINVIEWPORT':
-            bpy.ops.hide.hideinviewport()
-        elif hide_method == 'DISABLEINVIEWPORTS':
-            bpy.ops.hide.disableinviewports()
-        elif hide_method == 'DISABLEINRENDERS':
-            bpy.ops.hide.disableinrenders()
-
-        return {"FINISHED"}
-
 
 classes = (
     HideInViewport,
     DisableInViewports,
     DisableInRenders,
+    PerformanceHide,
     Hide,
 )
 
@@ -0,0 +1,366 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+import numpy as np
+
+import bpy
+from bpy.app.handlers import persistent
+from bpy.types import Depsgraph, Mesh, Object, Scene, ViewLayer
+
+from .core import SelectionSnapshot
+from .indexes import get_object_index
+from .memory import resolve_uids
+from .visibility import (get_flags,
+                         write_handlers,
+                        )
+
+# Nesting depth of collection instances after which instanced objects are not counted
+MAX_INSTANCE_DEPTH = 8
+
+# Face count of meshes used without modifiers, keyed by mesh session UID
+_mesh_faces: dict[int, int] = {}
+# Evaluated face count of objects with modifiers or of other types than mesh, keyed by object session UID.
+# Values are the pointer of the evaluated data the count was read from, and the count.
+_object_faces: dict[int, tuple[int, int]] = {}
+
+class CostIndex:
+    """
+    Cost of every object of a view layer, aligned with its object index.
+
+    Attributes
+    ----------
+    objects : tuple[Object]
+        The objects of the view layer, as returned by `get_object_index`.
+    uids : np.ndarray
+        Session UIDs of the objects.
+    positions : dict[int, int]
+        Position of each object, keyed by session UID.
+    faces : np.ndarray
+        Evaluated face count of each object, including the objects it instances.
+    modifiers : np.ndarray
+        Number of modifiers of each object.
+    instancers : np.ndarray
+        Positions of the objects instancing a collection, whose cost depends on other objects.
+    unevaluated : set[int]
+        Positions of the objects that were not evaluated, whose cost was counted from their original data.
+        They are marked dirty when they are updated or enabled in viewports.
+    dirty : set[int]
+        Session UIDs of the objects whose cost changed since it was computed.
+    """
+
+    __slots__ = ('objects', 'uids', 'positions', 'faces', 'modifiers', 'instancers', 'unevaluated', 'dirty')
+
+    def __init__(self, objects: tuple[Object], uids: np.ndarray, depsgraph: Depsgraph):
+        self.objects = objects
+        self.uids = uids
+        self.positions = dict(zip(uids.tolist(), range(len(uids))))
+        self.faces = np.fromiter((get_object_faces(obj, depsgraph) for obj in objects), dtype=np.int64, count=len(objects))
+        self.modifiers = np.fromiter((len(obj.modifiers) for obj in objects), dtype=np.int32, count=len(objects))
+        self.instancers = np.flatnonzero(np.fromiter((is_instancer(obj) for obj in objects), dtype=bool, count=len(objects)))
+        self.unevaluated = {position for position, obj in enumerate(objects) if not is_evaluated(obj, depsgraph)}
+        self.dirty: set[int] = set()
+
+    def mark_evaluated(self, uids: np.ndarray) -> None:
+        """
+        Marks the objects that were not evaluated as dirty, when they may be evaluated now,
+        e.g. once enabled in viewports again.
+
+        Parameters
+        ----------
+        uids : np.ndarray
+            Session UIDs of the objects. Other objects are ignored.
+
+        Returns
+        -------
+        None
+        """
+
+        if len(self.unevaluated) == 0 or len(uids) == 0:
+            return
+
+        positions = np.fromiter(self.unevaluated, dtype=np.intp, count=len(self.unevaluated))
+        positions = positions[np.isin(self.uids[positions], uids)]
+        self.unevaluated.difference_update(positions.tolist())
+        self.dirty.update(self.uids[positions].tolist())
+
+    def update(self, depsgraph: Depsgraph) -> None:
+        """
+        Computes the cost of the dirty objects and of the instancers again.
+
+        Parameters
+        ----------
+        depsgraph : Depsgraph
+            The evaluated dependency graph of the view layer.
+
+        Returns
+        -------
+        None
+        """
+
+        if len(self.dirty) == 0:
+            return
+
+        for uid in self.dirty:
+            position = self.positions.get(uid)
+            if position != None:
+                obj = self.objects[position]
+                self.faces[position] = get_object_faces(obj, depsgraph)
+                self.modifiers[position] = len(obj.modifiers)
+                if not is_evaluated(obj, depsgraph):
+                    self.unevaluated.add(position)
+
+        # Any change may affect an instanced collection
+        for position in self.instancers.tolist():
+            self.faces[position] = get_object_faces(self.objects[position], depsgraph)
+
+        self.dirty.clear()
+
+# Cost indexes per view layer, keyed by the view layer pointer
+_cost_indexes: dict[int, CostIndex] = {}
+
+def is_instancer(obj: Object) -> bool:
+    return obj.instance_type == 'COLLECTION' and obj.instance_collection != None
+
+def uses_evaluated_data(obj: Object) -> bool:
+    # Meshes without modifiers are counted from their original data, instancers from the instanced objects
+    return not is_instancer(obj) and not (obj.type == 'MESH' and len(obj.modifiers) == 0)
+
+def is_evaluated(obj: Object, depsgraph: Depsgraph) -> bool:
+    return not uses_evaluated_data(obj) or obj.evaluated_get(depsgraph).is_evaluated
+
+def get_object_faces(obj: Object, depsgraph: Depsgraph, depth: int = 0) -> int:
+    """
+    Computes the evaluated face count of an object, using the cached statistics of its data.
+
+    Objects instancing a collection cost the sum of the instanced objects.
+
+    Parameters
+    ----------
+    obj : Object
+        The object.
+    depsgraph : Depsgraph
+        The evaluated dependency graph.
+    depth : int, optional
+        Nesting depth of collection instances. Default is 0.
+
+    Returns
+    -------
+    int
+        The number of faces drawn for the object.
+    """
+
+    if is_instancer(obj):
+        if depth >= MAX_INSTANCE_DEPTH:
+            return 0
+        return sum(get_object_faces(instanced, depsgraph, depth + 1) for instanced in obj.instance_collection.all_objects)
+
+    if obj.type == 'MESH' and len(obj.modifiers) == 0:
+        mesh = obj.data
+        faces = _mesh_faces.get(mesh.session_uid)
+        if faces == None:
+            faces = len(mesh.polygons)
+            _mesh_faces[mesh.session_uid] = faces
+        return faces
+
+    evaluated = obj.evaluated_get(depsgraph)
+    data = evaluated.data
+    if not evaluated.is_evaluated or data == None:
+        # Objects left out of the depsgraph, e.g. disabled in viewports, only have their original
+        # data, which is not cached as modifiers will change it once they are evaluated
+        return len(data.polygons) if isinstance(data, Mesh) else 0
+
+    # The evaluated data is allocated again when the object is evaluated again
+    data_pointer = data.as_pointer()
+    cached = _object_faces.get(obj.session_uid)
+    if cached != None and cached[0] == data_pointer:
+        return cached[1]
+
+    faces = len(data.polygons) if isinstance(data, Mesh) else 0
+    _object_faces[obj.session_uid] = (data_pointer, faces)
+    return faces
+
+def get_cost_index(view_layer: ViewLayer | None = None, depsgraph: Depsgraph | None = None) -> CostIndex:
+    """
+    Retrieves the cached cost index of a view layer, building or updating it if needed.
+
+    Parameters
+    ----------
+    view_layer : ViewLayer, optional
+        The view layer to get the index of. If None, the context view layer is used.
+    depsgraph : Depsgraph, optional
+        The evaluated dependency graph of the view layer. If None, the context one is used.
+
+    Returns
+    -------
+    CostIndex
+        The cost of every object of the view layer.
+    """
+
+    if view_layer == None:
+        view_layer = bpy.context.view_layer
+    if depsgraph == None:
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+
+    # Callers read flags by position in the index
+    objects, uids = get_object_index(view_layer, validate=True)
+
+    key = view_layer.as_pointer()
+    index = _cost_indexes.get(key)
+    # A new object index means objects were added, removed or reordered
+    if index == None or index.objects is not objects:
+        index = CostIndex(objects, uids, depsgraph)
+        _cost_indexes[key] = index
+    else:
+        index.update(depsgraph)
+
+    return index
+
+def get_heaviest_objects(sel: SelectionSnapshot, budget: int, view_layer: ViewLayer | None = None) -> list[Object]:
+    """
+    Picks the objects to disable in viewports, from heaviest to lightest, so the faces drawn in a
+    view layer fit in a budget.
+
+    Objects are ranked by evaluated face count, then by number of modifiers. When every candidate
+    is already disabled, they are all returned so the toggle enables them again.
+
+    Parameters
+    ----------
+    sel : SelectionSnapshot
+        The selection to pick from. Objects of the selected collections are candidates too.
+        If empty, every object of the view layer is a candidate.
+    budget : int
+        The number of faces the view layer should draw at most.
+    view_layer : ViewLayer, optional
+        The view layer to count faces in. If None, the context view layer is used.
+
+    Returns
+    -------
+    list[Object]
+        The objects to toggle.
+    """
+
+    if view_layer == None:
+        view_layer = bpy.context.view_layer
+
+    index = get_cost_index(view_layer)
+    disabled = get_flags(view_layer.objects, 'hide_viewport')
+
+    if len(sel) == 0:
+        candidates = np.ones(len(index.uids), dtype=bool)
+    else:
+        uids = set(sel.uids_per_type.get('Object', ()))
+        for collection in sel.collections:
+            uids.update(obj.session_uid for obj in collection.all_objects)
+        candidates = np.isin(index.uids, np.fromiter(uids, dtype=np.int32, count=len(uids)))
+
+    if candidates.any() and disabled[candidates].all():
+        return [index.objects[position] for position in np.flatnonzero(candidates).tolist()]
+
+    excess = int(index.faces[~disabled].sum()) - budget
+    if excess <= 0:
+        return []
+
+    positions = np.flatnonzero(candidates & ~disabled & (index.faces > 0))
+    # Heaviest first, more modifiers first among equal face counts
+    positions = positions[np.lexsort((-index.modifiers[positions], -index.faces[positions]))]
+    count = int(np.searchsorted(np.cumsum(index.faces[positions]), excess)) + 1
+
+    return [index.objects[position] for position in positions[:count].tolist()]
+
+def clear() -> None:
+    """
+    Drops every cached statistic and cost index.
+
+    Returns
+    -------
+    None
+    """
+
+    _mesh_faces.clear()
+    _object_faces.clear()
+    _cost_indexes.clear()
+
+@persistent
+def on_depsgraph_update_post(scene: Scene, depsgraph: Depsgraph) -> None:
+    if len(_cost_indexes) == 0 and len(_mesh_faces) == 0 and len(_object_faces) == 0:
+        return
+
+    updated_objects = []
+    for update in depsgraph.updates:
+        id = update.id.original
+        if isinstance(id, Object):
+            # Objects evaluated for the first time are reported too, e.g. once shown again
+            updated_objects.append(id.session_uid)
+        if not update.is_updated_geometry:
+            continue
+        if isinstance(id, Mesh):
+            _mesh_faces.pop(id.session_uid, None)
+        elif isinstance(id, Object):
+            # Editing a mesh also reports the objects using it
+            _object_faces.pop(id.session_uid, None)
+            for index in _cost_indexes.values():
+                index.dirty.add(id.session_uid)
+
+    if len(updated_objects) > 0:
+        uids = np.array(updated_objects, dtype=np.int32)
+        for index in _cost_indexes.values():
+            index.mark_evaluated(uids)
+
+def on_flags_written(id_type: str, attr: str, uids: np.ndarray, values: np.ndarray | bool) -> None:
+    # Enabling in viewports evaluates objects, even outside of the depsgraph updates being reported
+    if attr != 'hide_viewport' or not any(len(index.unevaluated) > 0 for index in _cost_indexes.values()):
+        return
+
+    uids = np.asarray(uids)
+    enabled = uids[~np.broadcast_to(np.asarray(values, dtype=bool), uids.shape)]
+    if id_type == 'Collection':
+        objects = [obj for collection in resolve_uids({'Collection': enabled}) for obj in collection.all_objects]
+        enabled = np.fromiter((obj.session_uid for obj in objects), dtype=np.int32, count=len(objects))
+    elif id_type != 'Object':
+        return
+
+    for index in _cost_indexes.values():
+        index.mark_evaluated(enabled)
+
+@persistent
+def on_file_changed(*args) -> None:
+    # Loading a file or stepping through undo reallocates the data, cached statistics are not valid anymore
+    clear()
+
+handlers = (
+    (bpy.app.handlers.depsgraph_update_post, on_depsgraph_update_post),
+    (bpy.app.handlers.load_post, on_file_changed),
+    (bpy.app.handlers.undo_post, on_file_changed),
+    (bpy.app.handlers.redo_post, on_file_changed),
+)
+
+classes = ()
+
+def register():
+    from bpy.utils import register_class
+    for cls in classes:
+        register_class(cls)
+
+    for handler_list, handler in handlers:
+        if handler not in handler_list:
+            handler_list.append(handler)
+
+    if on_flags_written not in write_handlers:
+        write_handlers.append(on_flags_written)
+
+def unregister():
+    if on_flags_written in write_handlers:
+        write_handlers.remove(on_flags_written)
+
+    for handler_list, handler in handlers:
+        if handler in handler_list:
+            handler_list.remove(handler)
+
+    clear()
+
+    from bpy.utils import unregister_class
+    for cls in reversed(classes):
+        unregister_class(cls)
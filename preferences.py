@@ -5,23 +5,28 @@
 # along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
 
 import os, json
+import hashlib
+import tempfile
+import threading
 from typing import Any
 
 import bpy
-from bpy.types import AddonPreferences, KeyMap, KeyMapItem
+from bpy.types import AddonPreferences, KeyConfig, KeyMap, KeyMapItem
 from bpy.props import (
+    BoolProperty,
     EnumProperty,
     IntProperty,
 )
-import rna_keymap_ui
 
 from .constants import (
     PREFS_FILEPATH,
-    PREFS_DIR,
     ADDON_NAME,
     OP_IDNAME_PREFIX,
 )
+from . import instrumentation
+from .instrumentation import operator_span
 from .keymap import (
+    keymap_registry,
     get_user_kmis,
     get_user_kmi_parms,
     add_addon_kmi,
@@ -92,8 +97,14 @@ def set_addon_prefs(prefs_values, preferences: bool = True, keymaps: bool = True
     # Preferences
     preferences = bpy.context.preferences.addons[ADDON_NAME].preferences
     for key in preferences.__annotations__.keys():
-        value = prefs_values['preferences'][key]
-        setattr(preferences, key, value)
+        # Files saved by older versions may miss newer preferences
+        if key in prefs_values['preferences']:
+            value = prefs_values['preferences'][key]
+            try:
+                setattr(preferences, key, value)
+            except TypeError:
+                # Or hold an option that was removed since
+                print(f'Hide - Ignoring the saved value {value!r} of the "{key}" preference')
 
     # Keymaps
     if prefs_values['keymaps']:
@@ -101,27 +112,229 @@ def set_addon_prefs(prefs_values, preferences: bool = True, keymaps: bool = True
             for kmi_def in prefs_values['keymaps'][km_name]:
                 add_addon_kmi(kmi_def['id'], **kmi_def['parms'])
 
-def export_preferences_to_file() -> None:
+# Maximum time spent waiting for a background write when the addon is unregistered, in seconds
+PREFS_FLUSH_TIMEOUT = 2.0
+
+def serialize_prefs(prefs_values: dict[str, Any]) -> tuple[str, str]:
+    """
+    Serializes addon preferences and keymaps the way they are written to the file.
+
+    Parameters
+    ----------
+    prefs_values : dict[str, Any]
+        The preferences, as returned by `get_addon_prefs`.
+
+    Returns
+    -------
+    tuple[str, str]
+        The JSON data and its SHA-1 hash.
+    """
+
+    json_data = json.dumps(prefs_values, indent=4, sort_keys=True)
+    return json_data, hashlib.sha1(json_data.encode('utf-8')).hexdigest()
+
+def write_file_atomic(filepath: str, data: str) -> None:
+    """
+    Writes a text file through a temporary file renamed over it, so it is never left truncated.
+
+    Parameters
+    ----------
+    filepath : str
+        Path of the file to write.
+    data : str
+        The text to write.
+
+    Returns
+    -------
+    None
+    """
+
+    dirpath = os.path.dirname(filepath)
+    if os.path.exists(dirpath) == False:
+        os.makedirs(dirpath)
+
+    fd, temp_filepath = tempfile.mkstemp(prefix='.' + os.path.basename(filepath), suffix='.tmp', dir=dirpath)
+    try:
+        with os.fdopen(fd, 'w') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_filepath, filepath)
+    except:
+        if os.path.exists(temp_filepath):
+            os.remove(temp_filepath)
+        raise
+
+class PreferencesWriter:
+    """
+    Writes the preferences file when its content changed, either directly or on a background thread.
+
+    Attributes
+    ----------
+    filepath : str
+        Path of the preferences file.
+    saved_hash : str | None
+        Hash of the content last loaded from or written to the file, None if unknown.
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.saved_hash: str | None = None
+        self._write_lock = threading.Lock()
+        self._condition = threading.Condition()
+        # Latest preferences waiting to be written, older ones are dropped
+        self._pending: dict[str, Any] | None = None
+        self._busy = False
+        self._stopped = False
+        self._thread: threading.Thread | None = None
+
+    def write(self, prefs_values: dict[str, Any]) -> bool:
+        """
+        Writes preferences to the file, unless they match what it already holds.
+
+        Parameters
+        ----------
+        prefs_values : dict[str, Any]
+            The preferences, as returned by `get_addon_prefs`.
+
+        Returns
+        -------
+        bool
+            True if the file was written.
+        """
+
+        json_data, content_hash = serialize_prefs(prefs_values)
+
+        with self._write_lock:
+            if content_hash == self.saved_hash:
+                return False
+            write_file_atomic(self.filepath, json_data)
+            self.saved_hash = content_hash
+
+        print(f'Preferences successfully saved to "{self.filepath}"')
+        return True
+
+    def submit(self, prefs_values: dict[str, Any]) -> None:
+        """
+        Queues preferences to be written by the background thread.
+
+        Parameters
+        ----------
+        prefs_values : dict[str, Any]
+            The preferences, as returned by `get_addon_prefs`. They must not be modified afterwards.
+
+        Returns
+        -------
+        None
+        """
+
+        with self._condition:
+            self._pending = prefs_values
+            self._stopped = False
+            if self._thread == None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='HidePreferencesWriter', daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Waits for the queued preferences to be written.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time to wait, in seconds. If None, waits until done.
+
+        Returns
+        -------
+        bool
+            True if nothing is left to write.
+        """
+
+        with self._condition:
+            return self._condition.wait_for(lambda: self._pending == None and not self._busy, timeout)
+
+    def stop(self) -> None:
+        """
+        Lets the background thread end once the queued preferences are written.
+
+        Returns
+        -------
+        None
+        """
+
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending != None or self._stopped)
+                if self._pending == None:
+                    return
+                prefs_values = self._pending
+                self._pending = None
+                self._busy = True
+
+            try:
+                self.write(prefs_values)
+            except Exception as e:
+                print(f'Failed to save preferences : {e}')
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+prefs_writer = PreferencesWriter(PREFS_FILEPATH)
+
+def export_preferences_to_file(background: bool = False) -> None:
     """
     Exports the current addon preferences and user-defined keymaps to a file.
+    Nothing is written when they did not change since they were last loaded or saved.
+
+    Parameters
+    ----------
+    background : bool, optional
+        If True, the serialization and the write are done on a background thread,
+        see `flush_preferences`. Default is False.
 
     Returns
     -------
     None
     """
 
+    # Until they are loaded, the file still holds the preferences of the last session
+    if not _preferences_loaded:
+        return
+
     prefs_values = get_addon_prefs()
     
     if prefs_values:
-        json_data = json.dumps(prefs_values, indent=4)
-        
-        # Write the JSON data to a file
-        if os.path.exists(PREFS_DIR) == False:
-            os.makedirs(PREFS_DIR)
-        with open(PREFS_FILEPATH, 'w') as file:
-            file.write(json_data)
+        if background:
+            prefs_writer.submit(prefs_values)
+        else:
+            prefs_writer.write(prefs_values)
+
+def flush_preferences(timeout: float | None = PREFS_FLUSH_TIMEOUT) -> bool:
+    """
+    Waits for the preferences exported in the background to be written.
 
-        print(f'Preferences successfully saved to "{PREFS_FILEPATH}"')
+    Parameters
+    ----------
+    timeout : float, optional
+        Maximum time to wait, in seconds. Default is `PREFS_FLUSH_TIMEOUT`.
+
+    Returns
+    -------
+    bool
+        True if the preferences were written in time.
+    """
+
+    done = prefs_writer.flush(timeout)
+    if not done:
+        print(f'Preferences are still being saved to "{PREFS_FILEPATH}"')
+    return done
 
 def load_preferences_from_file(preferences: bool = True, keymaps: bool = True) -> None:
     """
@@ -145,6 +358,9 @@ def load_preferences_from_file(preferences: bool = True, keymaps: bool = True) -
 
             set_addon_prefs(prefs_values, preferences=preferences, keymaps=keymaps)
 
+        # Exporting the same values again can then be skipped
+        prefs_writer.saved_hash = serialize_prefs(prefs_values)[1]
+
         print(f'Preferences successfully loaded from "{PREFS_FILEPATH}"')
 
     except FileNotFoundError:
@@ -157,6 +373,152 @@ def load_preferences_from_file(preferences: bool = True, keymaps: bool = True) -
         if keymaps == True:
             add_default_keymaps()
 
+# True once the preferences were loaded from the file, or the loading was given up
+_preferences_loaded = False
+
+def ensure_preferences_loaded() -> None:
+    """
+    Loads the addon preferences and user-defined keymaps from the file, unless it was already done.
+    Loading is otherwise deferred after startup, see `schedule_preferences_loading`.
+
+    Returns
+    -------
+    None
+    """
+
+    global _preferences_loaded
+
+    if _preferences_loaded:
+        return
+    _preferences_loaded = True
+
+    if bpy.app.timers.is_registered(load_preferences_timer):
+        bpy.app.timers.unregister(load_preferences_timer)
+
+    with operator_span('preferences.load'):
+        load_preferences_from_file()
+
+def load_preferences_timer() -> None:
+    ensure_preferences_loaded()
+
+    # The preferences are not drawn until they are loaded
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'PREFERENCES':
+                area.tag_redraw()
+
+    # One-shot timer
+    return None
+
+def schedule_preferences_loading() -> None:
+    """
+    Defers the loading of the addon preferences and user-defined keymaps to the first
+    event loop iteration, so it does not weigh on Blender startup.
+
+    Returns
+    -------
+    None
+    """
+
+    global _preferences_loaded
+    _preferences_loaded = False
+
+    if not bpy.app.timers.is_registered(load_preferences_timer):
+        bpy.app.timers.register(load_preferences_timer, first_interval=0.0, persistent=True)
+
+def get_addon_preferences() -> 'HidePreferences':
+    """
+    Retrieves the addon preferences, loading them from the file first if needed.
+
+    Returns
+    -------
+    HidePreferences
+        The addon preferences.
+    """
+
+    ensure_preferences_loaded()
+    return bpy.context.preferences.addons[ADDON_NAME].preferences
+
+# Hotkeys panel model and the keymap registry generation it was built from
+_hotkeys_panel_cache: tuple[int, list[tuple[str, list[int], list[tuple[int, str]]]]] | None = None
+
+def get_hotkeys_panel_model() -> list[tuple[str, list[int], list[tuple[int, str]]]]:
+    """
+    Retrieves what the hotkeys panel displays, computed again only when the keymaps changed.
+
+    Only identifiers are kept: Blender may copy the keyconfigs again behind the addon's back,
+    so KeyMaps and KeyMapItems are resolved on each draw, see `resolve_hotkeys_panel_kmis`.
+
+    Returns
+    -------
+    list[tuple[str, list[int], list[tuple[int, str]]]]
+        One (keymap name, user KeyMapItem IDs, missing default KeyMapItems) tuple per keymap.
+        Missing default KeyMapItems are given as (internal ID, operator idname) tuples.
+    """
+
+    global _hotkeys_panel_cache
+
+    if not keymap_registry.ensure():
+        return []
+
+    if _hotkeys_panel_cache != None and _hotkeys_panel_cache[0] == keymap_registry.generation:
+        return _hotkeys_panel_cache[1]
+
+    user_keymaps = get_user_kmis()
+    default_keymaps = get_default_kmis()
+    keymaps = []
+    for km_name in list(user_keymaps.keys()) + list(default_keymaps.keys()):
+        if km_name not in keymaps:
+            keymaps.append(km_name)
+
+    model = []
+    for km_name in keymaps:
+        missing_defaults = []
+        for kmi_id in default_keymaps.get(km_name, []):
+            if len(keymap_registry.get_by_id(kmi_id)) == 0:
+                kmi_def = get_default_kmi_def_from_id(kmi_id)
+                missing_defaults.append((kmi_id, kmi_def['parms']['kmi_op_idname']))
+        model.append((km_name, [kmi.id for kmi in user_keymaps.get(km_name, [])], missing_defaults))
+
+    _hotkeys_panel_cache = (keymap_registry.generation, model)
+    return model
+
+def resolve_hotkeys_panel_kmis(user_kc: KeyConfig, km_name: str, kmi_ids: list[int]) -> tuple[KeyMap | None, list[KeyMapItem]]:
+    """
+    Retrieves the KeyMap and KeyMapItems of the hotkeys panel model from their identifiers.
+    The keymap registry is invalidated if one of them no longer exists.
+
+    Parameters
+    ----------
+    user_kc : KeyConfig
+        The user keyconfig.
+    km_name : str
+        Name of the KeyMap.
+    kmi_ids : list[int]
+        IDs of the KeyMapItems in the KeyMap.
+
+    Returns
+    -------
+    tuple[KeyMap | None, list[KeyMapItem]]
+        The KeyMap, None if it no longer exists, and the KeyMapItems still existing.
+    """
+
+    km = user_kc.keymaps.get(km_name)
+    if km == None:
+        if len(kmi_ids) > 0:
+            keymap_registry.invalidate()
+        return (None, [])
+
+    kmis = []
+    for kmi_id in kmi_ids:
+        kmi = km.keymap_items.from_id(kmi_id)
+        if kmi == None:
+            keymap_registry.invalidate()
+        else:
+            kmis.append(kmi)
+
+    return (km, kmis)
+
 def reset_preferences() -> None:
     """
     Resets the addon preferences to their default values.
@@ -232,15 +594,75 @@ class HidePreferences(AddonPreferences):
             ('HIDEINVIEWPORT', 'Hide in Viewport', 'Temporarily hide in viewport'),
             ('DISABLEINVIEWPORTS', 'Disable in Viewports', 'Globally disable in viewports'),
             ('DISABLEINRENDERS', 'Disable in Renders', 'Globally disable in renders'),
+            ('PERFORMANCE', 'Performance', 'Disable the heaviest objects in viewports until the polygon budget is met'),
         ],
         description = 'The method that will be used to hide objects and collections',
         default='HIDEINVIEWPORT',
     ) # type: ignore
 
+    undo_strategy: EnumProperty(
+        name = "Undo",
+        items = [
+            ('FULL', 'Full', 'Push a regular undo step'),
+            ('VISIBILITY', 'Visibility only', 'Only record the changed visibility flags, reverted with "Hide - Undo visibility"'),
+            ('NO_VIEWPORT_HIDE', 'Skip for Hide in Viewport', 'Push no undo step for Hide in Viewport, which only changes view layer state, and a regular one otherwise'),
+        ],
+        description = 'How hiding and unhiding can be undone. Regular undo steps can be slow in heavy files',
+        default='FULL',
+    ) # type: ignore
+
+    polygon_budget: IntProperty(
+        name = "Polygon budget",
+        description = 'Number of faces the view layer should draw at most, once the Performance hide method disabled the heaviest objects',
+        default = 1000000,
+        min = 0,
+    ) # type: ignore
+
+    scope: EnumProperty(
+        name = "Scope",
+        items = [
+            ('VIEW_LAYER', 'View layer', 'Hide in the current view layer'),
+            ('SCENE', 'All view layers', 'Hide in every view layer of the current scene'),
+            ('ALL_SCENES', 'All scenes', 'Hide in every view layer of every scene'),
+        ],
+        description = 'The view layers Hide in Viewport applies to. Disabling in viewports and renders always applies to every view layer',
+        default='VIEW_LAYER',
+    ) # type: ignore
+
+    include_children: BoolProperty(
+        name = "Include children",
+        description = 'Also hide and unhide the children of the selected objects, at any depth',
+        default = False,
+    ) # type: ignore
+
+    instrumentation: BoolProperty(
+        name = "Record timings",
+        description = 'Record the time spent in each step of the operators, and print debug messages',
+        default = False,
+        update = lambda self, context: instrumentation.set_enabled(self.instrumentation),
+    ) # type: ignore
+
     def draw(self, context):
+        # Preferences and keymaps cannot be written while drawing, they are loaded by load_preferences_timer
+        if not _preferences_loaded:
+            self.layout.label(text='Loading preferences...')
+            return
+
+        with operator_span('HidePreferences.draw'):
+            self.draw_preferences(context)
+
+    def draw_preferences(self, context):
+        # Only needed once the preferences are displayed
+        import rna_keymap_ui
+
         layout = self.layout
 
         layout.prop(self, "hide_method")
+        if self.hide_method == 'PERFORMANCE':
+            layout.prop(self, "polygon_budget")
+        layout.prop(self, "undo_strategy")
+        layout.prop(self, "scope")
+        layout.prop(self, "include_children")
 
         layout.separator()
 
@@ -254,27 +676,22 @@ class HidePreferences(AddonPreferences):
 
         wm = bpy.context.window_manager
         user_kc = wm.keyconfigs.user
-        user_keymaps = get_user_kmis()
-        default_keymaps = get_default_kmis()
-        keymaps = []
-        for km_name in list(user_keymaps.keys()) + list(default_keymaps.keys()):
-            if km_name not in keymaps:
-                keymaps.append(km_name)
-
-        for km_name in keymaps:
+        for km_name, kmi_ids, missing_defaults in get_hotkeys_panel_model():
             hotkeys_col.label(text=f"•   {km_name}")
-            km: KeyMap = user_kc.keymaps[km_name]
-            if km_name in user_keymaps:
-                for kmi in user_keymaps[km_name]:
-                    hotkeys_col.context_pointer_set("keymap", km)
-                    rna_keymap_ui.draw_kmi([], user_kc, km, kmi, hotkeys_col, 0)
-            if km_name in default_keymaps:
-                for kmi_id in default_keymaps[km_name]:
-                    if get_user_kmis(internal_id=kmi_id) == {}:
-                        kmi_def = get_default_kmi_def_from_id(kmi_id)
-                        kmi_op_idname = kmi_def['parms']['kmi_op_idname']
-                        hotkeys_col.operator("hide.adddefaultkeymapitem", text=f'Restore default hotkey for {kmi_op_idname}').internal_id = kmi_id
+            km, kmis = resolve_hotkeys_panel_kmis(user_kc, km_name, kmi_ids)
+            for kmi in kmis:
+                hotkeys_col.context_pointer_set("keymap", km)
+                rna_keymap_ui.draw_kmi([], user_kc, km, kmi, hotkeys_col, 0)
+            for kmi_id, kmi_op_idname in missing_defaults:
+                hotkeys_col.operator("hide.adddefaultkeymapitem", text=f'Restore default hotkey for {kmi_op_idname}').internal_id = kmi_id
         
+        layout.separator()
+
+        instrumentation_row = layout.row()
+        instrumentation_row.prop(self, "instrumentation")
+        instrumentation_row.operator("hide.exportinstrumentation", text='Export timings')
+        instrumentation_row.operator("hide.clearinstrumentation", text='Clear timings')
+
         # layout.separator()
         # layout.operator("hide.resetpreferences", text=f'Reset addon preferences')
 
@@ -290,6 +707,12 @@ def register():
         register_class(cls)
 
 def unregister():
+    if bpy.app.timers.is_registered(load_preferences_timer):
+        bpy.app.timers.unregister(load_preferences_timer)
+
+    flush_preferences()
+    prefs_writer.stop()
+
     from bpy.utils import unregister_class
     for cls in reversed(classes):
         unregister_class(cls)
\ No newline at end of file
@@ -9,6 +9,7 @@ from bpy.types import ID
 from bpy.props import (
     PointerProperty,
     CollectionProperty,
+    StringProperty,
 )
 
 class IDItem(bpy.types.PropertyGroup):
@@ -18,11 +19,30 @@ class IDItem(bpy.types.PropertyGroup):
     ) # type: ignore
 
 class HideSceneProperties(bpy.types.PropertyGroup):
+    # Only read from files saved by older versions, see previous_sel_names
     previous_sel : CollectionProperty(
         type = IDItem,
         name = 'previous_sel'
     ) # type: ignore
 
+    # Names of the previously selected IDs per type, as JSON, written when the file is saved
+    previous_sel_names : StringProperty(
+        name = 'previous_sel_names',
+        options = {"HIDDEN"},
+    ) # type: ignore
+
+    # Named visibility states as JSON, written when the file is saved, see states.py
+    visibility_states : StringProperty(
+        name = 'visibility_states',
+        options = {"HIDDEN"},
+    ) # type: ignore
+
+    # Named hide rules as JSON, see rules.py
+    rules : StringProperty(
+        name = 'rules',
+        options = {"HIDDEN"},
+    ) # type: ignore
+
 def init_addon_props():
     bpy.types.Scene.hide = PointerProperty(
         type = HideSceneProperties,
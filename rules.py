@@ -0,0 +1,672 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+import fnmatch
+import json
+import operator
+import re
+from typing import Callable, Iterable
+
+import numpy as np
+
+import bpy
+from bpy.app.handlers import persistent
+from bpy.types import Depsgraph, Object, Scene, ViewLayer
+from bpy.props import (
+    EnumProperty,
+    StringProperty,
+)
+
+from .constants import OP_IDNAME_PREFIX
+from .indexes import get_object_index
+from .instrumentation import (span,
+                              operator_span,
+                             )
+from .operators import (get_snapshot,
+                        get_hide_method,
+                        get_include_children,
+                        with_children,
+                        apply_hide_method,
+                       )
+
+# Comparison operators of custom property conditions
+COMPARISONS = {
+    '<' : operator.lt,
+    '<=' : operator.le,
+    '>' : operator.gt,
+    '>=' : operator.ge,
+    '==' : operator.eq,
+    '!=' : operator.ne,
+}
+
+# Quoted strings, parentheses, comparison operators and words
+TOKEN_PATTERN = re.compile(r'"[^"]*"|\'[^\']*\'|\(|\)|<=|>=|==|!=|<|>|[^\s()<>=!]+')
+
+class RuleError(ValueError):
+    """
+    Raised when a rule cannot be parsed.
+    """
+
+class AttributeIndex:
+    """
+    Attributes of every object of a view layer, stored by column and aligned with its object index.
+
+    Condition masks are cached, and only the rows of the objects updated since are evaluated again.
+
+    Attributes
+    ----------
+    objects : tuple[Object]
+        The objects of the view layer, as returned by `get_object_index`.
+    uids : np.ndarray
+        Session UIDs of the objects.
+    positions : dict[int, int]
+        Position of each object, keyed by session UID.
+    names : list[str]
+        Name of each object.
+    types : np.ndarray
+        Type of each object, e.g. 'MESH'.
+    material_uids : list[frozenset[int]]
+        Session UIDs of the materials of each object.
+    collection_uids : list[frozenset[int]]
+        Session UIDs of the collections each object is linked to.
+    properties : dict[str, np.ndarray]
+        Numeric custom property values of each object, NaN where missing, keyed by property name. Read on first use.
+    masks : dict[tuple, tuple[Condition, np.ndarray]]
+        Conditions evaluated so far with their cached mask, keyed by condition.
+    dirty : set[int]
+        Session UIDs of the objects updated since their attributes were read.
+    """
+
+    __slots__ = ('objects', 'uids', 'positions', 'names', 'types', 'material_uids', 'collection_uids', 'properties', 'masks', 'dirty')
+
+    def __init__(self, objects: tuple[Object], uids: np.ndarray):
+        count = len(objects)
+        self.objects = objects
+        self.uids = uids
+        self.positions = dict(zip(uids.tolist(), range(count)))
+        self.names = [obj.name for obj in objects]
+        self.types = np.array([obj.type for obj in objects], dtype='<U16')
+        self.material_uids = [get_material_uids(obj) for obj in objects]
+        self.collection_uids = [frozenset(collection.session_uid for collection in obj.users_collection) for obj in objects]
+        self.properties: dict[str, np.ndarray] = {}
+        self.masks: dict[tuple, tuple['Condition', np.ndarray]] = {}
+        self.dirty: set[int] = set()
+
+    def get_property(self, key: str) -> np.ndarray:
+        values = self.properties.get(key)
+        if values is None:
+            values = np.fromiter((get_number(obj, key) for obj in self.objects), dtype=np.float64, count=len(self.objects))
+            self.properties[key] = values
+        return values
+
+    def get_mask(self, condition: 'Condition') -> np.ndarray:
+        cached = self.masks.get(condition.key)
+        if cached == None:
+            cached = (condition, condition.evaluate(self, np.arange(len(self.objects))))
+            self.masks[condition.key] = cached
+        return cached[1]
+
+    def drop_masks(self, kind: str) -> None:
+        # Conditions resolving data by name go stale when that data is renamed, added or removed
+        for key in [key for key in self.masks if key[0] == kind]:
+            del self.masks[key]
+
+    def update(self) -> None:
+        """
+        Reads the attributes of the dirty objects again, and evaluates the cached conditions on their rows.
+
+        Returns
+        -------
+        None
+        """
+
+        if len(self.dirty) == 0:
+            return
+
+        positions = np.fromiter((self.positions[uid] for uid in self.dirty if uid in self.positions), dtype=np.int64)
+        self.dirty.clear()
+        if len(positions) == 0:
+            return
+
+        for position in positions.tolist():
+            obj = self.objects[position]
+            self.names[position] = obj.name
+            self.types[position] = obj.type
+            self.material_uids[position] = get_material_uids(obj)
+            self.collection_uids[position] = frozenset(collection.session_uid for collection in obj.users_collection)
+            for key, values in self.properties.items():
+                values[position] = get_number(obj, key)
+
+        for condition, mask in self.masks.values():
+            mask[positions] = condition.evaluate(self, positions)
+
+def get_material_uids(obj: Object) -> frozenset[int]:
+    return frozenset(slot.material.session_uid for slot in obj.material_slots if slot.material != None)
+
+def get_number(obj: Object, key: str) -> float:
+    value = obj.get(key)
+    return float(value) if isinstance(value, (int, float)) else np.nan
+
+class Condition:
+    """
+    Base of the conditions a rule is made of, each one evaluated over a column of an AttributeIndex.
+
+    Attributes
+    ----------
+    key : tuple
+        The kind of condition followed by its arguments, identifying its cached mask.
+    """
+
+    kind = ''
+
+    def __init__(self, *args):
+        self.key = (self.kind,) + args
+
+    def evaluate(self, index: AttributeIndex, positions: np.ndarray) -> np.ndarray:
+        """
+        Evaluates the condition on some rows of an index.
+
+        Parameters
+        ----------
+        index : AttributeIndex
+            The attributes of the objects.
+        positions : np.ndarray
+            The rows to evaluate.
+
+        Returns
+        -------
+        np.ndarray
+            A boolean array, True where the object of the row matches.
+        """
+
+        raise NotImplementedError
+
+class NameMatches(Condition):
+    kind = 'name'
+
+    def __init__(self, pattern: str):
+        super().__init__(pattern)
+        self.match = re.compile(fnmatch.translate(pattern)).match
+
+    def evaluate(self, index, positions):
+        match = self.match
+        names = index.names
+        return np.fromiter((match(names[position]) != None for position in positions.tolist()), dtype=bool, count=len(positions))
+
+class TypeIs(Condition):
+    kind = 'type'
+
+    def evaluate(self, index, positions):
+        return index.types[positions] == self.key[1].upper()
+
+class MaterialIs(Condition):
+    kind = 'material'
+
+    def evaluate(self, index, positions):
+        material = bpy.data.materials.get(self.key[1])
+        if material == None:
+            return np.zeros(len(positions), dtype=bool)
+        uid = material.session_uid
+        material_uids = index.material_uids
+        return np.fromiter((uid in material_uids[position] for position in positions.tolist()), dtype=bool, count=len(positions))
+
+class CollectionIs(Condition):
+    kind = 'collection'
+
+    def evaluate(self, index, positions):
+        # Objects of the child collections are in the collection too
+        collection = bpy.data.collections.get(self.key[1])
+        if collection == None:
+            return np.zeros(len(positions), dtype=bool)
+        uids = {collection.session_uid} | {child.session_uid for child in collection.children_recursive}
+        collection_uids = index.collection_uids
+        return np.fromiter((not uids.isdisjoint(collection_uids[position]) for position in positions.tolist()), dtype=bool, count=len(positions))
+
+class PropertyCompare(Condition):
+    kind = 'prop'
+
+    def evaluate(self, index, positions):
+        _, key, comparison, value = self.key
+        values = index.get_property(key)[positions]
+        # Objects without the property never match, even with !=
+        return COMPARISONS[comparison](values, value) & ~np.isnan(values)
+
+# Condition classes, keyed by kind
+CONDITIONS: dict[str, type[Condition]] = {cls.kind: cls for cls in (NameMatches, TypeIs, MaterialIs, CollectionIs, PropertyCompare)}
+
+Predicate = Callable[[AttributeIndex], np.ndarray]
+
+def tokenize(expression: str) -> list[str]:
+    return [token[1:-1] if token[0] in '"\'' else token for token in TOKEN_PATTERN.findall(expression)]
+
+def compile_rule(expression: str) -> Predicate:
+    """
+    Compiles a rule into a single predicate over the columns of an AttributeIndex.
+
+    A rule combines conditions with 'and', 'or', 'not' and parentheses. Conditions are:
+    `name matches <pattern>` with * and ? wildcards, `type is <type>`, `material is <name>`,
+    `collection is <name>` including its child collections, and `prop <name> <comparison> <number>`
+    with <, <=, >, >=, == or !=. Names with spaces are quoted.
+
+    Parameters
+    ----------
+    expression : str
+        The rule, e.g. 'name matches *_proxy or (type is LIGHT and prop lod > 1)'.
+
+    Returns
+    -------
+    Predicate
+        A function returning the mask of the objects of an index matching the rule.
+
+    Raises
+    ------
+    RuleError
+        If the rule cannot be parsed.
+    """
+
+    tokens = tokenize(expression)
+    position = 0
+
+    def peek() -> str | None:
+        return tokens[position].lower() if position < len(tokens) else None
+
+    def take(expected: str | None = None) -> str:
+        nonlocal position
+        if position >= len(tokens):
+            raise RuleError(f'Unexpected end of rule "{expression}"')
+        token = tokens[position]
+        if expected != None and token.lower() != expected:
+            raise RuleError(f'Expected "{expected}" instead of "{token}" in rule "{expression}"')
+        position += 1
+        return token
+
+    def parse_or() -> Predicate:
+        predicates = [parse_and()]
+        while peek() == 'or':
+            take()
+            predicates.append(parse_and())
+        if len(predicates) == 1:
+            return predicates[0]
+        return lambda index: np.logical_or.reduce([predicate(index) for predicate in predicates])
+
+    def parse_and() -> Predicate:
+        predicates = [parse_not()]
+        while peek() == 'and':
+            take()
+            predicates.append(parse_not())
+        if len(predicates) == 1:
+            return predicates[0]
+        return lambda index: np.logical_and.reduce([predicate(index) for predicate in predicates])
+
+    def parse_not() -> Predicate:
+        if peek() == 'not':
+            take()
+            predicate = parse_not()
+            return lambda index: ~predicate(index)
+        if peek() == '(':
+            take()
+            predicate = parse_or()
+            take(')')
+            return predicate
+        condition = parse_condition()
+        return lambda index: index.get_mask(condition)
+
+    def parse_condition() -> Condition:
+        kind = take().lower()
+        if kind == 'name':
+            take('matches')
+            return NameMatches(take())
+        if kind in ('type', 'material', 'collection'):
+            take('is')
+            return CONDITIONS[kind](take())
+        if kind == 'prop':
+            key = take()
+            comparison = take()
+            if comparison not in COMPARISONS:
+                raise RuleError(f'Unknown comparison "{comparison}" in rule "{expression}"')
+            value = take()
+            try:
+                return PropertyCompare(key, comparison, float(value))
+            except ValueError:
+                raise RuleError(f'"{value}" is not a number in rule "{expression}"')
+        raise RuleError(f'Unknown condition "{kind}" in rule "{expression}"')
+
+    predicate = parse_or()
+    if position < len(tokens):
+        raise RuleError(f'Unexpected "{tokens[position]}" in rule "{expression}"')
+
+    return predicate
+
+# Compiled rules, keyed by expression
+_compiled: dict[str, Predicate] = {}
+# Attribute indexes per view layer, keyed by the view layer pointer
+_attribute_indexes: dict[int, AttributeIndex] = {}
+
+def get_predicate(expression: str) -> Predicate:
+    predicate = _compiled.get(expression)
+    if predicate == None:
+        predicate = compile_rule(expression)
+        _compiled[expression] = predicate
+    return predicate
+
+def get_attribute_index(view_layer: ViewLayer | None = None) -> AttributeIndex:
+    """
+    Retrieves the cached attribute index of a view layer, building or updating it if needed.
+
+    Parameters
+    ----------
+    view_layer : ViewLayer, optional
+        The view layer to get the index of. If None, the context view layer is used.
+
+    Returns
+    -------
+    AttributeIndex
+        The attributes of every object of the view layer.
+    """
+
+    if view_layer == None:
+        view_layer = bpy.context.view_layer
+
+    objects, uids = get_object_index(view_layer)
+
+    key = view_layer.as_pointer()
+    index = _attribute_indexes.get(key)
+    # A new object index means objects were added, removed, reordered or linked to other collections
+    if index == None or index.objects is not objects:
+        index = AttributeIndex(objects, uids)
+        _attribute_indexes[key] = index
+    else:
+        index.update()
+
+    return index
+
+def get_matching_objects(expression: str, view_layer: ViewLayer | None = None) -> list[Object]:
+    """
+    Finds the objects of a view layer matching a rule.
+
+    Parameters
+    ----------
+    expression : str
+        The rule, see `compile_rule`.
+    view_layer : ViewLayer, optional
+        The view layer to look into. If None, the context view layer is used.
+
+    Returns
+    -------
+    list[Object]
+        The matching objects.
+
+    Raises
+    ------
+    RuleError
+        If the rule cannot be parsed.
+    """
+
+    predicate = get_predicate(expression)
+    index = get_attribute_index(view_layer)
+    return [index.objects[position] for position in np.flatnonzero(predicate(index)).tolist()]
+
+def get_rules(scene: Scene | None = None) -> dict[str, str]:
+    """
+    Retrieves the rules saved in a scene.
+
+    Parameters
+    ----------
+    scene : Scene, optional
+        The scene to get the rules of. If None, the context scene is used.
+
+    Returns
+    -------
+    dict[str, str]
+        The rules, keyed by name.
+    """
+
+    if scene == None:
+        scene = bpy.context.scene
+
+    if not scene.hide.rules:
+        return {}
+    try:
+        return json.loads(scene.hide.rules)
+    except ValueError as e:
+        print(f'Failed to read hide rules : {e}')
+        return {}
+
+def set_rules(rules: dict[str, str], scene: Scene | None = None) -> None:
+    if scene == None:
+        scene = bpy.context.scene
+
+    scene.hide.rules = json.dumps(rules, sort_keys=True)
+
+def clear() -> None:
+    """
+    Drops every attribute index.
+
+    Returns
+    -------
+    None
+    """
+
+    _attribute_indexes.clear()
+
+@persistent
+def on_depsgraph_update_post(scene: Scene, depsgraph: Depsgraph) -> None:
+    if len(_attribute_indexes) == 0:
+        return
+
+    for id_type, kind in (('MATERIAL', 'material'), ('COLLECTION', 'collection')):
+        if depsgraph.id_type_updated(id_type):
+            for index in _attribute_indexes.values():
+                index.drop_masks(kind)
+
+    for update in depsgraph.updates:
+        id = update.id.original
+        if isinstance(id, Object):
+            for index in _attribute_indexes.values():
+                index.dirty.add(id.session_uid)
+
+@persistent
+def on_file_changed(*args) -> None:
+    # Loading a file or stepping through undo reallocates the data, cached pointers are not valid anymore
+    clear()
+
+def apply_rule(op: bpy.types.Operator, expression: str) -> set[str]:
+    # Toggles the matching objects like the selection, with the preferred hide method
+    with operator_span(op.bl_idname) as op_span:
+        try:
+            with span('rule_match'):
+                objects = get_matching_objects(expression)
+        except RuleError as e:
+            op.report({"ERROR"}, str(e))
+            return {"CANCELLED"}
+
+        if len(objects) == 0:
+            op.report({"INFO"}, 'No object matches the rule')
+            return {"CANCELLED"}
+
+        sel = get_snapshot(objects)
+        if get_include_children():
+            sel = with_children(sel)
+        op_span.count('objects', len(sel.objects))
+
+        # The operators have the UNDO option, their regular undo step is pushed by Blender
+        apply_hide_method(get_hide_method(), op.bl_label, sel, push=False)
+
+    op.report({"INFO"}, f'{len(objects)} objects match the rule')
+
+    return {"FINISHED"}
+
+# Items of the rule name enums, kept referenced while Blender displays them
+_rule_items: list[tuple[str, str, str]] = []
+
+def get_rule_items(self, context) -> Iterable[tuple[str, str, str]]:
+    global _rule_items
+    _rule_items = [(name, name, expression) for name, expression in sorted(get_rules(context.scene).items())]
+    return _rule_items
+
+class ApplyHideRule(bpy.types.Operator):
+    """
+    Operator for hiding or unhiding the objects matching a rule.
+    """
+
+    bl_idname = OP_IDNAME_PREFIX + "." + "applyhiderule"
+    bl_label = "Hide - Apply rule"
+    bl_description = "Hide the objects matching a rule with the preferred hide method, or unhide them when they are all hidden"
+    bl_options = {"UNDO"}
+
+    expression : StringProperty(
+        name = 'Rule',
+        description = "e.g. 'name matches *_proxy or (type is LIGHT and prop lod > 1)'",
+    ) # type: ignore
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene != None and context.view_layer != None
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        return apply_rule(self, self.expression)
+
+class ApplySavedHideRule(bpy.types.Operator):
+    """
+    Operator for hiding or unhiding the objects matching a saved rule.
+    """
+
+    bl_idname = OP_IDNAME_PREFIX + "." + "applysavedhiderule"
+    bl_label = "Hide - Apply saved rule"
+    bl_description = "Hide the objects matching a saved rule with the preferred hide method, or unhide them when they are all hidden"
+    bl_options = {"UNDO"}
+    bl_property = "name"
+
+    name : EnumProperty(
+        name = 'Name',
+        items = get_rule_items,
+    ) # type: ignore
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene != None and context.view_layer != None and len(get_rules(context.scene)) > 0
+
+    def invoke(self, context, event):
+        context.window_manager.invoke_search_popup(self)
+        return {"RUNNING_MODAL"}
+
+    def execute(self, context):
+        expression = get_rules(context.scene).get(self.name)
+        if expression == None:
+            self.report({"WARNING"}, f'No rule named "{self.name}"')
+            return {"CANCELLED"}
+
+        return apply_rule(self, expression)
+
+class SaveHideRule(bpy.types.Operator):
+    """
+    Operator for saving a rule under a name.
+    """
+
+    bl_idname = OP_IDNAME_PREFIX + "." + "savehiderule"
+    bl_label = "Hide - Save rule"
+    bl_description = "Save a rule under a name, in the scene"
+    bl_options = {"UNDO"}
+
+    name : StringProperty(
+        name = 'Name',
+        default = 'proxies',
+    ) # type: ignore
+
+    expression : StringProperty(
+        name = 'Rule',
+        default = 'name matches *_proxy',
+    ) # type: ignore
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene != None
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        try:
+            get_predicate(self.expression)
+        except RuleError as e:
+            self.report({"ERROR"}, str(e))
+            return {"CANCELLED"}
+
+        rules = get_rules(context.scene)
+        rules[self.name] = self.expression
+        set_rules(rules, context.scene)
+
+        self.report({"INFO"}, f'Rule "{self.name}" saved')
+
+        return {"FINISHED"}
+
+class DeleteHideRule(bpy.types.Operator):
+    """
+    Operator for deleting a saved rule.
+    """
+
+    bl_idname = OP_IDNAME_PREFIX + "." + "deletehiderule"
+    bl_label = "Hide - Delete rule"
+    bl_description = "Delete a saved rule"
+    bl_options = {"UNDO"}
+    bl_property = "name"
+
+    name : EnumProperty(
+        name = 'Name',
+        items = get_rule_items,
+    ) # type: ignore
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene != None and len(get_rules(context.scene)) > 0
+
+    def invoke(self, context, event):
+        context.window_manager.invoke_search_popup(self)
+        return {"RUNNING_MODAL"}
+
+    def execute(self, context):
+        rules = get_rules(context.scene)
+        if rules.pop(self.name, None) != None:
+            set_rules(rules, context.scene)
+
+        return {"FINISHED"}
+
+handlers = (
+    (bpy.app.handlers.depsgraph_update_post, on_depsgraph_update_post),
+    (bpy.app.handlers.load_post, on_file_changed),
+    (bpy.app.handlers.undo_post, on_file_changed),
+    (bpy.app.handlers.redo_post, on_file_changed),
+)
+
+classes = (
+    ApplyHideRule,
+    ApplySavedHideRule,
+    SaveHideRule,
+    DeleteHideRule,
+)
+
+def register():
+    from bpy.utils import register_class
+    for cls in classes:
+        register_class(cls)
+
+    for handler_list, handler in handlers:
+        if handler not in handler_list:
+            handler_list.append(handler)
+
+def unregister():
+    for handler_list, handler in handlers:
+        if handler in handler_list:
+            handler_list.remove(handler)
+
+    clear()
+
+    from bpy.utils import unregister_class
+    for cls in reversed(classes):
+        unregister_class(cls)
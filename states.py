@@ -0,0 +1,518 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+import base64
+import json
+from typing import Iterable
+
+import numpy as np
+
+import bpy
+from bpy.app.handlers import persistent
+from bpy.types import Scene, ViewLayer
+from bpy.props import (
+    EnumProperty,
+    StringProperty,
+)
+
+from .constants import OP_IDNAME_PREFIX
+from . import undo
+from .indexes import get_layer_collection_index
+from .instrumentation import (span,
+                              operator_span,
+                             )
+from .visibility import (get_data_collection,
+                         get_data_uids,
+                         get_flags,
+                        )
+
+# Flags recorded by a visibility state, per ID type.
+# 'hide_get' is the per view layer object state, 'layer_hide_viewport' the per view layer collection state.
+STATE_FLAGS = {
+    'Object' : ('hide_get', 'hide_viewport', 'hide_render'),
+    'Collection' : ('layer_hide_viewport', 'hide_viewport', 'hide_render'),
+}
+
+class VisibilityState:
+    """
+    Visibility of every object and collection of a view layer, stored as packed bit arrays.
+
+    Attributes
+    ----------
+    view_layer_name : str
+        Name of the view layer the state was saved from.
+    uids_per_type : dict[str, np.ndarray]
+        Sorted session UIDs of the recorded IDs, per ID type. The bits follow this order.
+    bits : dict[tuple[str, str], np.ndarray]
+        Packed flags, keyed by (ID type, flag).
+    """
+
+    __slots__ = ('view_layer_name', 'uids_per_type', 'bits')
+
+    def __init__(self, view_layer_name: str, uids_per_type: dict[str, np.ndarray], bits: dict[tuple[str, str], np.ndarray]):
+        self.view_layer_name = view_layer_name
+        self.uids_per_type = uids_per_type
+        self.bits = bits
+
+    def get_flags(self, id_type: str, flag: str) -> np.ndarray:
+        """
+        Unpacks recorded flags, in the order of `uids_per_type[id_type]`.
+        """
+
+        return np.unpackbits(self.bits[(id_type, flag)], count=len(self.uids_per_type[id_type])).astype(bool)
+
+    def __len__(self) -> int:
+        return sum(len(uids) for uids in self.uids_per_type.values())
+
+# Visibility states per scene, keyed by scene session UID, then by state name
+_states: dict[int, dict[str, VisibilityState]] = {}
+# Session UIDs of the scenes whose states changed since they were last written to the scene
+_dirty_scenes: set[int] = set()
+
+def pack_state(view_layer_name: str, uids_per_type: dict[str, np.ndarray], flags: dict[tuple[str, str], np.ndarray]) -> VisibilityState:
+    """
+    Builds a visibility state, sorting the flags by session UID and packing them.
+
+    Parameters
+    ----------
+    view_layer_name : str
+        Name of the view layer the flags were read from.
+    uids_per_type : dict[str, np.ndarray]
+        Session UIDs of the recorded IDs, per ID type.
+    flags : dict[tuple[str, str], np.ndarray]
+        Boolean flags keyed by (ID type, flag), in the order of `uids_per_type`.
+
+    Returns
+    -------
+    VisibilityState
+        The packed state.
+    """
+
+    orders = {id_type: np.argsort(uids, kind='stable') for id_type, uids in uids_per_type.items()}
+
+    return VisibilityState(
+        view_layer_name,
+        {id_type: uids[orders[id_type]] for id_type, uids in uids_per_type.items()},
+        {(id_type, flag): np.packbits(values[orders[id_type]]) for (id_type, flag), values in flags.items()},
+    )
+
+def align(uids: np.ndarray, data_uids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Matches the IDs of a collection to recorded IDs.
+
+    Parameters
+    ----------
+    uids : np.ndarray
+        Sorted session UIDs of the recorded IDs.
+    data_uids : np.ndarray
+        Session UIDs of the IDs of the collection.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        A boolean mask of the collection IDs that were recorded, and for each of them its position in `uids`.
+    """
+
+    if len(uids) == 0:
+        return np.zeros(len(data_uids), dtype=bool), np.empty(0, dtype=np.intp)
+
+    positions = np.minimum(np.searchsorted(uids, data_uids), len(uids) - 1)
+    mask = uids[positions] == data_uids
+    return mask, positions[mask]
+
+def capture_state(view_layer: ViewLayer | None = None) -> VisibilityState:
+    """
+    Reads the visibility of every object and collection of a view layer.
+
+    Parameters
+    ----------
+    view_layer : ViewLayer, optional
+        The view layer to read. If None, the context view layer is used.
+
+    Returns
+    -------
+    VisibilityState
+        The visibility state.
+    """
+
+    if view_layer == None:
+        view_layer = bpy.context.view_layer
+
+    objects = view_layer.objects
+    layer_collection_index = get_layer_collection_index(view_layer)
+    collections = tuple(layer_collection_index.keys())
+    layer_collections = tuple(layer_collection_index.values())
+
+    flags = {
+        ('Object', 'hide_get') : np.fromiter((obj.hide_get(view_layer=view_layer) for obj in objects), dtype=bool, count=len(objects)),
+        ('Object', 'hide_viewport') : get_flags(objects, 'hide_viewport'),
+        ('Object', 'hide_render') : get_flags(objects, 'hide_render'),
+        # Collections are few, they are read one at a time
+        ('Collection', 'layer_hide_viewport') : np.fromiter((layer_collection.hide_viewport for layer_collection in layer_collections), dtype=bool, count=len(collections)),
+        ('Collection', 'hide_viewport') : np.fromiter((collection.hide_viewport for collection in collections), dtype=bool, count=len(collections)),
+        ('Collection', 'hide_render') : np.fromiter((collection.hide_render for collection in collections), dtype=bool, count=len(collections)),
+    }
+    uids_per_type = {
+        'Object' : get_data_uids(objects),
+        'Collection' : np.fromiter((collection.session_uid for collection in collections), dtype=np.int32, count=len(collections)),
+    }
+
+    return pack_state(view_layer.name, uids_per_type, flags)
+
+def restore_state(state: VisibilityState, view_layer: ViewLayer | None = None) -> int:
+    """
+    Applies a visibility state to a view layer, only writing the flags that differ.
+
+    Object flags are read in bulk over the view layer objects. The differing flags are written like
+    a visibility undo step, through the bulk writes of `visibility` and their write handlers.
+    IDs created after the state was saved are left untouched.
+
+    Parameters
+    ----------
+    state : VisibilityState
+        The state to apply.
+    view_layer : ViewLayer, optional
+        The view layer to apply the state to. If None, the context view layer is used.
+
+    Returns
+    -------
+    int
+        Number of changed flags.
+    """
+
+    if view_layer == None:
+        view_layer = bpy.context.view_layer
+
+    # One (flag, ID type, session UIDs, values to write) tuple per group of differing flags
+    changes = []
+
+    # Objects
+    objects = view_layer.objects
+    mask, positions = align(state.uids_per_type['Object'], get_data_uids(objects))
+    uids = state.uids_per_type['Object'][positions]
+    recorded = np.flatnonzero(mask)
+
+    for flag in STATE_FLAGS['Object']:
+        target = state.get_flags('Object', flag)[positions]
+
+        if flag == 'hide_get':
+            # The per view layer state has no bulk access, only the recorded objects are read
+            object_list = objects[:]
+            current = np.fromiter((object_list[index].hide_get(view_layer=view_layer) for index in recorded.tolist()), dtype=bool, count=len(recorded))
+        else:
+            current = get_flags(objects, flag)[mask]
+
+        changed = target != current
+        if changed.any():
+            changes.append((flag, 'Object', uids[changed], target[changed]))
+
+    # Collections
+    layer_collection_index = get_layer_collection_index(view_layer)
+    collections = tuple(layer_collection_index.keys())
+    data_uids = np.fromiter((collection.session_uid for collection in collections), dtype=np.int32, count=len(collections))
+    mask, positions = align(state.uids_per_type['Collection'], data_uids)
+    uids = state.uids_per_type['Collection'][positions]
+    recorded = [collection for collection, recorded in zip(collections, mask) if recorded]
+
+    for flag in STATE_FLAGS['Collection']:
+        target = state.get_flags('Collection', flag)[positions]
+
+        # Collections are few, they are read one at a time
+        if flag == 'layer_hide_viewport':
+            current = np.fromiter((layer_collection_index[collection].hide_viewport for collection in recorded), dtype=bool, count=len(recorded))
+        else:
+            current = np.fromiter((getattr(collection, flag) for collection in recorded), dtype=bool, count=len(recorded))
+
+        changed = target != current
+        if changed.any():
+            changes.append((flag, 'Collection', uids[changed], target[changed]))
+
+    if len(changes) > 0:
+        undo.apply_delta(undo.VisibilityDelta('Restore visibility state', view_layer.id_data.session_uid, view_layer.name, changes))
+
+    return sum(len(uids) for _, _, uids, _ in changes)
+
+def encode_state(state: VisibilityState) -> dict:
+    """
+    Converts a visibility state to JSON compatible data, identifying IDs by name.
+    """
+
+    names_per_type = {}
+    for id_type, uids in state.uids_per_type.items():
+        data_collection = get_data_collection(id_type)
+        mask, positions = align(uids, get_data_uids(data_collection))
+        names = [None] * len(uids)
+        for id, position in zip((id for id, recorded in zip(data_collection, mask) if recorded), positions.tolist()):
+            names[position] = id.name
+        names_per_type[id_type] = names
+
+    return {
+        'view_layer' : state.view_layer_name,
+        'names' : names_per_type,
+        'bits' : {f'{id_type}.{flag}': base64.b64encode(bits.tobytes()).decode('ascii') for (id_type, flag), bits in state.bits.items()},
+    }
+
+def decode_state(data: dict) -> VisibilityState:
+    """
+    Converts JSON compatible data back to a visibility state, dropping IDs that do not exist anymore.
+    """
+
+    uids_per_type = {}
+    flags = {}
+    for id_type, names in data['names'].items():
+        data_collection = get_data_collection(id_type)
+        ids = [data_collection.get(name) if name != None else None for name in names]
+        found = np.fromiter((id != None for id in ids), dtype=bool, count=len(ids))
+        uids_per_type[id_type] = np.fromiter((id.session_uid for id in ids if id != None), dtype=np.int32)
+
+        for flag in STATE_FLAGS[id_type]:
+            bits = np.frombuffer(base64.b64decode(data['bits'][f'{id_type}.{flag}']), dtype=np.uint8)
+            flags[(id_type, flag)] = np.unpackbits(bits, count=len(names)).astype(bool)[found]
+
+    return pack_state(data['view_layer'], uids_per_type, flags)
+
+def get_states(scene: Scene | None = None) -> dict[str, VisibilityState]:
+    """
+    Retrieves the visibility states of a scene, reading them from the scene on first use.
+
+    Parameters
+    ----------
+    scene : Scene, optional
+        The scene to get the states of. If None, the context scene is used.
+
+    Returns
+    -------
+    dict[str, VisibilityState]
+        The visibility states, keyed by name.
+    """
+
+    if scene == None:
+        scene = bpy.context.scene
+
+    states = _states.get(scene.session_uid)
+    if states == None:
+        states = {}
+        if scene.hide.visibility_states:
+            try:
+                for name, data in json.loads(scene.hide.visibility_states).items():
+                    states[name] = decode_state(data)
+            except (ValueError, KeyError) as e:
+                print(f'Failed to read visibility states : {e}')
+        _states[scene.session_uid] = states
+
+    return states
+
+def save_state(name: str, scene: Scene | None = None, view_layer: ViewLayer | None = None) -> VisibilityState:
+    """
+    Saves the visibility of a view layer under a name, replacing any state with that name.
+
+    Parameters
+    ----------
+    name : str
+        Name of the state, e.g. 'layout'.
+    scene : Scene, optional
+        The scene to save the state in. If None, the context scene is used.
+    view_layer : ViewLayer, optional
+        The view layer to read. If None, the context view layer is used.
+
+    Returns
+    -------
+    VisibilityState
+        The saved state.
+    """
+
+    if scene == None:
+        scene = bpy.context.scene
+
+    state = capture_state(view_layer)
+    get_states(scene)[name] = state
+    _dirty_scenes.add(scene.session_uid)
+    return state
+
+def delete_state(name: str, scene: Scene | None = None) -> None:
+    """
+    Deletes a saved visibility state.
+
+    Parameters
+    ----------
+    name : str
+        Name of the state.
+    scene : Scene, optional
+        The scene the state is saved in. If None, the context scene is used.
+
+    Returns
+    -------
+    None
+    """
+
+    if scene == None:
+        scene = bpy.context.scene
+
+    if get_states(scene).pop(name, None) != None:
+        _dirty_scenes.add(scene.session_uid)
+
+def clear() -> None:
+    """
+    Forgets every visibility state kept in memory.
+
+    Returns
+    -------
+    None
+    """
+
+    _states.clear()
+    _dirty_scenes.clear()
+
+@persistent
+def on_save_pre(*args) -> None:
+    # Like the previous selection, states are only written to the file when saving
+    for scene in bpy.data.scenes:
+        if scene.session_uid in _dirty_scenes:
+            states = get_states(scene)
+            scene.hide.visibility_states = json.dumps({name: encode_state(state) for name, state in states.items()}, separators=(',', ':'))
+    _dirty_scenes.clear()
+
+@persistent
+def on_load_post(*args) -> None:
+    clear()
+
+# Items of the state name enums, kept referenced while Blender displays them
+_state_items: list[tuple[str, str, str]] = []
+
+def get_state_items(self, context) -> Iterable[tuple[str, str, str]]:
+    global _state_items
+    _state_items = [(name, name, f'{len(state)} IDs of "{state.view_layer_name}"') for name, state in sorted(get_states(context.scene).items())]
+    return _state_items
+
+class SaveVisibilityState(bpy.types.Operator):
+    """
+    Operator for saving the visibility of every object and collection under a name.
+    """
+
+    bl_idname = OP_IDNAME_PREFIX + "." + "savevisibilitystate"
+    bl_label = "Hide - Save visibility state"
+    bl_description = "Save the visibility of every object and collection of the view layer under a name"
+    bl_options = set()
+
+    name : StringProperty(
+        name = 'Name',
+        default = 'layout',
+    ) # type: ignore
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene != None and context.view_layer != None
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        with operator_span(self.bl_idname) as op_span:
+            state = save_state(self.name, context.scene, context.view_layer)
+            op_span.count('ids', len(state))
+
+        self.report({"INFO"}, f'Visibility state "{self.name}" saved')
+
+        return {"FINISHED"}
+
+class RestoreVisibilityState(bpy.types.Operator):
+    """
+    Operator for restoring a saved visibility state.
+    """
+
+    bl_idname = OP_IDNAME_PREFIX + "." + "restorevisibilitystate"
+    bl_label = "Hide - Restore visibility state"
+    bl_description = "Restore the visibility of every object and collection saved under a name"
+    bl_options = {"UNDO"}
+    bl_property = "name"
+
+    name : EnumProperty(
+        name = 'Name',
+        items = get_state_items,
+    ) # type: ignore
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene != None and context.view_layer != None and len(get_states(context.scene)) > 0
+
+    def invoke(self, context, event):
+        context.window_manager.invoke_search_popup(self)
+        return {"RUNNING_MODAL"}
+
+    def execute(self, context):
+        state = get_states(context.scene).get(self.name)
+        if state == None:
+            self.report({"WARNING"}, f'No visibility state named "{self.name}"')
+            return {"CANCELLED"}
+
+        with operator_span(self.bl_idname) as op_span:
+            with span('apply'):
+                changed_count = restore_state(state, context.view_layer)
+            op_span.count('changed', changed_count)
+
+        self.report({"INFO"}, f'Visibility state "{self.name}" restored')
+
+        return {"FINISHED"}
+
+class DeleteVisibilityState(bpy.types.Operator):
+    """
+    Operator for deleting a saved visibility state.
+    """
+
+    bl_idname = OP_IDNAME_PREFIX + "." + "deletevisibilitystate"
+    bl_label = "Hide - Delete visibility state"
+    bl_description = "Delete a saved visibility state"
+    bl_options = set()
+    bl_property = "name"
+
+    name : EnumProperty(
+        name = 'Name',
+        items = get_state_items,
+    ) # type: ignore
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene != None and len(get_states(context.scene)) > 0
+
+    def invoke(self, context, event):
+        context.window_manager.invoke_search_popup(self)
+        return {"RUNNING_MODAL"}
+
+    def execute(self, context):
+        delete_state(self.name, context.scene)
+
+        return {"FINISHED"}
+
+handlers = (
+    (bpy.app.handlers.save_pre, on_save_pre),
+    (bpy.app.handlers.load_post, on_load_post),
+)
+
+classes = (
+    SaveVisibilityState,
+    RestoreVisibilityState,
+    DeleteVisibilityState,
+)
+
+def register():
+    from bpy.utils import register_class
+    for cls in classes:
+        register_class(cls)
+
+    for handler_list, handler in handlers:
+        if handler not in handler_list:
+            handler_list.append(handler)
+
+def unregister():
+    for handler_list, handler in handlers:
+        if handler in handler_list:
+            handler_list.remove(handler)
+
+    clear()
+
+    from bpy.utils import unregister_class
+    for cls in reversed(classes):
+        unregister_class(cls)
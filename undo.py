@@ -0,0 +1,381 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+from collections import deque
+
+import numpy as np
+
+import bpy
+from bpy.app.handlers import persistent
+from bpy.types import Scene, ViewLayer
+
+from .constants import OP_IDNAME_PREFIX
+from .core import SelectionSnapshot
+from .indexes import get_layer_collection
+from .memory import resolve_uids
+from .visibility import (read_flags,
+                         set_flag,
+                        )
+
+# Number of visibility changes that can be undone
+MAX_DELTAS = 32
+
+class VisibilityDelta:
+    """
+    Visibility flags changed by one operator call, with the values they had before.
+
+    Attributes
+    ----------
+    message : str
+        Name of the change.
+    scene_uid : int
+        Session UID of the scene the change was made in.
+    view_layer_name : str
+        Name of the view layer the change was made in.
+    changes : list[tuple[str, str, np.ndarray, np.ndarray]]
+        One (flag, ID type, session UIDs, previous values) tuple per group of changed flags.
+        The flag is 'hide_viewport', 'hide_render', 'hide_get' for the per view layer
+        object state, or 'layer_hide_viewport' for the per view layer collection state.
+    """
+
+    __slots__ = ('message', 'scene_uid', 'view_layer_name', 'changes')
+
+    def __init__(self, message: str, scene_uid: int, view_layer_name: str, changes: list[tuple[str, str, np.ndarray, np.ndarray]]):
+        self.message = message
+        self.scene_uid = scene_uid
+        self.view_layer_name = view_layer_name
+        self.changes = changes
+
+    def inverted(self) -> 'VisibilityDelta':
+        # Only changed flags are recorded, so their current value is the opposite of the recorded one
+        return VisibilityDelta(self.message, self.scene_uid, self.view_layer_name,
+                               [(flag, id_type, uids, ~values) for flag, id_type, uids, values in self.changes])
+
+_undo_stack: deque[VisibilityDelta] = deque(maxlen=MAX_DELTAS)
+_redo_stack: list[VisibilityDelta] = []
+
+def capture(hide_method: str, sel: SelectionSnapshot, view_layer: ViewLayer | None = None) -> list[tuple[str, str, np.ndarray, np.ndarray]]:
+    """
+    Reads the flags a hide method is about to change.
+
+    Parameters
+    ----------
+    hide_method : str
+        The hide method that will be run, e.g. 'DISABLEINRENDERS'.
+    sel : SelectionSnapshot
+        The selection the hide method will be run on.
+    view_layer : ViewLayer, optional
+        The view layer to read per view layer states from. If None, the context view layer is used.
+
+    Returns
+    -------
+    list[tuple[str, str, np.ndarray, np.ndarray]]
+        One (flag, ID type, session UIDs, current values) tuple per group of flags.
+    """
+
+    if view_layer == None:
+        view_layer = bpy.context.view_layer
+
+    changes = []
+
+    if hide_method == 'HIDEINVIEWPORT':
+        if len(sel.layer_collections) > 0:
+            changes.append((
+                'layer_hide_viewport',
+                'Collection',
+                np.fromiter((layer_collection.collection.session_uid for layer_collection in sel.layer_collections), dtype=np.int32),
+                np.fromiter((layer_collection.hide_viewport for layer_collection in sel.layer_collections), dtype=bool),
+            ))
+        if len(sel.objects) > 0:
+            changes.append((
+                'hide_get',
+                'Object',
+                np.asarray(sel.uids_per_type['Object'], dtype=np.int32),
+                np.fromiter((obj.hide_get(view_layer=view_layer) for obj in sel.objects), dtype=bool, count=len(sel.objects)),
+            ))
+
+    else:
+        attr = 'hide_render' if hide_method == 'DISABLEINRENDERS' else 'hide_viewport'
+        for id_type in ('Collection', 'Object'):
+            ids = sel.ids_per_type.get(id_type, ())
+            if len(ids) > 0:
+                uids, values = read_flags(ids, attr, id_type, sel.uids_per_type[id_type])
+                changes.append((attr, id_type, uids, values))
+
+    return changes
+
+def record(message: str, changes: list[tuple[str, str, np.ndarray, np.ndarray]], value: bool, scene: Scene | None = None, view_layer: ViewLayer | None = None) -> None:
+    """
+    Pushes the flags that were changed to `value` on the undo stack.
+
+    Parameters
+    ----------
+    message : str
+        Name of the change.
+    changes : list[tuple[str, str, np.ndarray, np.ndarray]]
+        The flags as returned by `capture`, before they were changed.
+    value : bool
+        The value the flags were set to.
+    scene : Scene, optional
+        The scene the change was made in. If None, the context scene is used.
+    view_layer : ViewLayer, optional
+        The view layer the change was made in. If None, the context view layer is used.
+
+    Returns
+    -------
+    None
+    """
+
+    if scene == None:
+        scene = bpy.context.scene
+    if view_layer == None:
+        view_layer = bpy.context.view_layer
+
+    changed = []
+    for flag, id_type, uids, values in changes:
+        mask = values != value
+        if mask.any():
+            changed.append((flag, id_type, uids[mask], values[mask]))
+
+    if len(changed) > 0:
+        push(VisibilityDelta(message, scene.session_uid, view_layer.name, changed))
+
+def push(delta: VisibilityDelta) -> None:
+    """
+    Pushes a delta on the undo stack, for changes setting flags to different values.
+
+    Parameters
+    ----------
+    delta : VisibilityDelta
+        The changed flags, with the values they had before.
+
+    Returns
+    -------
+    None
+    """
+
+    _undo_stack.append(delta)
+    _redo_stack.clear()
+
+def get_scene(scene_uid: int) -> Scene | None:
+    return next((scene for scene in bpy.data.scenes if scene.session_uid == scene_uid), None)
+
+def is_current(delta: VisibilityDelta) -> bool:
+    """
+    Tells whether every flag of a delta still holds the opposite of its recorded value,
+    which is the state the delta expects to be applied on.
+
+    Parameters
+    ----------
+    delta : VisibilityDelta
+        The delta to check.
+
+    Returns
+    -------
+    bool
+        True if the delta can be applied, False if its IDs are gone or their flags changed since.
+    """
+
+    scene = get_scene(delta.scene_uid)
+    if scene == None:
+        return False
+    view_layer = scene.view_layers.get(delta.view_layer_name)
+
+    for flag, id_type, uids, values in delta.changes:
+        ids = resolve_uids({id_type: uids})
+        if len(ids) != len(uids):
+            return False
+
+        if flag == 'hide_get':
+            if view_layer == None:
+                return False
+            current = {obj.session_uid : obj.hide_get(view_layer=view_layer) for obj in ids}
+        elif flag == 'layer_hide_viewport':
+            if view_layer == None:
+                return False
+            current = {}
+            for collection in ids:
+                layer_collection = get_layer_collection(collection, view_layer)
+                if layer_collection == None:
+                    return False
+                current[collection.session_uid] = layer_collection.hide_viewport
+        else:
+            current_uids, current_values = read_flags(ids, flag, id_type)
+            current = dict(zip(current_uids.tolist(), current_values.tolist()))
+
+        if any(current[uid] == value for uid, value in zip(uids.tolist(), values.tolist())):
+            return False
+
+    return True
+
+def apply_delta(delta: VisibilityDelta) -> None:
+    """
+    Sets every flag of a delta back to its recorded value.
+
+    Parameters
+    ----------
+    delta : VisibilityDelta
+        The delta to apply.
+
+    Returns
+    -------
+    None
+    """
+
+    scene = get_scene(delta.scene_uid)
+    if scene == None:
+        return
+    view_layer = scene.view_layers.get(delta.view_layer_name)
+
+    for flag, id_type, uids, values in delta.changes:
+        for value in (True, False):
+            ids = resolve_uids({id_type: uids[values == value]})
+            if len(ids) == 0:
+                continue
+
+            if flag == 'hide_get':
+                if view_layer != None:
+                    for obj in ids:
+                        obj.hide_set(value, view_layer=view_layer)
+            elif flag == 'layer_hide_viewport':
+                if view_layer != None:
+                    for collection in ids:
+                        layer_collection = get_layer_collection(collection, view_layer)
+                        if layer_collection != None:
+                            layer_collection.hide_viewport = value
+            else:
+                set_flag(ids, flag, value)
+
+def undo() -> VisibilityDelta | None:
+    """
+    Reverts the last recorded visibility change.
+
+    Returns
+    -------
+    VisibilityDelta | None
+        The reverted change, or None if there was nothing to undo.
+    """
+
+    if len(_undo_stack) == 0:
+        return None
+
+    delta = _undo_stack.pop()
+    apply_delta(delta)
+    _redo_stack.append(delta.inverted())
+    return delta
+
+def redo() -> VisibilityDelta | None:
+    """
+    Applies again the last reverted visibility change.
+
+    Returns
+    -------
+    VisibilityDelta | None
+        The applied change, or None if there was nothing to redo.
+    """
+
+    if len(_redo_stack) == 0:
+        return None
+
+    delta = _redo_stack.pop()
+    apply_delta(delta)
+    _undo_stack.append(delta.inverted())
+    return delta
+
+def clear() -> None:
+    """
+    Forgets every recorded visibility change.
+
+    Returns
+    -------
+    None
+    """
+
+    _undo_stack.clear()
+    _redo_stack.clear()
+
+@persistent
+def on_load_post(*args) -> None:
+    clear()
+
+@persistent
+def on_undo_post(*args) -> None:
+    # Regular undo steps of unrelated changes leave the recorded flags as they were. Older deltas
+    # expect the last one to be applied first, so a stack is dropped once its last delta is out of sync.
+    for stack in (_undo_stack, _redo_stack):
+        if len(stack) > 0 and not is_current(stack[-1]):
+            stack.clear()
+
+class UndoVisibility(bpy.types.Operator):
+    """
+    Operator for reverting the last visibility change recorded by the addon.
+    """
+
+    bl_idname = OP_IDNAME_PREFIX + "." + "undovisibility"
+    bl_label = "Hide - Undo visibility"
+    bl_description = "Revert the last visibility change made with the visibility only undo strategy"
+    bl_options = set()
+
+    @classmethod
+    def poll(cls, context):
+        return len(_undo_stack) > 0
+
+    def execute(self, context):
+        delta = undo()
+        self.report({"INFO"}, f'Undone : {delta.message}')
+
+        return {"FINISHED"}
+
+class RedoVisibility(bpy.types.Operator):
+    """
+    Operator for applying again the last visibility change reverted by the addon.
+    """
+
+    bl_idname = OP_IDNAME_PREFIX + "." + "redovisibility"
+    bl_label = "Hide - Redo visibility"
+    bl_description = "Apply again the last visibility change reverted with Undo visibility"
+    bl_options = set()
+
+    @classmethod
+    def poll(cls, context):
+        return len(_redo_stack) > 0
+
+    def execute(self, context):
+        delta = redo()
+        self.report({"INFO"}, f'Redone : {delta.message}')
+
+        return {"FINISHED"}
+
+handlers = (
+    (bpy.app.handlers.load_post, on_load_post),
+    (bpy.app.handlers.undo_post, on_undo_post),
+    (bpy.app.handlers.redo_post, on_undo_post),
+)
+
+classes = (
+    UndoVisibility,
+    RedoVisibility,
+)
+
+def register():
+    from bpy.utils import register_class
+    for cls in classes:
+        register_class(cls)
+
+    for handler_list, handler in handlers:
+        if handler not in handler_list:
+            handler_list.append(handler)
+
+def unregister():
+    for handler_list, handler in handlers:
+        if handler in handler_list:
+            handler_list.remove(handler)
+
+    clear()
+
+    from bpy.utils import unregister_class
+    for cls in reversed(classes):
+        unregister_class(cls)
@@ -0,0 +1,440 @@
+# "Hide" Blender Add-on which simplifies the hide and unhide process.
+# Copyright (C) 2024  Antoine Danion
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://github.com/antoinedanion/Blender-Hide/blob/main/NOTICE>.
+
+from typing import Callable, Iterable, Mapping, Sequence
+
+import numpy as np
+
+import bpy
+from bpy.types import ID, Object, Collection, ViewLayer, bpy_prop_collection
+
+from .core import (reduce_values,
+                   combine_states,
+                  )
+
+# Below this amount of IDs, setting the properties one by one is cheaper than a bulk write
+BULK_MIN_IDS = 64
+
+# Functions called after the add-on writes flags, with the ID type, the property name,
+# the session UIDs of the written IDs and their new values (an array, or a single bool for all)
+write_handlers: list[Callable[[str, str, np.ndarray, np.ndarray | bool], None]] = []
+
+def call_write_handlers(id_type: str, attr: str, uids: np.ndarray, values: np.ndarray | bool) -> None:
+    for handler in write_handlers:
+        handler(id_type, attr, uids, values)
+
+def get_data_collection(id_type: str) -> bpy_prop_collection:
+    """
+    Retrieves the `bpy.data` collection holding the IDs of a given type.
+
+    Parameters
+    ----------
+    id_type : str
+        The ID type, either 'Object' or 'Collection'.
+
+    Returns
+    -------
+    bpy_prop_collection
+        The matching `bpy.data` collection.
+    """
+
+    if id_type == 'Object':
+        return bpy.data.objects
+    elif id_type == 'Collection':
+        return bpy.data.collections
+    else:
+        raise ValueError(f'Unsupported ID type : {id_type}')
+
+def get_owning_collection(objects: Sequence[Object]) -> Collection | None:
+    """
+    Retrieves the collection whose objects are exactly the given objects.
+
+    Parameters
+    ----------
+    objects : Sequence[Object]
+        The objects to look for.
+
+    Returns
+    -------
+    Collection | None
+        The collection containing exactly these objects, or None if there is none.
+    """
+
+    if len(objects) == 0:
+        return None
+
+    for collection in objects[0].users_collection:
+        if len(collection.objects) == len(objects):
+            if set(collection.objects) == set(objects):
+                return collection
+
+    return None
+
+def get_uids(ids: Sequence[ID]) -> np.ndarray:
+    """
+    Retrieves the session UIDs of the given IDs.
+
+    Parameters
+    ----------
+    ids : Sequence[ID]
+        The IDs to get the session UIDs of.
+
+    Returns
+    -------
+    np.ndarray
+        An int32 array of session UIDs, in the same order as `ids`.
+    """
+
+    return np.fromiter((id.session_uid for id in ids), dtype=np.int32, count=len(ids))
+
+def get_data_uids(data_collection: bpy_prop_collection) -> np.ndarray:
+    """
+    Retrieves the session UIDs of every ID of a collection with a single `foreach_get` call.
+
+    Parameters
+    ----------
+    data_collection : bpy_prop_collection
+        The collection to read, e.g. `bpy.data.objects`.
+
+    Returns
+    -------
+    np.ndarray
+        An int32 array of session UIDs, in the collection order.
+    """
+
+    uids = np.empty(len(data_collection), dtype=np.int32)
+    data_collection.foreach_get('session_uid', uids)
+    return uids
+
+def get_flags(data_collection: bpy_prop_collection, attr: str) -> np.ndarray:
+    """
+    Retrieves a boolean property of every ID of a collection with a single `foreach_get` call.
+
+    Parameters
+    ----------
+    data_collection : bpy_prop_collection
+        The collection to read, e.g. `bpy.data.objects`.
+    attr : str
+        Name of the property, e.g. 'hide_render'.
+
+    Returns
+    -------
+    np.ndarray
+        A boolean array of the property values, in the collection order.
+    """
+
+    flags = np.empty(len(data_collection), dtype=bool)
+    data_collection.foreach_get(attr, flags)
+    return flags
+
+def get_mask(uids: Sequence[int], data_collection: bpy_prop_collection) -> np.ndarray:
+    """
+    Builds the mask of a collection matching the given session UIDs.
+
+    Parameters
+    ----------
+    uids : Sequence[int]
+        The session UIDs to mask in.
+    data_collection : bpy_prop_collection
+        The collection to build the mask for.
+
+    Returns
+    -------
+    np.ndarray
+        A boolean array, True where the ID of the collection is in `uids`.
+    """
+
+    return np.isin(get_data_uids(data_collection), uids)
+
+def read_flags(ids: Sequence[ID], attr: str, id_type: str, uids: Sequence[int] | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reads a boolean property of IDs of a same type, in bulk for large selections.
+
+    Parameters
+    ----------
+    ids : Sequence[ID]
+        The IDs to read.
+    attr : str
+        Name of the property, e.g. 'hide_render'.
+    id_type : str
+        Type of the IDs, either 'Object' or 'Collection'.
+    uids : Sequence[int], optional
+        The session UIDs of `ids`, computed if not provided.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        The session UIDs and the values of the property, in matching order.
+    """
+
+    if len(ids) < BULK_MIN_IDS:
+        return (
+            get_uids(ids) if uids is None else np.asarray(uids, dtype=np.int32),
+            np.fromiter((getattr(id, attr) for id in ids), dtype=bool, count=len(ids)),
+        )
+
+    if uids is None:
+        uids = get_uids(ids)
+    data_collection = get_data_collection(id_type)
+    data_uids = get_data_uids(data_collection)
+    mask = np.isin(data_uids, uids)
+    return data_uids[mask], get_flags(data_collection, attr)[mask]
+
+def reduce_flags(flags: np.ndarray) -> bool | None:
+    """
+    Reduces an array of boolean flags to a single state.
+
+    Parameters
+    ----------
+    flags : np.ndarray
+        The flags to reduce.
+
+    Returns
+    -------
+    bool | None
+        True if every flag is set, False if none is, None if they are mixed or if there are no flags.
+    """
+
+    if flags.size == 0:
+        return None
+    if flags.all():
+        return True
+    if not flags.any():
+        return False
+    return None
+
+def get_global_flag(ids_per_type: Mapping[str, Sequence[ID]], attr: str, uids_per_type: Mapping[str, Sequence[int]] | None = None) -> bool | None:
+    """
+    Determines the global state of a boolean property over collections and objects.
+
+    Large groups are read with `foreach_get` and reduced with NumPy, small ones are read one ID at a time.
+
+    Parameters
+    ----------
+    ids_per_type : Mapping[str, Sequence[ID]]
+        The IDs sorted per type. Only 'Collection' and 'Object' are considered.
+    attr : str
+        Name of the property, e.g. 'hide_viewport' or 'hide_render'.
+    uids_per_type : Mapping[str, Sequence[int]], optional
+        The session UIDs of the IDs sorted per type, computed if not provided.
+
+    Returns
+    -------
+    bool | None
+        The global state, or None if the states are mixed or if there are no IDs.
+    """
+
+    states = []
+    for id_type in ('Collection', 'Object'):
+        ids = ids_per_type.get(id_type, ())
+        if len(ids) == 0:
+            continue
+
+        if len(ids) < BULK_MIN_IDS:
+            state = reduce_values(getattr(id, attr) for id in ids)
+        else:
+            if uids_per_type != None:
+                uids = uids_per_type[id_type]
+            else:
+                uids = get_uids(ids)
+            data_collection = get_data_collection(id_type)
+            state = reduce_flags(get_flags(data_collection, attr)[get_mask(uids, data_collection)])
+
+        if state == None:
+            return None
+        states.append(state)
+
+    return combine_states(states)
+
+def set_flag_per_id(ids: Iterable[ID], attr: str, value: bool) -> None:
+    """
+    Sets a boolean property on every ID, one ID at a time.
+
+    Parameters
+    ----------
+    ids : Iterable[ID]
+        The IDs to set the property of.
+    attr : str
+        Name of the property, e.g. 'hide_render'.
+    value : bool
+        The value to set.
+
+    Returns
+    -------
+    None
+    """
+
+    ids_per_type: dict[str, list[ID]] = {}
+    for id in ids:
+        setattr(id, attr, value)
+        ids_per_type.setdefault(id.bl_rna.identifier, []).append(id)
+
+    if write_handlers:
+        for id_type, type_ids in ids_per_type.items():
+            call_write_handlers(id_type, attr, get_uids(type_ids), value)
+
+def set_flag_bulk(ids: Sequence[ID], attr: str, value: bool, data_collection: bpy_prop_collection, uids: Sequence[int] | None = None) -> None:
+    """
+    Sets a boolean property on every ID with a single `foreach_set` call.
+
+    The current values of the whole `data_collection` are read, the selected IDs are
+    masked in, and everything is written back at once.
+
+    Parameters
+    ----------
+    ids : Sequence[ID]
+        The IDs to set the property of. They must all belong to `data_collection`.
+    attr : str
+        Name of the property, e.g. 'hide_render'.
+    value : bool
+        The value to set.
+    data_collection : bpy_prop_collection
+        The collection holding the IDs, e.g. `bpy.data.objects` or `collection.objects`.
+    uids : Sequence[int], optional
+        The session UIDs of `ids`, computed if not provided.
+
+    Returns
+    -------
+    None
+    """
+
+    if len(data_collection) == len(ids):
+        flags = np.full(len(ids), value, dtype=bool)
+    else:
+        if uids is None:
+            uids = get_uids(ids)
+        flags = get_flags(data_collection, attr)
+        flags[get_mask(uids, data_collection)] = value
+
+    write_flags(data_collection, attr, flags, ids[0])
+
+def write_flags(data_collection: bpy_prop_collection, attr: str, flags: np.ndarray, update_id: ID) -> None:
+    """
+    Writes a boolean property of every ID of a collection with a single `foreach_set` call.
+
+    Parameters
+    ----------
+    data_collection : bpy_prop_collection
+        The collection to write, e.g. `bpy.data.objects` or `view_layer.objects`.
+    attr : str
+        Name of the property, e.g. 'hide_render'.
+    flags : np.ndarray
+        A boolean array of the property values, in the collection order.
+    update_id : ID
+        An ID of the collection whose property changed, assigned again to run the property update.
+
+    Returns
+    -------
+    None
+    """
+
+    data_collection.foreach_set(attr, flags)
+
+    # foreach_set does not run the property update, assigning one ID through RNA triggers it.
+    # The update resyncs collections and tags depsgraph relations for the whole file.
+    setattr(update_id, attr, getattr(update_id, attr))
+
+    if write_handlers:
+        call_write_handlers(update_id.bl_rna.identifier, attr, get_data_uids(data_collection), flags)
+
+def set_flag(ids: Iterable[ID], attr: str, value: bool, uids_per_type: Mapping[str, Sequence[int]] | None = None) -> None:
+    """
+    Sets a boolean property on every ID, choosing the cheapest way to write it.
+
+    Large selections of objects that are exactly the content of a collection are written
+    through that collection, other large selections through `bpy.data` with a mask.
+    Small selections fall back to setting the property one ID at a time.
+
+    Parameters
+    ----------
+    ids : Iterable[ID]
+        The IDs to set the property of.
+    attr : str
+        Name of the property, e.g. 'hide_viewport' or 'hide_render'.
+    value : bool
+        The value to set.
+    uids_per_type : Mapping[str, Sequence[int]], optional
+        The session UIDs of the IDs sorted per type, computed when needed if not provided.
+
+    Returns
+    -------
+    None
+    """
+
+    ids_per_type: dict[str, list[ID]] = {}
+    for id in ids:
+        ids_per_type.setdefault(id.bl_rna.identifier, []).append(id)
+
+    for id_type, type_ids in ids_per_type.items():
+        if len(type_ids) < BULK_MIN_IDS:
+            set_flag_per_id(type_ids, attr, value)
+            continue
+
+        data_collection = None
+        if id_type == 'Object':
+            owning_collection = get_owning_collection(type_ids)
+            if owning_collection != None:
+                data_collection = owning_collection.objects
+        if data_collection == None:
+            data_collection = get_data_collection(id_type)
+
+        uids = None
+        if uids_per_type != None and len(uids_per_type.get(id_type, ())) == len(type_ids):
+            uids = uids_per_type[id_type]
+
+        set_flag_bulk(type_ids, attr, value, data_collection, uids)
+
+def get_selected_objects(objects: Iterable[Object], view_layer: ViewLayer | None = None) -> tuple[Object]:
+    """
+    Retrieves the objects that are currently selected among the given ones.
+
+    Parameters
+    ----------
+    objects : Iterable[Object]
+        The objects to look for.
+    view_layer : ViewLayer, optional
+        The view layer to look into. If None, the context view layer is used.
+
+    Returns
+    -------
+    tuple[Object]
+        The selected objects.
+    """
+
+    if view_layer == None:
+        view_layer = bpy.context.view_layer
+
+    # Only currently selected objects are visited
+    objects = set(objects)
+    return tuple(obj for obj in view_layer.objects.selected if obj in objects)
+
+def set_objects_selected(objects: Iterable[Object], state: bool, view_layer: ViewLayer | None = None) -> None:
+    """
+    Selects or deselects objects, only touching the ones whose selection changes.
+
+    Parameters
+    ----------
+    objects : Iterable[Object]
+        The objects to select or deselect.
+    state : bool
+        True to select, False to deselect.
+    view_layer : ViewLayer, optional
+        The view layer to select in. If None, the context view layer is used.
+
+    Returns
+    -------
+    None
+    """
+
+    if view_layer == None:
+        view_layer = bpy.context.view_layer
+
+    if state == True:
+        for obj in objects:
+            obj.select_set(True, view_layer=view_layer)
+    else:
+        for obj in get_selected_objects(objects, view_layer):
+            obj.select_set(False, view_layer=view_layer)